@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+API HTTP de solo lectura sobre licitar.db.
+
+Servidor asyncio sin dependencias externas. Las consultas corren en un pool
+de conexiones SQLite de solo lectura (modo WAL, así no bloquean al scraper)
+dentro de un executor. Las respuestas JSON usan paginación por cursor
+(keyset), llevan un ETag derivado del último run y se guardan en un LRU en
+memoria. Los artefactos HTML/PNG se envían con sendfile; los guardados en
+archivos WARC se leen por offset desde el registro correspondiente.
+
+Endpoints:
+    GET /runs                      ?limit=&cursor=
+    GET /runs/{id}
+    GET /licitaciones              ?limit=&cursor=&run=&estado=
+    GET /licitaciones/{id}
+    GET /licitaciones/{id}/html
+    GET /licitaciones/{id}/png
+    GET /search                    ?q=&limit=&cursor=  (texto completo)
+    GET /health
+
+Uso:
+    python api/server.py [--host 0.0.0.0] [--port 8080]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import queue
+import sqlite3
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DB_PATH = PROJECT_ROOT / "db" / "licitar.db"
+
+sys.path.insert(0, str(PROJECT_ROOT / "steps"))
+import warc
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+POOL_SIZE = 4
+CACHE_SIZE = 256
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ============================================================================
+# POOL DE CONEXIONES DE SOLO LECTURA
+# ============================================================================
+
+class ReadOnlyPool:
+    """Pool fijo de conexiones SQLite de solo lectura"""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(
+                f"file:{db_path}?mode=ro", uri=True, check_same_thread=False, timeout=10
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA query_only = ON;")
+            self._connections.put(connection)
+
+    def run(self, fn, *args):
+        connection = self._connections.get()
+        try:
+            return fn(connection, *args)
+        finally:
+            self._connections.put(connection)
+
+
+# ============================================================================
+# CONSULTAS
+# ============================================================================
+
+def parse_limit(params):
+    try:
+        limit = int(params.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise HttpError(400, "limit inválido")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_cursor(params):
+    cursor = params.get("cursor")
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HttpError(400, "cursor inválido")
+
+
+def paginate(rows, limit):
+    """Devuelve la página y el cursor siguiente (keyset por id descendente)"""
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def query_latest_run(connection):
+    row = connection.execute(
+        "SELECT id, status, finished_at FROM runs ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if row is None:
+        return '"vacio"'
+    return f'"run-{row["id"]}-{row["status"]}-{row["finished_at"] or ""}"'
+
+
+def resource_etag(run_tag, resource):
+    """ETag de un recurso: versión de la base (último run) más su ruta o consulta"""
+    digest = hashlib.sha1(f"{run_tag}|{resource}".encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match puede traer varias ETags separadas por coma, débiles (W/) o *"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def query_runs(connection, params):
+    limit = parse_limit(params)
+    cursor = parse_cursor(params)
+
+    sql = """
+        SELECT r.id, r.source, r.started_at, r.finished_at, r.status, r.total_pages,
+               r.execution_time_seconds,
+               COALESCE(e.total_licitaciones, 0) AS total_licitaciones,
+               COALESCE(e.total_errors, 0) AS total_errors
+        FROM runs r
+        LEFT JOIN estadisticas_runs e ON r.id = e.run_id
+    """
+    args = []
+    if cursor is not None:
+        sql += " WHERE r.id < ?"
+        args.append(cursor)
+    sql += " ORDER BY r.id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    return paginate(connection.execute(sql, args).fetchall(), limit)
+
+
+def query_run(connection, run_id):
+    row = connection.execute("""
+        SELECT r.*, d.url_principal, d.numero_paginas,
+               COALESCE(e.total_licitaciones, 0) AS total_licitaciones,
+               COALESCE(e.total_html_files, 0) AS total_html_files,
+               COALESCE(e.total_png_files, 0) AS total_png_files,
+               COALESCE(e.total_errors, 0) AS total_errors
+        FROM runs r
+        LEFT JOIN run_details d ON r.id = d.run_id
+        LEFT JOIN estadisticas_runs e ON r.id = e.run_id
+        WHERE r.id = ?
+    """, (run_id,)).fetchone()
+    if row is None:
+        raise HttpError(404, "run no encontrado")
+    return dict(row)
+
+
+LICITACION_COLUMNS = """
+    l.id, l.run_id, l.url, l.title, l.numero_licitacion, l.estado,
+    l.fecha_publicacion, l.fecha_apertura, l.monto_estimado, l.moneda,
+    l.organismo, l.categoria, l.scraped_at
+"""
+
+
+def query_licitaciones(connection, params):
+    limit = parse_limit(params)
+    cursor = parse_cursor(params)
+
+    conditions = []
+    args = []
+    if cursor is not None:
+        conditions.append("l.id < ?")
+        args.append(cursor)
+    if params.get("run"):
+        conditions.append("l.run_id = ?")
+        args.append(params["run"])
+    if params.get("estado"):
+        conditions.append("l.estado = ?")
+        args.append(params["estado"])
+
+    sql = f"SELECT {LICITACION_COLUMNS} FROM licitaciones l"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY l.id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    return paginate(connection.execute(sql, args).fetchall(), limit)
+
+
+def query_licitacion(connection, licitacion_id):
+    row = connection.execute(
+        f"SELECT {LICITACION_COLUMNS}, l.description FROM licitaciones l WHERE l.id = ?",
+        (licitacion_id,)
+    ).fetchone()
+    if row is None:
+        raise HttpError(404, "licitación no encontrada")
+
+    result = dict(row)
+    result["html"] = [dict(r) for r in connection.execute(
+        "SELECT id, path_relativo, tamano_bytes, hash_md5 FROM archivos_html WHERE licitacion_id = ?",
+        (licitacion_id,)
+    )]
+    result["png"] = [dict(r) for r in connection.execute(
+        "SELECT id, path_relativo, tamano_bytes FROM archivos_png WHERE licitacion_id = ?",
+        (licitacion_id,)
+    )]
+    # Otras URLs del mismo cluster de similitud (republicaciones)
+    result["republicaciones"] = [r["url"] for r in connection.execute("""
+        SELECT otra.url FROM similitud_urls s
+        JOIN similitud_urls otra ON otra.cluster_id = s.cluster_id AND otra.id != s.id
+        WHERE s.url = ?
+        ORDER BY otra.id
+    """, (result["url"],))]
+    return result
+
+
+def query_search(connection, params):
+    term = (params.get("q") or "").strip()
+    if not term:
+        raise HttpError(400, "falta el parámetro q")
+    limit = parse_limit(params)
+    cursor = parse_cursor(params)
+
+    # Texto completo (frase literal para FTS5); las capturas anteriores al
+    # índice se indexan en initialize_db.py --migrate
+    phrase = '"' + term.replace('"', '""') + '"'
+    sql = f"""
+        SELECT {LICITACION_COLUMNS} FROM licitaciones l
+        WHERE l.url IN (SELECT url FROM busqueda_fts WHERE busqueda_fts MATCH ?)
+    """
+    args = [phrase]
+    if cursor is not None:
+        sql += " AND l.id < ?"
+        args.append(cursor)
+    sql += " ORDER BY l.id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    return paginate(connection.execute(sql, args).fetchall(), limit)
+
+
+def query_artifact_path(connection, licitacion_id, kind):
+    table = "archivos_html" if kind == "html" else "archivos_png"
+    row = connection.execute(
+        f"SELECT path_relativo FROM {table} WHERE licitacion_id = ? ORDER BY id DESC LIMIT 1",
+        (licitacion_id,)
+    ).fetchone()
+    if row is None:
+        raise HttpError(404, "artefacto no encontrado")
+
+    # Los paths pueden venir con separadores de Windows
+    relative = row["path_relativo"].replace("\\", "/")
+
+    # Capturas dentro de un WARC: se devuelve la referencia al registro
+    parsed = warc.parse_ref(relative)
+    if parsed:
+        path = (PROJECT_ROOT / parsed[0]).resolve()
+        if PROJECT_ROOT.resolve() not in path.parents or not path.is_file():
+            raise HttpError(404, "archivo no disponible")
+        return relative
+
+    path = (PROJECT_ROOT / relative).resolve()
+    if PROJECT_ROOT.resolve() not in path.parents or not path.is_file():
+        raise HttpError(404, "archivo no disponible")
+    return path
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class ApiServer:
+    def __init__(self, db_path=DB_PATH, pool_size=POOL_SIZE, cache_size=CACHE_SIZE):
+        self.pool = ReadOnlyPool(db_path, pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+    async def db(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.pool.run, fn, *args)
+
+    def cache_get(self, key, etag):
+        entry = self.cache.get(key)
+        if entry is None or entry[0] != etag:
+            return None
+        self.cache.move_to_end(key)
+        return entry[1]
+
+    def cache_put(self, key, etag, body):
+        self.cache[key] = (etag, body)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def route(self, path, params):
+        """Resuelve la ruta a (tipo, consulta, argumentos)"""
+        parts = [p for p in path.split("/") if p]
+
+        if parts == ["runs"]:
+            return "json", query_runs, (params,)
+        if parts == ["licitaciones"]:
+            return "json", query_licitaciones, (params,)
+        if parts == ["search"]:
+            return "json", query_search, (params,)
+        if len(parts) == 2 and parts[0] == "runs" and parts[1].isdigit():
+            return "json", query_run, (int(parts[1]),)
+        if len(parts) == 2 and parts[0] == "licitaciones" and parts[1].isdigit():
+            return "json", query_licitacion, (int(parts[1]),)
+        if len(parts) == 3 and parts[0] == "licitaciones" and parts[1].isdigit() and parts[2] in ("html", "png"):
+            return "file", query_artifact_path, (int(parts[1]), parts[2])
+        raise HttpError(404, "ruta no encontrada")
+
+    async def handle_request(self, method, target, headers, writer):
+        if method not in ("GET", "HEAD"):
+            raise HttpError(405, "método no permitido")
+
+        split = urlsplit(target)
+        path = unquote(split.path)
+        params = {k: v[-1] for k, v in parse_qs(split.query).items()}
+
+        if path == "/health":
+            await self.send(writer, method, 200, b'{"status": "ok"}', "application/json")
+            return
+
+        kind, fn, args = self.route(path, params)
+        run_tag = await self.db(query_latest_run)
+        if_none_match = headers.get("if-none-match")
+
+        # El recurso se resuelve antes de comparar la ETag: uno inexistente es
+        # 404 aunque el cliente mande una ETag vigente
+        if kind == "file":
+            file_path = await self.db(fn, *args)
+            etag = resource_etag(run_tag, file_path)
+            if etag_matches(if_none_match, etag):
+                await self.send(writer, method, 304, b"", None, etag)
+                return
+            if isinstance(file_path, str):
+                loop = asyncio.get_running_loop()
+                content_type, body = await loop.run_in_executor(
+                    self.executor, warc.read_payload, file_path, PROJECT_ROOT
+                )
+                await self.send(writer, method, 200, body, content_type, etag)
+            else:
+                await self.send_file(writer, method, file_path, etag)
+            return
+
+        # Solo se cachean respuestas exitosas: un acierto ya prueba que existe
+        cache_key = target
+        etag = resource_etag(run_tag, target)
+        body = self.cache_get(cache_key, etag)
+        if body is None:
+            result = await self.db(fn, *args)
+            body = json.dumps(result, ensure_ascii=False, default=str).encode("utf-8")
+            self.cache_put(cache_key, etag, body)
+
+        if etag_matches(if_none_match, etag):
+            await self.send(writer, method, 304, b"", None, etag)
+            return
+        await self.send(writer, method, 200, body, "application/json; charset=utf-8", etag)
+
+    async def send(self, writer, method, status, body, content_type, etag=None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        if etag:
+            lines.append(f"ETag: {etag}")
+            lines.append("Cache-Control: no-cache")
+        lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+
+    async def send_file(self, writer, method, file_path, etag):
+        size = file_path.stat().st_size
+        content_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+        header = (
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {size}\r\n"
+            f"ETag: {etag}\r\n"
+            "Cache-Control: no-cache\r\n\r\n"
+        )
+        writer.write(header.encode("latin-1"))
+        await writer.drain()
+        if method == "HEAD":
+            return
+
+        # sendfile: copia directa del archivo al socket sin pasar por Python
+        loop = asyncio.get_running_loop()
+        with open(file_path, "rb") as f:
+            await loop.sendfile(writer.transport, f, 0, size)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, "GET", 400, b"", None)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    await self.handle_request(method, target, headers, writer)
+                except HttpError as e:
+                    body = json.dumps({"error": e.message}, ensure_ascii=False).encode("utf-8")
+                    await self.send(writer, method, e.status, body, "application/json; charset=utf-8")
+                except Exception as e:
+                    print(f"❌ Error atendiendo {target}: {e}")
+                    body = json.dumps({"error": "error interno"}).encode("utf-8")
+                    await self.send(writer, method, 500, body, "application/json")
+
+                if headers.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🌐 API escuchando en http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="API de solo lectura sobre licitar.db")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("API_PORT", "8080")))
+    parser.add_argument("--pool", type=int, default=POOL_SIZE, help="Conexiones de lectura")
+    args = parser.parse_args()
+
+    if not DB_PATH.exists():
+        print(f"❌ Base de datos no encontrada: {DB_PATH}")
+        sys.exit(1)
+
+    server = ApiServer(DB_PATH, pool_size=args.pool)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
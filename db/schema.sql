@@ -6,6 +6,7 @@ CREATE TABLE IF NOT EXISTS runs (
     status VARCHAR(20) DEFAULT 'running' CHECK (status IN ('running', 'completed', 'failed', 'cancelled')),
     total_pages INTEGER DEFAULT 0,
     execution_time_seconds INTEGER DEFAULT 0,
+    source VARCHAR(50) DEFAULT 'corrientes', -- Portal de origen (ver steps/sources.py)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -95,10 +96,133 @@ CREATE TABLE IF NOT EXISTS metricas_ejecucion (
     tiempo_step2_seconds INTEGER DEFAULT 0,
     tiempo_step3_seconds INTEGER DEFAULT 0,
     memoria_maxima_mb INTEGER DEFAULT 0,
+    assets_cache_hits INTEGER DEFAULT 0, -- Recursos estáticos servidos desde el caché en disco
+    assets_cache_misses INTEGER DEFAULT 0,
+    assets_cache_hit_rate REAL DEFAULT 0,
+    assets_bytes_ahorrados INTEGER DEFAULT 0,
+    paginas_relacionadas INTEGER DEFAULT 0, -- Anexos, circulares, prórrogas (quedan en frontera, no en licitaciones)
+    documentos_relacionados INTEGER DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (run_id) REFERENCES runs(id) ON DELETE CASCADE
 );
 
+-- Resumen por ejecución, mantenido por triggers al momento de escribir
+CREATE TABLE IF NOT EXISTS estadisticas_runs (
+    run_id INTEGER PRIMARY KEY,
+    total_licitaciones INTEGER NOT NULL DEFAULT 0,
+    total_html_files INTEGER NOT NULL DEFAULT 0,
+    total_png_files INTEGER NOT NULL DEFAULT 0,
+    total_errors INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (run_id) REFERENCES runs(id) ON DELETE CASCADE
+);
+
+-- Cola de capturas para workers distribuidos (ver steps/work_queue.py)
+CREATE TABLE IF NOT EXISTS capture_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    url VARCHAR(1000) NOT NULL,
+    position INTEGER NOT NULL, -- Orden de la URL en el listado
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'leased', 'done', 'failed')),
+    lease_owner VARCHAR(100),
+    lease_expires_at REAL, -- Epoch en segundos
+    attempts INTEGER NOT NULL DEFAULT 0,
+    html_path VARCHAR(500),
+    png_path VARCHAR(500),
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (run_id, url),
+    FOREIGN KEY (run_id) REFERENCES runs(id) ON DELETE CASCADE
+);
+
+-- Contenido principal de cada captura (sin menús, banners ni atributos
+-- volátiles). Su hash es el que se usa para detectar cambios reales
+CREATE TABLE IF NOT EXISTS contenido_principal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    licitacion_id INTEGER NOT NULL,
+    url VARCHAR(1000) NOT NULL,
+    hash_sha256 VARCHAR(64) NOT NULL,
+    contenido BLOB, -- HTML normalizado comprimido con zlib; NULL si no cambió
+    tamano_bytes INTEGER, -- Tamaño sin comprimir
+    cambio VARCHAR(20) NOT NULL CHECK (cambio IN ('nueva', 'modificada', 'sin_cambios')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (licitacion_id) REFERENCES licitaciones(id) ON DELETE CASCADE
+);
+
+-- Búsqueda de texto completo sobre la última versión del contenido de cada URL
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5(
+    url UNINDEXED,
+    title,
+    texto,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- Índice de similitud (SimHash de 64 bits) para agrupar republicaciones de
+-- una misma licitación bajo distintas URLs (ver steps/similarity.py)
+CREATE TABLE IF NOT EXISTS similitud_urls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url VARCHAR(1000) NOT NULL UNIQUE,
+    simhash INTEGER NOT NULL, -- Firma del texto principal (entero con signo)
+    cluster_id INTEGER NOT NULL, -- id de la primera URL del grupo
+    licitacion_id INTEGER, -- Última captura indexada
+    distancia INTEGER, -- Bits de diferencia con la vecina al agruparse
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (licitacion_id) REFERENCES licitaciones(id) ON DELETE SET NULL
+);
+
+-- Bandas de 16 bits de cada firma (LSH): la búsqueda de vecinas es por índice
+CREATE TABLE IF NOT EXISTS simhash_bandas (
+    banda INTEGER NOT NULL,
+    valor INTEGER NOT NULL,
+    similitud_id INTEGER NOT NULL,
+    PRIMARY KEY (banda, valor, similitud_id),
+    FOREIGN KEY (similitud_id) REFERENCES similitud_urls(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- URLs que quedaron sin capturar al llegar la hora límite del run
+CREATE TABLE IF NOT EXISTS capturas_pendientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    url VARCHAR(1000) NOT NULL,
+    prioridad VARCHAR(20), -- nueva, abierta, refresco (ver steps/scheduler.py)
+    posicion INTEGER, -- Orden dentro de la planificación del run
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (run_id) REFERENCES runs(id) ON DELETE CASCADE
+);
+
+-- Frontera del crawl de enlaces relacionados (anexos, circulares, prórrogas)
+-- que se siguen desde las páginas de detalle (ver steps/frontier.py)
+CREATE TABLE IF NOT EXISTS frontera (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source VARCHAR(50) NOT NULL,
+    url VARCHAR(1000) NOT NULL UNIQUE,
+    origen_url VARCHAR(1000), -- Página donde se encontró el enlace
+    licitacion_url VARCHAR(1000), -- Licitación (página de detalle) de la que cuelga el enlace
+    profundidad INTEGER NOT NULL, -- 0 = listado, 1 = enlazada desde un detalle, ...
+    tipo VARCHAR(20) NOT NULL CHECK (tipo IN ('detalle', 'documento', 'relacionada')),
+    prioridad INTEGER NOT NULL, -- Menor = antes
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'capturada', 'error')),
+    path_relativo VARCHAR(500), -- Documento descargado, o HTML de la página relacionada
+    png_path VARCHAR(500), -- Screenshot de la página relacionada
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índice de registros WARC: permite leer una captura con un solo seek
+CREATE TABLE IF NOT EXISTS warc_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    licitacion_id INTEGER NOT NULL,
+    url VARCHAR(1000) NOT NULL,
+    record_type VARCHAR(20) NOT NULL, -- html, png
+    warc_file VARCHAR(500) NOT NULL, -- Ruta relativa a la raíz del proyecto
+    offset INTEGER NOT NULL, -- Posición del miembro comprimido
+    length INTEGER NOT NULL, -- Largo comprimido
+    content_type VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (licitacion_id) REFERENCES licitaciones(id) ON DELETE CASCADE
+);
 
 -- Índices para consultas frecuentes por fechas
 CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at);
@@ -112,6 +236,7 @@ CREATE INDEX IF NOT EXISTS idx_licitaciones_estado ON licitaciones(estado);
 -- Índice único compuesto para evitar duplicados por run
 CREATE UNIQUE INDEX IF NOT EXISTS idx_licitaciones_run_url ON licitaciones(run_id, url);
 CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs(source);
 
 -- Índices para relaciones entre tablas
 CREATE INDEX IF NOT EXISTS idx_run_details_run_id ON run_details(run_id);
@@ -120,6 +245,15 @@ CREATE INDEX IF NOT EXISTS idx_archivos_html_licitacion_id ON archivos_html(lici
 CREATE INDEX IF NOT EXISTS idx_archivos_png_licitacion_id ON archivos_png(licitacion_id);
 CREATE INDEX IF NOT EXISTS idx_scraping_errors_run_id ON scraping_errors(run_id);
 CREATE INDEX IF NOT EXISTS idx_metricas_run_id ON metricas_ejecucion(run_id);
+CREATE INDEX IF NOT EXISTS idx_capture_queue_status ON capture_queue(status, run_id, position);
+CREATE INDEX IF NOT EXISTS idx_contenido_principal_url ON contenido_principal(url, id);
+CREATE INDEX IF NOT EXISTS idx_contenido_principal_licitacion ON contenido_principal(licitacion_id);
+CREATE INDEX IF NOT EXISTS idx_similitud_urls_cluster ON similitud_urls(cluster_id);
+CREATE INDEX IF NOT EXISTS idx_simhash_bandas_similitud ON simhash_bandas(similitud_id);
+CREATE INDEX IF NOT EXISTS idx_capturas_pendientes_run_id ON capturas_pendientes(run_id);
+CREATE INDEX IF NOT EXISTS idx_warc_records_licitacion ON warc_records(licitacion_id, record_type);
+CREATE INDEX IF NOT EXISTS idx_frontera_cola ON frontera(source, estado, prioridad, id);
+CREATE INDEX IF NOT EXISTS idx_frontera_licitacion ON frontera(licitacion_url);
 
 -- =============================================================================
 -- TRIGGERS PARA ACTUALIZACIÓN AUTOMÁTICA DE TIMESTAMPS
@@ -164,22 +298,119 @@ LEFT JOIN archivos_html ah ON l.id = ah.licitacion_id
 LEFT JOIN archivos_png ap ON l.id = ap.licitacion_id
 ORDER BY l.scraped_at DESC;
 
--- Vista de estadísticas por ejecución
-CREATE VIEW IF NOT EXISTS v_estadisticas_runs AS
+-- =============================================================================
+-- TRIGGERS PARA MANTENER estadisticas_runs
+-- =============================================================================
+
+-- Completar el resumen de runs existentes antes de crear los triggers
+INSERT OR IGNORE INTO estadisticas_runs (
+    run_id, total_licitaciones, total_html_files, total_png_files, total_errors
+)
+SELECT
+    r.id,
+    (SELECT COUNT(*) FROM licitaciones l WHERE l.run_id = r.id),
+    (SELECT COUNT(*) FROM archivos_html ah
+        JOIN licitaciones l ON ah.licitacion_id = l.id WHERE l.run_id = r.id),
+    (SELECT COUNT(*) FROM archivos_png ap
+        JOIN licitaciones l ON ap.licitacion_id = l.id WHERE l.run_id = r.id),
+    (SELECT COUNT(*) FROM scraping_errors se WHERE se.run_id = r.id)
+FROM runs r
+WHERE r.id NOT IN (SELECT run_id FROM estadisticas_runs);
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_insert_run
+    AFTER INSERT ON runs
+    FOR EACH ROW
+    BEGIN
+        INSERT OR IGNORE INTO estadisticas_runs (run_id) VALUES (NEW.id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_insert_licitacion
+    AFTER INSERT ON licitaciones
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_licitaciones = total_licitaciones + 1
+        WHERE run_id = NEW.run_id;
+    END;
+
+-- BEFORE: los archivos que se borran en cascada ya no encuentran la
+-- licitación (sus triggers no saben a qué run descontar), así que se
+-- descuentan acá junto con la licitación
+DROP TRIGGER IF EXISTS estadisticas_runs_delete_licitacion;
+CREATE TRIGGER estadisticas_runs_delete_licitacion
+    BEFORE DELETE ON licitaciones
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET
+            total_licitaciones = total_licitaciones - 1,
+            total_html_files = total_html_files
+                - (SELECT COUNT(*) FROM archivos_html WHERE licitacion_id = OLD.id),
+            total_png_files = total_png_files
+                - (SELECT COUNT(*) FROM archivos_png WHERE licitacion_id = OLD.id)
+        WHERE run_id = OLD.run_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_insert_html
+    AFTER INSERT ON archivos_html
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_html_files = total_html_files + 1
+        WHERE run_id = (SELECT run_id FROM licitaciones WHERE id = NEW.licitacion_id);
+    END;
+
+-- Solo descuenta borrados directos: en cascada la licitación ya no existe
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_delete_html
+    AFTER DELETE ON archivos_html
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_html_files = total_html_files - 1
+        WHERE run_id = (SELECT run_id FROM licitaciones WHERE id = OLD.licitacion_id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_insert_png
+    AFTER INSERT ON archivos_png
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_png_files = total_png_files + 1
+        WHERE run_id = (SELECT run_id FROM licitaciones WHERE id = NEW.licitacion_id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_delete_png
+    AFTER DELETE ON archivos_png
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_png_files = total_png_files - 1
+        WHERE run_id = (SELECT run_id FROM licitaciones WHERE id = OLD.licitacion_id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_insert_error
+    AFTER INSERT ON scraping_errors
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_errors = total_errors + 1
+        WHERE run_id = NEW.run_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_runs_delete_error
+    AFTER DELETE ON scraping_errors
+    FOR EACH ROW
+    BEGIN
+        UPDATE estadisticas_runs SET total_errors = total_errors - 1
+        WHERE run_id = OLD.run_id;
+    END;
+
+-- Vista de estadísticas por ejecución (lee el resumen, sin joins en abanico)
+DROP VIEW IF EXISTS v_estadisticas_runs;
+CREATE VIEW v_estadisticas_runs AS
 SELECT 
     r.id,
     r.started_at,
     r.finished_at,
     r.status,
     r.execution_time_seconds,
-    COUNT(l.id) as total_licitaciones,
-    COUNT(ah.id) as total_html_files,
-    COUNT(ap.id) as total_png_files,
-    COUNT(se.id) as total_errors
+    COALESCE(e.total_licitaciones, 0) as total_licitaciones,
+    COALESCE(e.total_html_files, 0) as total_html_files,
+    COALESCE(e.total_png_files, 0) as total_png_files,
+    COALESCE(e.total_errors, 0) as total_errors
 FROM runs r
-LEFT JOIN licitaciones l ON r.id = l.run_id
-LEFT JOIN archivos_html ah ON l.id = ah.licitacion_id
-LEFT JOIN archivos_png ap ON l.id = ap.licitacion_id
-LEFT JOIN scraping_errors se ON r.id = se.run_id
-GROUP BY r.id, r.started_at, r.finished_at, r.status, r.execution_time_seconds
+LEFT JOIN estadisticas_runs e ON r.id = e.run_id
 ORDER BY r.started_at DESC;
\ No newline at end of file
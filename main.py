@@ -1,5 +1,9 @@
 import os
+import random
 import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import importlib.util
 
@@ -7,6 +11,21 @@ import importlib.util
 current_dir = Path(__file__).parent
 steps_dir = current_dir / 'steps'
 
+# Permitir que los steps importen sus módulos auxiliares
+sys.path.insert(0, str(steps_dir))
+
+from browser import browser_page, shared_endpoint
+from sources import SOURCES, DEFAULT_SOURCE, get_source
+from asset_cache import get_asset_cache, stats_since
+import capture_pool
+import frontier
+import har
+import live_metrics
+import profiling
+import scheduler
+import watch
+import work_queue
+
 # Cargar step1
 spec1 = importlib.util.spec_from_file_location("step1", steps_dir / "step1.py")
 step1 = importlib.util.module_from_spec(spec1)
@@ -31,29 +50,376 @@ def flatten_licitacion_urls(licitaciones_data):
         all_urls.extend(urls)
     return all_urls
 
-def main():
+def process_queue(page, docs_path, db_path, owner, run_id=None, budget=None):
+    """Captura ítems de la cola hasta que no quede trabajo (o tiempo) disponible"""
+    processed = 0
+    while True:
+        if budget and not budget.allows_another():
+            return processed
+
+        item = work_queue.lease_next(str(db_path), owner, run_id)
+        if item is None:
+            return processed
+
+        source = get_source(item['source'])
+        print(f"🔄 [{owner}] Capturando ítem {item['id']}: {item['url']}")
+        start = time.monotonic()
+        captured = None
+        try:
+            with work_queue.keep_lease(str(db_path), item['id'], owner) as lease_lost:
+                captured = step2.capture_page(
+                    page, item['url'], str(docs_path), f"q{item['id']}", source, cancelled=lease_lost
+                )
+            if lease_lost.is_set():
+                # Otro worker ya tomó el ítem: no se registra nada
+                print(f"⚠️  Lease perdido para el ítem {item['id']}; se descarta la captura")
+                captured = None
+            elif captured:
+                if not work_queue.complete_item(str(db_path), item['id'], owner, *captured):
+                    print(f"⚠️  Lease perdido para el ítem {item['id']}")
+            else:
+                work_queue.fail_item(str(db_path), item['id'], owner, 'captura incompleta')
+        except step2.CaptureCancelled:
+            print(f"⚠️  Lease perdido para el ítem {item['id']}; captura abandonada")
+        except Exception as e:
+            print(f"❌ Error capturando {item['url']}: {e}")
+            work_queue.fail_item(str(db_path), item['id'], owner, e)
+        elapsed = time.monotonic() - start
+        live_metrics.page_finished(item['source'], bool(captured), elapsed)
+        if budget:
+            budget.record(elapsed)
+        processed += 1
+
+def capture_with_queue(page, source, urls, docs_path, db_path, budget=None, poll_interval=5):
+    """
+    Encola las URLs del run y participa como un worker más hasta que la
+    cola del run queda vacía (incluye ítems con lease vencido). Al llegar
+    la hora límite retira de la cola lo no capturado y lo deja en
+    budget.pending.
+    """
+    run_id = step3.create_run_record_sqlite(str(db_path), source.name)
+    work_queue.enqueue_urls(str(db_path), run_id, source.name, urls)
+    print(f"📥 {len(urls)} URLs encoladas para el run {run_id}")
+
+    owner = work_queue.worker_id()
+    while True:
+        process_queue(page, docs_path, db_path, owner, run_id, budget)
+        status = work_queue.queue_status(str(db_path), run_id)
+        if status['pending'] == 0 and status['leased'] == 0:
+            break
+        if budget and not budget.allows_another():
+            budget.pending = work_queue.defer_run(str(db_path), run_id)
+            print(f"⏰ Hora límite alcanzada: {len(budget.pending)} URLs quedan pendientes")
+            break
+        # Otros workers todavía tienen ítems arrendados
+        time.sleep(poll_interval)
+
+    status = work_queue.queue_status(str(db_path), run_id)
+    print(f"📦 Cola del run {run_id}: {status['done']} capturadas, {status['failed']} fallidas")
+    return run_id, work_queue.collect_results(str(db_path), run_id)
+
+def run_worker(docs_path, db_path, poll_interval=5):
+    """Worker de captura: toma ítems de la cola indefinidamente"""
+    owner = work_queue.worker_id()
+    print(f"👷 Worker {owner} esperando trabajo...")
+    with browser_page() as page:
+        while True:
+            if process_queue(page, docs_path, db_path, owner) == 0:
+                time.sleep(poll_interval)
+
+def capture_new_licitaciones(source, urls, docs_path, db_path, listing_url):
+    """Captura y almacena de inmediato las licitaciones detectadas por el modo watch"""
+    with browser_page(label='watch') as page:
+        processed_pages = download_page_content(
+            urls, str(docs_path), source, page, stem_prefix=f"watch_{int(time.time())}_"
+        )
+
+    url_data = {
+        "fuente": source.name,
+        "urlPrincipal": listing_url,
+        "numeroPaginas": 1,
+        "urlsPaginas": [listing_url],
+        "licitaciones": {"pagina1": urls},
+        "totalLicitaciones": len(urls)
+    }
+    store_pipeline_data(str(db_path), url_data, processed_pages, source.name)
+    return [url for url, _, _ in processed_pages]
+
+def run_watch(sources, docs_path, db_path, interval=watch.DEFAULT_INTERVAL):
+    """
+    Modo watch: consulta solo la primera página de cada listado cada
+    `interval` segundos y captura las licitaciones nuevas apenas aparecen.
+    """
+    state_path = db_path / 'watch_state.json'
+    watchers = []
+    for source in sources:
+        # Alternativa con navegador si el listado no trae enlaces sin JS
+        def read_links(url, source=source):
+            with browser_page() as page:
+                return step1.get_licitaciones_links(page, url, source)
+
+        watcher = watch.ListingWatcher(
+            source, str(db_path), state_path, source.listing_url, read_links
+        )
+        if watcher.listing_url is None:
+            with browser_page() as page:
+                watcher.listing_url = step1.get_licitaciones_url(page, source.home_url, source)
+        watchers.append(watcher)
+        print(f"👀 Vigilando {watcher.listing_url} ({source.name}, {len(watcher.known)} conocidas)")
+
+    while True:
+        for watcher in watchers:
+            try:
+                new_urls = watcher.poll()
+            except Exception as e:
+                print(f"⚠️  Error consultando {watcher.listing_url}: {e}")
+                continue
+
+            if new_urls:
+                print(f"🆕 {len(new_urls)} licitaciones nuevas en {watcher.source.name}")
+                try:
+                    captured = capture_new_licitaciones(
+                        watcher.source, new_urls, docs_path, db_path, watcher.listing_url
+                    )
+                    watcher.mark_known(captured)
+                except Exception as e:
+                    print(f"❌ Error capturando licitaciones nuevas: {e}")
+
+        # Pequeño jitter para no consultar siempre en el mismo segundo
+        time.sleep(interval * random.uniform(0.9, 1.1))
+
+def crawl_related(page, source, processed_pages, docs_path, db_path, max_depth, budget=None):
+    """
+    Sigue desde las páginas capturadas los enlaces del portal que la fuente
+    clasifica como relacionados (anexos, circulares, prórrogas, adjuntos),
+    hasta `max_depth` saltos. Lo que no llegue a capturarse queda en la
+    frontera para el próximo run.
+
+    Las capturas no son licitaciones: quedan en `frontera` (HTML, PNG o
+    documento) con la licitación de la que cuelgan en licitacion_url.
+
+    Returns:
+        Tupla (páginas relacionadas capturadas, documentos descargados)
+    """
+    project_root = Path(docs_path).parent
+    crawl = frontier.Frontier(db_path, source, max_depth)
+    crawl.seed([url for url, _, _ in processed_pages])
+
+    for url, html_path, _ in processed_pages:
+        html = step3.read_capture_html(html_path, project_root)
+        if html:
+            crawl.add_links(url, html, 1)
+    print(f"🕸️  Frontera de {source.name}: {crawl.pending_count()} enlaces relacionados pendientes")
+
+    related = 0
+    documents = 0
+    while not budget or budget.allows_another():
+        item = crawl.next_item()
+        if item is None:
+            break
+
+        start = time.monotonic()
+        try:
+            if item['tipo'] == 'documento':
+                crawl.complete(item['id'], step2.download_document(page, item['url'], str(docs_path), source))
+                documents += 1
+                continue
+
+            captured = step2.capture_page(page, item['url'], str(docs_path), f"f{item['id']}", source)
+            if not captured:
+                crawl.fail(item['id'], 'captura incompleta')
+                continue
+            crawl.complete(item['id'], *captured)
+            related += 1
+
+            html = step3.read_capture_html(captured[0], project_root)
+            if html:
+                crawl.add_links(item['url'], html, item['profundidad'] + 1, item['licitacion_url'])
+        except Exception as e:
+            print(f"❌ Error siguiendo {item['url']}: {e}")
+            crawl.fail(item['id'], e)
+        finally:
+            if budget:
+                budget.record(time.monotonic() - start)
+
+    crawl.save()
+    print(f"🕸️  {related} páginas relacionadas y {documents} documentos capturados")
+    return related, documents
+
+def run_source(source, docs_path, db_path, endpoint=None, use_queue=False, deadline=None, crawl_depth=0,
+               processes=1):
+    """Ejecuta el pipeline completo para una fuente"""
+    run_id = None
+    budget = scheduler.RunBudget(deadline)
+    cache = get_asset_cache()
+    cache_before = cache.snapshot() if cache else None
+
+    with browser_page(endpoint, source.name) as page:
+        # STEP 1: Extraer URLs de licitaciones
+        with profiling.stage(f"{source.name}-step1"):
+            url_data = extract_all_licitacion_urls(source.home_url, source, page)
+
+        # Convertir URLs a lista plana, ordenada por prioridad
+        scheduled = scheduler.prioritize(str(db_path), flatten_licitacion_urls(url_data))
+        priorities = dict(scheduled)
+        all_licitacion_urls = [url for url, _ in scheduled]
+
+        # STEP 2: Descargar contenido HTML y PNG (localmente o vía cola de workers)
+        with profiling.stage(f"{source.name}-step2"):
+            if use_queue:
+                run_id, processed_pages = capture_with_queue(
+                    page, source, all_licitacion_urls, docs_path, db_path, budget
+                )
+            else:
+                processed_pages = download_page_content(
+                    all_licitacion_urls, str(docs_path), source, page, budget, processes=processes
+                )
+
+        # Enlaces relacionados desde las páginas de detalle (se cuentan aparte)
+        related_metrics = {}
+        if crawl_depth > 0:
+            with profiling.stage(f"{source.name}-crawl"):
+                related, documents = crawl_related(
+                    page, source, processed_pages, docs_path, db_path, crawl_depth, budget
+                )
+            related_metrics = {'paginas_relacionadas': related, 'documentos_relacionados': documents}
+
+    # STEP 3: Almacenar datos en SQLite
+    extra_metrics = stats_since(cache_before, cache.snapshot()) if cache else {}
+    extra_metrics.update(related_metrics)
+    pending = [(url, priorities.get(url)) for url in budget.pending]
+    with profiling.stage(f"{source.name}-step3"):
+        return store_pipeline_data(
+            str(db_path), url_data, processed_pages, source.name, run_id, extra_metrics, pending
+        )
+
+def main(source_names=None, use_queue=False, budget_minutes=0, crawl_depth=0, processes=1):
     # Configuración de rutas
-    root_url = "https://obraspublicas.corrientes.gob.ar/"
     base_path = Path(__file__).parent
     docs_path = base_path / 'docs'
     db_path = base_path / 'db'
-    
-    # STEP 1: Extraer URLs de licitaciones
-    url_data = extract_all_licitacion_urls(root_url)
-    
-    # Convertir URLs a lista plana
-    all_licitacion_urls = flatten_licitacion_urls(url_data)
-    
-    # STEP 2: Descargar contenido HTML y PNG
-    processed_pages = download_page_content(all_licitacion_urls, str(docs_path))
-    
-    # STEP 3: Almacenar datos en archivos JSONL
-    storage_result = store_pipeline_data(str(db_path), url_data, processed_pages)
-    
-    return storage_result
+
+    sources = [get_source(name) for name in (source_names or [DEFAULT_SOURCE])]
+
+    # Hora límite común a todas las fuentes (None = sin límite)
+    deadline = time.time() + budget_minutes * 60 if budget_minutes else None
+
+    if len(sources) == 1:
+        return run_source(
+            sources[0], docs_path, db_path, use_queue=use_queue, deadline=deadline,
+            crawl_depth=crawl_depth, processes=processes
+        )
+
+    # Varias fuentes: un hilo por fuente sobre un único Chromium compartido
+    # (el servicio de navegador persistente, si está configurado)
+    results = {}
+    with shared_endpoint() as endpoint:
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = {
+                executor.submit(
+                    run_source, source, docs_path, db_path, endpoint, use_queue, deadline,
+                    crawl_depth, processes
+                ): source
+                for source in sources
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    results[source.name] = future.result()
+                except Exception as e:
+                    print(f"❌ Error en la fuente {source.name}: {e}")
+                    results[source.name] = {'status': 'error', 'error': str(e)}
+
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline de scraping de licitaciones")
+    parser.add_argument(
+        "mode", nargs="?", default="run", choices=["run", "worker", "watch"],
+        help="run: ejecutar el pipeline; worker: capturar ítems de la cola; "
+             "watch: vigilar el listado y capturar lo nuevo"
+    )
+    parser.add_argument(
+        "--interval", type=float,
+        default=float(os.environ.get("WATCH_INTERVAL", watch.DEFAULT_INTERVAL)),
+        help="Segundos entre consultas en modo watch"
+    )
+    parser.add_argument(
+        "--queue", action="store_true",
+        default=os.environ.get("PIPELINE_QUEUE", "") == "1",
+        help="Repartir las capturas del step2 entre workers mediante la cola"
+    )
+    parser.add_argument(
+        "--sources",
+        default=os.environ.get("PIPELINE_SOURCES", DEFAULT_SOURCE),
+        help=f"Fuentes separadas por coma (disponibles: {', '.join(sorted(SOURCES))})"
+    )
+    parser.add_argument(
+        "--budget-minutes", type=float,
+        default=float(os.environ.get("PIPELINE_BUDGET_MINUTES", 0)),
+        help="Ventana de la ejecución en minutos; al agotarse, lo no capturado queda pendiente (0 = sin límite)"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=capture_pool.default_processes(),
+        help="Procesos de captura del step2, cada uno con su navegador (1 = sin pool)"
+    )
+    parser.add_argument(
+        "--crawl-depth", type=int,
+        default=int(os.environ.get("CRAWL_DEPTH", 0)),
+        help="Saltos a seguir desde las páginas de detalle hacia anexos, circulares y adjuntos (0 = no seguir)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        default=profiling.settings.enabled,
+        help="Perfilar cada etapa (logs/profiles/*.folded) y guardar traces de páginas lentas (logs/traces/)"
+    )
+    parser.add_argument(
+        "--slow-page", type=float, default=profiling.settings.slow_page_seconds,
+        help="Segundos a partir de los cuales una captura se considera lenta"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", default=live_metrics.settings.enabled,
+        help="Publicar métricas en vivo en logs/metrics/pipeline.prom (textfile de node_exporter)"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=live_metrics.settings.port,
+        help="Servir además /metrics (OpenMetrics) y /progress en este puerto (0 = no)"
+    )
+    parser.add_argument(
+        "--har", choices=["record", "replay"], default=har.settings.mode or None,
+        help="record: guardar el tráfico en har/<sesión>/; replay: servirlo desde ahí, sin red"
+    )
+    parser.add_argument(
+        "--har-dir", default=None,
+        help="Sesión HAR a grabar o reproducir (por defecto una nueva / la última grabada)"
+    )
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile:
+        profiling.enable(args.slow_page)
+    if args.har:
+        har.enable(args.har, args.har_dir)
+        print(f"📼 HAR {args.har}: {har.session_dir()}")
+    if args.metrics or args.metrics_port:
+        live_metrics.start(args.metrics_port)
+    if args.mode == "worker":
+        base_path = Path(__file__).parent
+        run_worker(base_path / 'docs', base_path / 'db')
+        sys.exit(0)
+    if args.mode == "watch":
+        base_path = Path(__file__).parent
+        sources = [get_source(name.strip()) for name in args.sources.split(',') if name.strip()]
+        run_watch(sources, base_path / 'docs', base_path / 'db', args.interval)
+        sys.exit(0)
     try:
-        result = main()
+        result = main(
+            [name.strip() for name in args.sources.split(',') if name.strip()],
+            args.queue, args.budget_minutes, args.crawl_depth, args.processes
+        )
     except Exception as e:
-        pass
\ No newline at end of file
+        pass
+    finally:
+        # Estado final del run en el textfile
+        live_metrics.stop()
@@ -1,5 +1,11 @@
 #!/bin/bash
 
+# Variables del contenedor (PIPELINE_*, CAPTURE_*, BROWSER_*...), que cron
+# no hereda; las guarda start.sh al iniciar el contenedor
+if [ -f /etc/scraping-corrientes.env ]; then
+    . /etc/scraping-corrientes.env
+fi
+
 # Configurar PATH para cron (cron tiene PATH limitado)
 export PATH="/usr/local/bin:/usr/bin:/bin:/usr/local/sbin:/usr/sbin:/sbin"
 
@@ -63,24 +69,9 @@ if [ ! -f "main.py" ]; then
 fi
 
 # =============================================================================
-# CREAR BACKUP DE DATOS ANTERIORES 
-# =============================================================================
-BACKUP_DIR="/app/backups/$(date +%Y%m%d_%H%M%S)"
-if [ -d "db" ] && [ "$(ls -A db)" ]; then
-    log "💾 Creando backup de datos anteriores en $BACKUP_DIR"
-    mkdir -p "$BACKUP_DIR"
-    cp -r db/* "$BACKUP_DIR/" 2>/dev/null || true
-    cp -r docs/* "$BACKUP_DIR/" 2>/dev/null || true
-    log "✅ Backup completado"
-fi
-
-# =============================================================================
-# EJECUTAR EL PIPELINE PRINCIPAL
+# DETECTAR PYTHON
 # =============================================================================
 
-log "⚙️  Ejecutando Main.py..."
-
-# Ejecutar main.py y capturar el código de salida
 # Verificar que Python esté disponible con rutas explícitas
 if [ -x "/usr/local/bin/python3" ]; then
     PYTHON_CMD="/usr/local/bin/python3"
@@ -101,6 +92,27 @@ fi
 
 log "🐍 Usando comando Python: $PYTHON_CMD"
 
+# =============================================================================
+# CREAR BACKUP INCREMENTAL DE DATOS ANTERIORES 
+# =============================================================================
+if [ -d "db" ] && [ "$(ls -A db)" ]; then
+    log "💾 Creando backup incremental en /app/backups"
+    if $PYTHON_CMD setup/backup.py create; then
+        log "✅ Backup completado"
+    else
+        log "⚠️  Falló el backup, se continúa con el pipeline"
+    fi
+fi
+
+# =============================================================================
+# EJECUTAR EL PIPELINE PRINCIPAL
+# =============================================================================
+
+# Aplicar cambios de esquema pendientes (idempotente)
+$PYTHON_CMD setup/initialize_db.py --migrate > /dev/null || log "⚠️  No se pudo migrar el esquema"
+
+log "⚙️  Ejecutando Main.py..."
+
 if $PYTHON_CMD main.py; then
     EXIT_CODE=$?
     log "✅ Pipeline ejecutado exitosamente (código: $EXIT_CODE)"
@@ -108,8 +120,8 @@ if $PYTHON_CMD main.py; then
     # Verificar que se creó la base de datos SQLite
     if [ -f "db/licitar.db" ]; then
         # Usar SQLite para obtener estadísticas de la última ejecución
-        CURRENT_PAGES=$(sqlite3 db/licitar.db "SELECT COUNT(*) FROM licitaciones WHERE run_id = (SELECT MAX(id) FROM runs);")
-        TOTAL_PAGES=$(sqlite3 db/licitar.db "SELECT COUNT(*) FROM licitaciones;")
+        CURRENT_PAGES=$(sqlite3 db/licitar.db "SELECT total_licitaciones FROM estadisticas_runs WHERE run_id = (SELECT MAX(id) FROM runs);")
+        TOTAL_PAGES=$(sqlite3 db/licitar.db "SELECT COALESCE(SUM(total_licitaciones), 0) FROM estadisticas_runs;")
         TOTAL_HTML=$(find docs/pages_html -name "*.html" 2>/dev/null | wc -l)
         TOTAL_PNG=$(find docs/pages_png -name "*.png" 2>/dev/null | wc -l)
         
@@ -141,7 +153,7 @@ fi
 # LIMPIAR ARCHIVOS ANTIGUOS 
 # =============================================================================
 log "🧹 Limpiando backups antiguos (>7 días)..."
-find /app/backups -type d -mtime +7 -exec rm -rf {} + 2>/dev/null || true
+$PYTHON_CMD setup/backup.py prune --dias 7 || true
 
 # =============================================================================
 # FINALIZAR
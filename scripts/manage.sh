@@ -105,6 +105,54 @@ run_manual() {
     docker-compose exec scraping-corrientes /app/scripts/cron_job.sh
 }
 
+# Función para ver el progreso del run desde las métricas en vivo
+show_metrics() {
+    METRICS_FILE="logs/metrics/pipeline.prom"
+    if [ -n "$METRICS_URL" ]; then
+        METRICS=$(curl -fsS "$METRICS_URL" 2>/dev/null || true)
+    elif [ -f "$METRICS_FILE" ]; then
+        METRICS=$(cat "$METRICS_FILE")
+    else
+        return 0
+    fi
+    if [ -z "$METRICS" ]; then
+        warn "No se pudieron leer las métricas (${METRICS_URL:-$METRICS_FILE})"
+        return 0
+    fi
+    
+    echo ""
+    echo -e "${BLUE}=== PROGRESO DEL RUN ===${NC}"
+    echo "$METRICS" | awk -v now="$(date +%s)" '
+        /^#/ { next }
+        /^pipeline_pages_total/ {
+            match($0, /source="[^"]*"/); source = substr($0, RSTART + 8, RLENGTH - 9)
+            if ($0 ~ /result="done"/) done[source] = $2; else failed[source] = $2
+            sources[source] = 1
+        }
+        /^pipeline_pages_pending/ {
+            match($0, /source="[^"]*"/); source = substr($0, RSTART + 8, RLENGTH - 9)
+            pending[source] = $2; sources[source] = 1
+        }
+        /^pipeline_stage_active/ && $2 == 1 {
+            match($0, /stage="[^"]*"/); active = active " " substr($0, RSTART + 7, RLENGTH - 8)
+        }
+        /^pipeline_stage_throughput_per_second/ {
+            match($0, /stage="[^"]*"/); throughput[substr($0, RSTART + 7, RLENGTH - 8)] = $2
+        }
+        /^pipeline_navigations_in_flight / { in_flight = $2 }
+        /^pipeline_last_progress_timestamp_seconds / { last = $2 }
+        /^pipeline_browser_memory_bytes / { memory = $2 }
+        END {
+            for (s in sources)
+                printf "📄 %s: %d capturadas, %d con error, %d pendientes\n", s, done[s], failed[s], pending[s]
+            printf "🏃 Etapas activas:%s\n", (active == "" ? " ninguna" : active)
+            for (st in throughput) printf "   %s: %.2f ítems/s\n", st, throughput[st]
+            printf "🌐 Navegaciones en curso: %d\n", in_flight
+            if (memory != "") printf "🧠 Memoria de Chromium: %.0f MB\n", memory / 1048576
+            if (last != "") printf "⏱️  Última página terminada hace %ds\n", now - last
+        }'
+}
+
 # Función para ver estado
 show_status() {
     log "Estado del sistema:"
@@ -123,6 +171,9 @@ show_status() {
         warn "No se encontraron logs de hoy"
     fi
     
+    # Progreso del run (métricas en vivo, PIPELINE_METRICS=1)
+    show_metrics
+    
     # Estadísticas de datos
     if [ -d "corrientes/db" ]; then
         echo ""
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Backups incrementales y deduplicados de db/ y docs/.
+
+Cada snapshot es solo un manifiesto (ruta -> hash) y el contenido vive una
+única vez en un almacén direccionado por contenido (backups/objects). Los
+archivos cuyo tamaño y mtime no cambiaron reutilizan el hash del snapshot
+anterior sin volver a leerse, por lo que el costo diario es proporcional a
+lo que cambió. La base SQLite se copia con la API de backup en línea.
+
+Uso:
+    python setup/backup.py create
+    python setup/backup.py list
+    python setup/backup.py restore [SNAPSHOT] [--solo-db]
+    python setup/backup.py prune [--dias 7] [--minimo 1]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+DB_NAME = "licitar.db"
+# Directorios del proyecto incluidos en el backup
+BACKUP_SOURCES = ["db", "docs"]
+# Archivos auxiliares de SQLite que nunca se copian directamente
+SQLITE_SIDE_FILES = {DB_NAME, DB_NAME + "-wal", DB_NAME + "-shm", DB_NAME + "-journal"}
+# Copias completas del esquema anterior (backups/YYYYmmdd_HHMMSS/ con cp -r)
+LEGACY_BACKUP_DIR = re.compile(r"^\d{8}_\d{6}$")
+
+
+def get_project_root():
+    """Obtiene la ruta raíz del proyecto"""
+    return Path(__file__).parent.parent
+
+
+def get_backup_root():
+    """Obtiene el directorio de backups (configurable con BACKUP_DIR)"""
+    return Path(os.environ.get("BACKUP_DIR", get_project_root() / "backups"))
+
+
+def hash_file(file_path):
+    """Calcula el SHA-256 de un archivo leyendo en bloques"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(backup_root, file_hash):
+    """Ruta del objeto dentro del almacén direccionado por contenido"""
+    return backup_root / "objects" / file_hash[:2] / file_hash
+
+
+def store_object(backup_root, source_path, file_hash):
+    """Copia un archivo al almacén si su contenido todavía no existe.
+
+    Se copia en lugar de crear un hardlink porque el pipeline reescribe los
+    archivos en el mismo inodo y eso alteraría el backup.
+    """
+    target = object_path(backup_root, file_hash)
+    if target.exists():
+        return False
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_target = target.with_suffix(".tmp")
+    shutil.copy2(source_path, tmp_target)
+    os.replace(tmp_target, target)
+    return True
+
+
+def snapshots_dir(backup_root):
+    return backup_root / "snapshots"
+
+
+def list_snapshots(backup_root):
+    """Devuelve los nombres de snapshot ordenados del más viejo al más nuevo"""
+    directory = snapshots_dir(backup_root)
+    if not directory.exists():
+        return []
+    return sorted(p.name[:-len(".json.gz")] for p in directory.glob("*.json.gz"))
+
+
+def load_manifest(backup_root, name):
+    """Carga el manifiesto de un snapshot"""
+    with gzip.open(snapshots_dir(backup_root) / f"{name}.json.gz", "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(backup_root, name, manifest):
+    """
+    Escribe el manifiesto de forma atómica, sin pisar uno existente: si ya
+    hay un snapshot con ese nombre (dos backups en el mismo segundo) se usa
+    name_2, name_3, ...
+
+    Returns:
+        Nombre con el que quedó guardado el snapshot
+    """
+    directory = snapshots_dir(backup_root)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f"{name}.json.gz.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    try:
+        candidate, suffix = name, 1
+        while True:
+            try:
+                # link falla si el destino existe (replace lo pisaría)
+                os.link(tmp_path, directory / f"{candidate}.json.gz")
+                return candidate
+            except FileExistsError:
+                suffix += 1
+                candidate = f"{name}_{suffix}"
+    finally:
+        tmp_path.unlink()
+
+
+def iter_project_files(project_root):
+    """Recorre los archivos a respaldar (excepto la base SQLite)"""
+    for source in BACKUP_SOURCES:
+        base = project_root / source
+        if not base.exists():
+            continue
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                if filename in SQLITE_SIDE_FILES or filename.endswith(".tmp"):
+                    continue
+                file_path = Path(dirpath) / filename
+                yield file_path.relative_to(project_root).as_posix(), file_path
+
+
+def backup_sqlite(project_root, backup_root):
+    """Copia licitar.db con la API de backup en línea y la guarda como objeto"""
+    db_file = project_root / "db" / DB_NAME
+    if not db_file.exists():
+        return None
+
+    tmp_dir = backup_root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_copy = tmp_dir / f"{DB_NAME}.{os.getpid()}"
+
+    source = sqlite3.connect(str(db_file))
+    target = sqlite3.connect(str(tmp_copy))
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        file_hash = hash_file(tmp_copy)
+        size = tmp_copy.stat().st_size
+        target_path = object_path(backup_root, file_hash)
+        if target_path.exists():
+            stored = False
+        else:
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_copy, target_path)
+            stored = True
+    finally:
+        if tmp_copy.exists():
+            tmp_copy.unlink()
+
+    return {"hash": file_hash, "size": size, "stored": stored}
+
+
+def create_backup(project_root=None, backup_root=None):
+    """Crea un snapshot incremental y devuelve un resumen"""
+    project_root = Path(project_root or get_project_root())
+    backup_root = Path(backup_root or get_backup_root())
+    start_time = time.time()
+
+    previous_files = {}
+    existing = list_snapshots(backup_root)
+    if existing:
+        previous_files = load_manifest(backup_root, existing[-1]).get("files", {})
+
+    files = {}
+    summary = {"archivos": 0, "nuevos": 0, "reutilizados": 0, "bytes_copiados": 0}
+
+    for rel_path, file_path in iter_project_files(project_root):
+        stat = file_path.stat()
+        previous = previous_files.get(rel_path)
+
+        if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            # Sin cambios desde el snapshot anterior: no se vuelve a leer
+            file_hash = previous["hash"]
+            summary["reutilizados"] += 1
+        else:
+            file_hash = hash_file(file_path)
+            if store_object(backup_root, file_path, file_hash):
+                summary["nuevos"] += 1
+                summary["bytes_copiados"] += stat.st_size
+            else:
+                summary["reutilizados"] += 1
+
+        files[rel_path] = {"hash": file_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        summary["archivos"] += 1
+
+    db_info = backup_sqlite(project_root, backup_root)
+    if db_info:
+        files[f"db/{DB_NAME}"] = {"hash": db_info["hash"], "size": db_info["size"], "mtime_ns": None}
+        summary["archivos"] += 1
+        if db_info["stored"]:
+            summary["nuevos"] += 1
+            summary["bytes_copiados"] += db_info["size"]
+        else:
+            summary["reutilizados"] += 1
+
+    name = write_manifest(backup_root, datetime.now().strftime("%Y%m%d_%H%M%S"), {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+    })
+
+    summary["snapshot"] = name
+    summary["segundos"] = round(time.time() - start_time, 2)
+    return summary
+
+
+def prune_legacy_backups(backup_root, limit):
+    """Elimina las copias completas del esquema anterior más viejas que `limit`"""
+    removed = []
+    if not backup_root.exists():
+        return removed
+    for directory in sorted(backup_root.iterdir()):
+        if directory.is_dir() and LEGACY_BACKUP_DIR.match(directory.name) and directory.stat().st_mtime < limit:
+            shutil.rmtree(directory)
+            removed.append(directory.name)
+    return removed
+
+
+def prune_backups(dias=7, minimo=1, backup_root=None):
+    """
+    Elimina snapshots más viejos que `dias`, los objetos sin referencias y
+    las copias completas que dejaba el backup anterior
+    """
+    backup_root = Path(backup_root or get_backup_root())
+    snapshots = list_snapshots(backup_root)
+    limit = time.time() - dias * 86400
+
+    removed = []
+    for name in snapshots[:max(len(snapshots) - minimo, 0)]:
+        manifest_path = snapshots_dir(backup_root) / f"{name}.json.gz"
+        if manifest_path.stat().st_mtime < limit:
+            manifest_path.unlink()
+            removed.append(name)
+
+    # Recolectar objetos que ya no referencia ningún snapshot
+    live_hashes = set()
+    for name in list_snapshots(backup_root):
+        for info in load_manifest(backup_root, name)["files"].values():
+            live_hashes.add(info["hash"])
+
+    freed_bytes = 0
+    objects_dir = backup_root / "objects"
+    if objects_dir.exists():
+        for obj in objects_dir.glob("*/*"):
+            if obj.name not in live_hashes:
+                freed_bytes += obj.stat().st_size
+                obj.unlink()
+
+    legacy_removed = prune_legacy_backups(backup_root, limit)
+
+    return {"eliminados": removed, "legacy_eliminados": legacy_removed, "bytes_liberados": freed_bytes}
+
+
+def restore_backup(name=None, solo_db=False, project_root=None, backup_root=None):
+    """Restaura un snapshot (por defecto el más reciente)"""
+    project_root = Path(project_root or get_project_root())
+    backup_root = Path(backup_root or get_backup_root())
+
+    snapshots = list_snapshots(backup_root)
+    if not snapshots:
+        raise FileNotFoundError(f"No hay snapshots en {backup_root}")
+    name = name or snapshots[-1]
+    if name not in snapshots:
+        raise FileNotFoundError(f"Snapshot no encontrado: {name}")
+
+    files = load_manifest(backup_root, name)["files"]
+    restored = 0
+
+    for rel_path, info in files.items():
+        source = object_path(backup_root, info["hash"])
+        target = project_root / rel_path
+
+        if rel_path == f"db/{DB_NAME}":
+            # Restaurar en línea para no romper conexiones abiertas
+            target.parent.mkdir(parents=True, exist_ok=True)
+            src_conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            dst_conn = sqlite3.connect(str(target))
+            try:
+                src_conn.backup(dst_conn)
+            finally:
+                dst_conn.close()
+                src_conn.close()
+            restored += 1
+            continue
+
+        if solo_db:
+            continue
+
+        if target.exists() and target.stat().st_size == info["size"] and hash_file(target) == info["hash"]:
+            continue
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, target)
+        restored += 1
+
+    return {"snapshot": name, "restaurados": restored}
+
+
+def format_bytes(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Backups incrementales de db/ y docs/")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("create", help="Crear un snapshot")
+    subparsers.add_parser("list", help="Listar snapshots")
+
+    restore_parser = subparsers.add_parser("restore", help="Restaurar un snapshot")
+    restore_parser.add_argument("snapshot", nargs="?", help="Nombre del snapshot (por defecto el último)")
+    restore_parser.add_argument("--solo-db", action="store_true", help="Restaurar solo licitar.db")
+
+    prune_parser = subparsers.add_parser("prune", help="Eliminar snapshots antiguos")
+    prune_parser.add_argument("--dias", type=int, default=7, help="Días de retención")
+    prune_parser.add_argument("--minimo", type=int, default=1, help="Snapshots a conservar siempre")
+
+    args = parser.parse_args()
+    command = args.command or "create"
+
+    try:
+        if command == "create":
+            summary = create_backup()
+            print(f"💾 Snapshot {summary['snapshot']} creado en {summary['segundos']}s")
+            print(f"   - Archivos: {summary['archivos']}")
+            print(f"   - Nuevos: {summary['nuevos']} ({format_bytes(summary['bytes_copiados'])})")
+            print(f"   - Reutilizados: {summary['reutilizados']}")
+        elif command == "list":
+            backup_root = get_backup_root()
+            snapshots = list_snapshots(backup_root)
+            if not snapshots:
+                print("No hay snapshots registrados.")
+            for name in snapshots:
+                files = load_manifest(backup_root, name)["files"]
+                total = sum(info["size"] for info in files.values())
+                print(f"{name:<18} {len(files):>7} archivos {format_bytes(total):>12}")
+        elif command == "restore":
+            result = restore_backup(args.snapshot, solo_db=args.solo_db)
+            print(f"♻️  Snapshot {result['snapshot']} restaurado ({result['restaurados']} archivos)")
+        elif command == "prune":
+            result = prune_backups(dias=args.dias, minimo=args.minimo)
+            print(f"🧹 Snapshots eliminados: {len(result['eliminados'])}")
+            if result['legacy_eliminados']:
+                print(f"   - Copias completas antiguas eliminadas: {len(result['legacy_eliminados'])}")
+            print(f"   - Espacio liberado: {format_bytes(result['bytes_liberados'])}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
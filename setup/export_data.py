@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Exportación masiva de licitaciones a Parquet, CSV o JSONL.
+
+Las filas se leen con un cursor por bloques (fetchmany) y se escriben a
+medida que llegan, por lo que la memoria no depende del tamaño del
+historial. En modo --incremental solo se exportan licitaciones con id
+mayor al último exportado (guardado en db/export_state.json).
+
+Uso:
+    python setup/export_data.py parquet -o export.parquet
+    python setup/export_data.py csv -o export.csv --desde 2025-01-01 --estado abierta
+    python setup/export_data.py jsonl -o nuevas.jsonl --incremental
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+
+CHUNK_SIZE = 5000
+
+# Columnas exportadas y su tipo (para el esquema Parquet)
+EXPORT_COLUMNS = [
+    ("id", "int64"),
+    ("run_id", "int64"),
+    ("url", "string"),
+    ("title", "string"),
+    ("numero_licitacion", "string"),
+    ("estado", "string"),
+    ("fecha_publicacion", "string"),
+    ("fecha_apertura", "string"),
+    ("monto_estimado", "float64"),
+    ("moneda", "string"),
+    ("organismo", "string"),
+    ("categoria", "string"),
+    ("run_fecha", "string"),
+    ("html_path", "string"),
+    ("html_hash", "string"),
+    ("png_path", "string"),
+    ("scraped_at", "string"),
+]
+
+BASE_QUERY = """
+    SELECT
+        l.id,
+        l.run_id,
+        l.url,
+        l.title,
+        l.numero_licitacion,
+        l.estado,
+        l.fecha_publicacion,
+        l.fecha_apertura,
+        l.monto_estimado,
+        l.moneda,
+        l.organismo,
+        l.categoria,
+        r.started_at AS run_fecha,
+        ah.path_relativo AS html_path,
+        ah.hash_md5 AS html_hash,
+        ap.path_relativo AS png_path,
+        l.scraped_at
+    FROM licitaciones l
+    LEFT JOIN runs r ON l.run_id = r.id
+    -- Un solo archivo por licitación (el último guardado), así no se
+    -- multiplican las filas si hay varios HTML o PNG
+    LEFT JOIN archivos_html ah
+        ON ah.id = (SELECT MAX(id) FROM archivos_html WHERE licitacion_id = l.id)
+    LEFT JOIN archivos_png ap
+        ON ap.id = (SELECT MAX(id) FROM archivos_png WHERE licitacion_id = l.id)
+"""
+
+
+def get_project_root():
+    """Obtiene la ruta raíz del proyecto"""
+    return Path(__file__).parent.parent
+
+
+def get_state_path():
+    return get_project_root() / "db" / "export_state.json"
+
+
+def connect_database_readonly():
+    """Conecta a la base de datos en modo solo lectura"""
+    db_path = get_project_root() / "db" / "licitar.db"
+
+    if not db_path.exists():
+        print(f"❌ Base de datos no encontrada: {db_path}")
+        sys.exit(1)
+
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def load_export_state():
+    try:
+        with open(get_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_export_state(state):
+    state_path = get_state_path()
+    tmp_path = state_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def build_query(desde=None, hasta=None, run_id=None, estado=None, after_id=None):
+    """Arma la consulta con los filtros pedidos"""
+    conditions = []
+    params = []
+
+    if desde:
+        conditions.append("date(l.scraped_at) >= date(?)")
+        params.append(desde)
+    if hasta:
+        conditions.append("date(l.scraped_at) <= date(?)")
+        params.append(hasta)
+    if run_id is not None:
+        conditions.append("l.run_id = ?")
+        params.append(run_id)
+    if estado:
+        conditions.append("l.estado = ?")
+        params.append(estado)
+    if after_id is not None:
+        conditions.append("l.id > ?")
+        params.append(after_id)
+
+    query = BASE_QUERY
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY l.id"
+    return query, params
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in EXPORT_COLUMNS])
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+        self._names = [name for name, _ in EXPORT_COLUMNS]
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(dict(zip(self._names, row)), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Escribe un row group por bloque; requiere pyarrow"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+
+        self._pa = pa
+        self._schema = pa.schema([(name, getattr(pa, dtype)()) for name, dtype in EXPORT_COLUMNS])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows))
+        arrays = [
+            self._pa.array(column, type=field.type)
+            for column, field in zip(columns, self._schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def export_licitaciones(formato, output, desde=None, hasta=None, run_id=None,
+                        estado=None, incremental=False, clave=None):
+    """Exporta las licitaciones y devuelve la cantidad de filas escritas"""
+    state = load_export_state()
+    state_key = clave or formato
+    after_id = state.get(state_key, 0) if incremental else None
+
+    query, params = build_query(desde, hasta, run_id, estado, after_id)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_name(output.name + ".tmp")
+
+    conn = connect_database_readonly()
+    writer = None
+    total_rows = 0
+    last_id = after_id or 0
+
+    try:
+        writer = WRITERS[formato](tmp_output)
+        cursor = conn.execute(query, params)
+        for rows in iter_chunks(cursor):
+            writer.write_rows(rows)
+            total_rows += len(rows)
+            last_id = max(last_id, rows[-1][0])
+        writer.close()
+    except Exception:
+        if writer is not None:
+            writer.close()
+        tmp_output.unlink(missing_ok=True)
+        raise
+    finally:
+        conn.close()
+
+    os.replace(tmp_output, output)
+
+    if incremental:
+        state[state_key] = last_id
+        save_export_state(state)
+
+    return total_rows, last_id
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Exportar licitaciones de licitar.db")
+    parser.add_argument("formato", choices=sorted(WRITERS), help="Formato de salida")
+    parser.add_argument("-o", "--output", required=True, help="Archivo de salida")
+    parser.add_argument("--desde", help="Fecha mínima de scraping (YYYY-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha máxima de scraping (YYYY-MM-DD)")
+    parser.add_argument("--run", type=int, dest="run_id", help="Exportar solo un run")
+    parser.add_argument("--estado", help="Filtrar por estado de la licitación")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Exportar solo lo nuevo desde la última exportación")
+    parser.add_argument("--clave", help="Clave del estado incremental (por defecto el formato)")
+    args = parser.parse_args()
+
+    try:
+        total_rows, last_id = export_licitaciones(
+            args.formato, args.output,
+            desde=args.desde, hasta=args.hasta, run_id=args.run_id,
+            estado=args.estado, incremental=args.incremental, clave=args.clave
+        )
+        print(f"📤 Exportadas {total_rows} filas a {args.output}")
+        print(f"   - Último id exportado: {last_id}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
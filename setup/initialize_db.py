@@ -37,8 +37,9 @@ def initialize_database(db_path, schema_content):
         connection = sqlite3.connect(db_path)
         cursor = connection.cursor()
         
-        # Habilitar foreign keys
+        # Habilitar foreign keys y WAL (lectores concurrentes durante el scraping)
         cursor.execute("PRAGMA foreign_keys = ON;")
+        cursor.execute("PRAGMA journal_mode = WAL;")
         
         # Ejecutar el esquema completo
         print("🔨 Ejecutando schema.sql...")
@@ -107,6 +108,120 @@ def initialize_database(db_path, schema_content):
         return False
 
 
+# Columnas agregadas a tablas existentes: (tabla, columna, definición).
+# CREATE TABLE IF NOT EXISTS no las agrega en bases ya creadas.
+COLUMN_MIGRATIONS = [
+    ("runs", "source", "VARCHAR(50) DEFAULT 'corrientes'"),
+    ("metricas_ejecucion", "assets_cache_hits", "INTEGER DEFAULT 0"),
+    ("metricas_ejecucion", "assets_cache_misses", "INTEGER DEFAULT 0"),
+    ("metricas_ejecucion", "assets_cache_hit_rate", "REAL DEFAULT 0"),
+    ("metricas_ejecucion", "assets_bytes_ahorrados", "INTEGER DEFAULT 0"),
+    ("metricas_ejecucion", "paginas_relacionadas", "INTEGER DEFAULT 0"),
+    ("metricas_ejecucion", "documentos_relacionados", "INTEGER DEFAULT 0"),
+    ("frontera", "licitacion_url", "VARCHAR(1000)"),
+    ("frontera", "png_path", "VARCHAR(500)"),
+]
+
+
+def apply_column_migrations(connection):
+    """Agrega las columnas nuevas que falten en tablas existentes"""
+    for table, column, definition in COLUMN_MIGRATIONS:
+        existing = [row[1] for row in connection.execute(f"PRAGMA table_info({table});")]
+        if existing and column not in existing:
+            print(f"➕ Agregando columna {table}.{column}")
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+
+# Conteos reales por run, para comparar con estadisticas_runs
+RUN_STATISTICS_QUERY = """
+    SELECT
+        r.id,
+        (SELECT COUNT(*) FROM licitaciones l WHERE l.run_id = r.id),
+        (SELECT COUNT(*) FROM archivos_html ah
+            JOIN licitaciones l ON ah.licitacion_id = l.id WHERE l.run_id = r.id),
+        (SELECT COUNT(*) FROM archivos_png ap
+            JOIN licitaciones l ON ap.licitacion_id = l.id WHERE l.run_id = r.id),
+        (SELECT COUNT(*) FROM scraping_errors se WHERE se.run_id = r.id)
+    FROM runs r
+"""
+
+
+def repair_run_statistics(connection):
+    """Recalcula desde las tablas base los resúmenes de estadisticas_runs que difieren
+
+    Returns:
+        Cantidad de runs corregidos
+    """
+    stored = {
+        row[0]: tuple(row[1:])
+        for row in connection.execute("""
+            SELECT run_id, total_licitaciones, total_html_files, total_png_files, total_errors
+            FROM estadisticas_runs
+        """)
+    }
+    fixed = [
+        row for row in connection.execute(RUN_STATISTICS_QUERY)
+        if stored.get(row[0]) != tuple(row[1:])
+    ]
+    connection.executemany("""
+        INSERT OR REPLACE INTO estadisticas_runs (
+            run_id, total_licitaciones, total_html_files, total_png_files, total_errors
+        )
+        VALUES (?, ?, ?, ?, ?)
+    """, fixed)
+    if fixed:
+        print(f"🔧 Estadísticas recalculadas para {len(fixed)} runs")
+    return len(fixed)
+
+
+def backfill_search_index(connection):
+    """Indexa en busqueda_fts las URLs capturadas antes del índice (título y campos de la licitación)
+
+    Returns:
+        Cantidad de URLs indexadas
+    """
+    cursor = connection.execute("""
+        INSERT INTO busqueda_fts (url, title, texto)
+        SELECT
+            l.url,
+            COALESCE(l.title, ''),
+            TRIM(COALESCE(l.description, '') || ' ' || COALESCE(l.numero_licitacion, '')
+                 || ' ' || COALESCE(l.organismo, ''))
+        FROM licitaciones l
+        JOIN (SELECT MAX(id) AS id FROM licitaciones GROUP BY url) ultimas ON l.id = ultimas.id
+        WHERE l.url NOT IN (SELECT url FROM busqueda_fts)
+    """)
+    if cursor.rowcount > 0:
+        print(f"🔎 Índice de búsqueda completado con {cursor.rowcount} URLs")
+    return cursor.rowcount
+
+
+def migrate_database(db_path, schema_content):
+    """Aplica el esquema sobre una base existente sin borrar datos.
+
+    schema.sql es idempotente (IF NOT EXISTS), así que volver a ejecutarlo
+    agrega tablas, índices, triggers y vistas nuevas. Las columnas nuevas se
+    agregan antes, porque el esquema puede indexarlas. Al final se corrigen
+    los resúmenes de estadisticas_runs que se hayan desviado y se indexan
+    para búsqueda las URLs anteriores a busqueda_fts.
+    """
+    try:
+        connection = sqlite3.connect(db_path)
+        connection.execute("PRAGMA foreign_keys = ON;")
+        connection.execute("PRAGMA journal_mode = WAL;")
+        apply_column_migrations(connection)
+        connection.executescript(schema_content)
+        repair_run_statistics(connection)
+        backfill_search_index(connection)
+        connection.commit()
+        connection.close()
+        print(f"✅ Esquema aplicado sobre {db_path}")
+        return True
+    except sqlite3.Error as e:
+        print(f"❌ Error de SQLite durante la migración: {e}")
+        return False
+
+
 def verify_database_integrity(db_path):
     """Verifica la integridad de la base de datos creada"""
     try:
@@ -155,6 +270,16 @@ def main():
     print(f"🗃️  Base de datos: {db_path}")
     print()
     
+    # Modo migración: actualizar una base existente sin recrearla
+    if "--migrate" in sys.argv[1:]:
+        schema_content = read_schema_sql(schema_path)
+        if db_path.exists():
+            success = migrate_database(db_path, schema_content)
+        else:
+            success = initialize_database(db_path, schema_content)
+        sys.exit(0 if success else 1)
+    
+    
     # Verificar si ya existe la base de datos
     if db_path.exists():
         response = input("⚠️  La base de datos ya existe. ¿Deseas recrearla? (s/N): ")
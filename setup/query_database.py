@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
+import difflib
 import sqlite3
 import sys
+import zlib
 from pathlib import Path
 from datetime import datetime
 
@@ -30,19 +32,29 @@ def show_stats():
     print("📊 ESTADÍSTICAS GENERALES")
     print("=" * 50)
     
-    # Estadísticas básicas
-    stats_queries = [
-        ("Total de ejecuciones", "SELECT COUNT(*) FROM runs"),
-        ("Ejecuciones completadas", "SELECT COUNT(*) FROM runs WHERE status = 'completed'"),
-        ("Total de licitaciones", "SELECT COUNT(*) FROM licitaciones"),
-        ("Archivos HTML", "SELECT COUNT(*) FROM archivos_html"),
-        ("Archivos PNG", "SELECT COUNT(*) FROM archivos_png"),
-        ("Errores registrados", "SELECT COUNT(*) FROM scraping_errors"),
+    # Estadísticas básicas (leídas del resumen mantenido por triggers)
+    cursor.execute("""
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(status = 'completed'), 0),
+            COALESCE(SUM(e.total_licitaciones), 0),
+            COALESCE(SUM(e.total_html_files), 0),
+            COALESCE(SUM(e.total_png_files), 0),
+            COALESCE(SUM(e.total_errors), 0)
+        FROM runs r
+        LEFT JOIN estadisticas_runs e ON r.id = e.run_id
+    """)
+    
+    labels = [
+        "Total de ejecuciones",
+        "Ejecuciones completadas",
+        "Total de licitaciones",
+        "Archivos HTML",
+        "Archivos PNG",
+        "Errores registrados",
     ]
     
-    for label, query in stats_queries:
-        cursor.execute(query)
-        count = cursor.fetchone()[0]
+    for label, count in zip(labels, cursor.fetchone()):
         print(f"{label:.<30} {count:>6}")
     
     print()
@@ -73,18 +85,21 @@ def show_recent_runs(limit=10):
     cursor = conn.cursor()
     
     print(f"🚀 ÚLTIMAS {limit} EJECUCIONES")
-    print("=" * 70)
+    print("=" * 80)
     
     cursor.execute("""
         SELECT 
-            id,
-            started_at,
-            finished_at,
-            status,
-            total_pages,
-            execution_time_seconds
-        FROM runs
-        ORDER BY started_at DESC
+            r.id,
+            r.started_at,
+            r.finished_at,
+            r.status,
+            r.total_pages,
+            r.execution_time_seconds,
+            COALESCE(e.total_licitaciones, 0),
+            COALESCE(e.total_errors, 0)
+        FROM runs r
+        LEFT JOIN estadisticas_runs e ON r.id = e.run_id
+        ORDER BY r.started_at DESC
         LIMIT ?
     """, (limit,))
     
@@ -94,11 +109,11 @@ def show_recent_runs(limit=10):
         print("No hay ejecuciones registradas.")
         return
     
-    print(f"{'ID':<4} {'Inicio':<20} {'Estado':<12} {'Páginas':<8} {'Tiempo':<8}")
-    print("-" * 70)
+    print(f"{'ID':<4} {'Inicio':<20} {'Estado':<12} {'Páginas':<8} {'Licit.':<7} {'Errores':<8} {'Tiempo':<8}")
+    print("-" * 80)
     
     for run in runs:
-        run_id, started, finished, status, pages, exec_time = run
+        run_id, started, finished, status, pages, exec_time, licitaciones, errores = run
         
         # Formatear fecha
         try:
@@ -110,7 +125,7 @@ def show_recent_runs(limit=10):
         pages_str = str(pages) if pages else "0"
         time_str = f"{exec_time}s" if exec_time else "N/A"
         
-        print(f"{run_id:<4} {start_str:<20} {status:<12} {pages_str:<8} {time_str:<8}")
+        print(f"{run_id:<4} {start_str:<20} {status:<12} {pages_str:<8} {licitaciones:<7} {errores:<8} {time_str:<8}")
     
     conn.close()
 
@@ -224,8 +239,73 @@ def show_last_run_details():
         print(f"  Páginas con error: {metrics[4]}")
         print(f"  Archivos HTML creados: {metrics[5]}")
         print(f"  Archivos PNG creados: {metrics[6]}")
+
+        # Columnas agregadas por migración: se consultan por nombre
+        try:
+            cursor.execute("""
+                SELECT assets_cache_hits, assets_cache_misses,
+                       assets_cache_hit_rate, assets_bytes_ahorrados
+                FROM metricas_ejecucion WHERE run_id = ?
+            """, (run_id,))
+            hits, misses, hit_rate, saved = cursor.fetchone()
+        except sqlite3.OperationalError:
+            # Base sin migrar (ver initialize_db.py --migrate)
+            hits = misses = 0
+        if hits or misses:
+            print(f"  Caché de assets: {hits} aciertos / {misses} descargas "
+                  f"({hit_rate:.0%}, {saved / 1024 / 1024:.1f} MB ahorrados)")
+
+    conn.close()
+
+
+def show_content_diff(licitacion_id):
+    """Diff del contenido principal de una licitación contra su versión anterior"""
+    conn = connect_database()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT url FROM licitaciones WHERE id = ?", (licitacion_id,))
+    row = cursor.fetchone()
+    if not row:
+        print(f"No existe la licitación {licitacion_id}.")
+        return
+    url = row[0]
     
+    # Versiones guardadas (solo se guarda el documento cuando cambió)
+    cursor.execute("""
+        SELECT c.licitacion_id, c.created_at, c.contenido
+        FROM contenido_principal c
+        WHERE c.url = ? AND c.contenido IS NOT NULL AND c.licitacion_id <= ?
+        ORDER BY c.id DESC
+        LIMIT 2
+    """, (url, licitacion_id))
+    versions = cursor.fetchall()
     conn.close()
+    
+    print(f"🔀 CAMBIOS EN {url}")
+    print("=" * 80)
+    
+    if not versions:
+        print("No hay contenido principal registrado.")
+        return
+    if len(versions) == 1:
+        print("Sin versiones anteriores con cambios.")
+        return
+    
+    (new_id, new_date, new_blob), (old_id, old_date, old_blob) = versions
+    
+    def lines(blob):
+        # Una etiqueta de bloque por línea para que el diff sea legible
+        html = zlib.decompress(blob).decode("utf-8")
+        return html.replace("><", ">\n<").splitlines()
+    
+    diff = difflib.unified_diff(
+        lines(old_blob), lines(new_blob),
+        fromfile=f"licitación {old_id} ({old_date})",
+        tofile=f"licitación {new_id} ({new_date})",
+        lineterm=""
+    )
+    for line in diff:
+        print(line)
 
 
 def main():
@@ -244,9 +324,11 @@ def main():
             show_recent_licitaciones()
         elif command == "last":
             show_last_run_details()
+        elif command == "diff" and len(sys.argv) > 2:
+            show_content_diff(int(sys.argv[2]))
         else:
             print("❌ Comando no reconocido.")
-            print("Comandos disponibles: stats, runs, licitaciones, last")
+            print("Comandos disponibles: stats, runs, licitaciones, last, diff <licitacion_id>")
             sys.exit(1)
             
     except Exception as e:
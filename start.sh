@@ -11,8 +11,16 @@ if [ ! -f "/app/db/licitar.db" ]; then
     echo "Inicializando base de datos SQLite..."
     python /app/setup/initialize_db.py
     echo "Base de datos inicializada"
+else
+    echo "Aplicando migraciones de esquema..."
+    python /app/setup/initialize_db.py --migrate
 fi
 
+# cron arranca los jobs con un entorno mínimo: se guarda el del contenedor
+# (variables de docker-compose) para que cron_job.sh lo cargue
+export -p | grep -Ev '^declare -x (PWD|OLDPWD|SHLVL|_)=' > /etc/scraping-corrientes.env
+chmod 0600 /etc/scraping-corrientes.env
+
 # Iniciar el servicio cron
 service cron start
 echo "Servicio cron iniciado"
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+
+# Tipos de recursos estáticos que se sirven desde el caché
+CACHED_RESOURCE_TYPES = {'stylesheet', 'script', 'image', 'font'}
+
+# Headers que no aplican al cuerpo ya decodificado que se guarda
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'cache' / 'assets'
+DEFAULT_MAX_MB = 200
+# Tope de frescura: ni max-age ni la heurística sobre Last-Modified lo superan
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+MAX_ITEM_BYTES = 10 * 1024 * 1024
+# Temporales de escrituras interrumpidas que se borran al abrir el caché
+STALE_TMP_SECONDS = 3600
+
+
+def parse_http_date(value):
+    """Fecha HTTP (Date, Expires, Last-Modified) como timestamp, o None"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, max_age=DEFAULT_MAX_AGE):
+    """
+    Segundos que la respuesta puede servirse sin consultar al portal, según
+    Cache-Control, Expires o (sin ninguno) el 10% de la edad desde
+    Last-Modified, como hacen los navegadores. 0 = revalidar siempre.
+    """
+    cache_control = headers.get('cache-control', '').lower()
+    if 'no-cache' in cache_control:
+        return 0
+
+    match = re.search(r'max-age\s*=\s*"?(\d+)', cache_control)
+    if match:
+        return min(int(match.group(1)), max_age)
+
+    date = parse_http_date(headers.get('date')) or time.time()
+    if 'expires' in headers:
+        # Un Expires inválido (p. ej. "0") significa ya vencido
+        expires = parse_http_date(headers['expires'])
+        return min(max(expires - date, 0), max_age) if expires else 0
+
+    last_modified = parse_http_date(headers.get('last-modified'))
+    if last_modified:
+        return min(max((date - last_modified) * 0.1, 0), max_age)
+    return 0
+
+
+class AssetCache:
+    """
+    Caché en disco de CSS, JS, imágenes y fuentes, compartido entre páginas,
+    contextos y ejecuciones (y entre procesos: las escrituras son atómicas).
+
+    Se engancha con context.route: los recursos vigentes según sus headers
+    HTTP se responden con route.fulfill sin tocar la red; los vencidos con
+    ETag o Last-Modified se revalidan con un pedido condicional (un 304 no
+    vuelve a descargar el cuerpo). El tamaño total se limita desalojando
+    los archivos usados hace más tiempo.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 max_age=DEFAULT_MAX_AGE):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._counters = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = self._scan_size()
+
+    # ------------------------------------------------------------------
+    # Almacenamiento
+    # ------------------------------------------------------------------
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        folder = self.directory / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    def _scan_size(self):
+        # Temporales que dejó un proceso cortado a mitad de una escritura
+        limit = time.time() - STALE_TMP_SECONDS
+        for tmp_path in self.directory.glob('*/*.tmp'):
+            try:
+                if tmp_path.stat().st_mtime < limit:
+                    tmp_path.unlink()
+            except OSError:
+                continue
+        return sum(f.stat().st_size for f in self.directory.glob('*/*.body'))
+
+    def get(self, url):
+        """
+        Devuelve (status, headers, body, fresh) si el recurso está en caché;
+        fresh es False si venció y hay que revalidarlo antes de usarlo.
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            fresh = time.time() < meta['expires_at']
+            body = body_path.read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Marcar como usado recientemente para el desalojo LRU
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+        return meta['status'], meta['headers'], body, fresh
+
+    def _meta(self, url, status, headers):
+        stored_at = time.time()
+        return {
+            'url': url,
+            'status': status,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+            'stored_at': stored_at,
+            'expires_at': stored_at + freshness_lifetime(headers, self.max_age),
+        }
+
+    def _write_atomic(self, path, data):
+        # Escritura atómica: otros procesos pueden estar leyendo el mismo recurso
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def refresh(self, url, headers):
+        """Renueva la frescura de un recurso revalidado (304) con los headers nuevos"""
+        _, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        # El 304 trae los headers de caché actualizados (ETag, Expires, ...)
+        merged = {**meta['headers'], **{k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}}
+        self._write_atomic(meta_path, json.dumps(self._meta(url, meta['status'], merged)).encode('utf-8'))
+
+    def put(self, url, status, headers, body):
+        if len(body) > MAX_ITEM_BYTES:
+            return
+        body_path, meta_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = self._meta(url, status, headers)
+
+        try:
+            previous_size = body_path.stat().st_size
+        except OSError:
+            previous_size = 0
+        self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            # Al reemplazar un recurso solo cuenta la diferencia de tamaño
+            self._total_bytes += len(body) - previous_size
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """Borra los recursos menos usados hasta quedar en el 90% del límite"""
+        with self._lock:
+            entries = []
+            for body_path in self.directory.glob('*/*.body'):
+                try:
+                    stat = body_path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, body_path))
+
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, body_path in sorted(entries):
+                if total <= target:
+                    break
+                body_path.unlink(missing_ok=True)
+                body_path.with_suffix('.json').unlink(missing_ok=True)
+                total -= size
+            self._total_bytes = total
+
+    # ------------------------------------------------------------------
+    # Integración con Playwright
+    # ------------------------------------------------------------------
+
+    def attach(self, context):
+        """Intercepta los recursos estáticos de un BrowserContext"""
+        context.route('**/*', self._handle_route)
+
+    def _handle_route(self, route):
+        request = route.request
+        if request.method != 'GET' or request.resource_type not in CACHED_RESOURCE_TYPES:
+            route.continue_()
+            return
+
+        cached = self.get(request.url)
+        if cached and cached[3]:
+            status, headers, body, _ = cached
+            self._count('hits', len(body))
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        conditional = {}
+        if cached:
+            cached_headers = {k.lower(): v for k, v in cached[1].items()}
+            if 'etag' in cached_headers:
+                conditional['if-none-match'] = cached_headers['etag']
+            if 'last-modified' in cached_headers:
+                conditional['if-modified-since'] = cached_headers['last-modified']
+
+        try:
+            if conditional:
+                response = route.fetch(headers={**request.headers, **conditional})
+            else:
+                response = route.fetch()
+        except Exception:
+            # Dejar que el navegador maneje el error de red
+            route.continue_()
+            return
+
+        if response.status == 304 and cached:
+            # Sin cambios en el portal: se renueva la frescura y se sirve del disco
+            status, headers, body, _ = cached
+            self._count('hits', len(body))
+            try:
+                self.refresh(request.url, response.headers)
+            except OSError as e:
+                print(f"⚠️  No se pudo actualizar el caché de {request.url}: {e}")
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        body = response.body()
+        self._count('misses', len(body))
+        cache_control = response.headers.get('cache-control', '').lower()
+        if response.status == 200 and 'no-store' not in cache_control:
+            try:
+                self.put(request.url, response.status, response.headers, body)
+            except OSError as e:
+                print(f"⚠️  No se pudo guardar en caché {request.url}: {e}")
+        route.fulfill(response=response)
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def _count(self, kind, size):
+        # Playwright sync ejecuta los handlers en el hilo dueño del contexto,
+        # así que los contadores por hilo separan las fuentes concurrentes
+        with self._lock:
+            counters = self._counters.setdefault(
+                threading.get_ident(), {'hits': 0, 'misses': 0, 'hit_bytes': 0, 'miss_bytes': 0}
+            )
+            counters[kind] += 1
+            counters['hit_bytes' if kind == 'hits' else 'miss_bytes'] += size
+
+    def merge(self, counters):
+        """Suma al hilo actual los contadores de otro proceso (pool de captura)"""
+        with self._lock:
+            current = self._counters.setdefault(
+                threading.get_ident(), {'hits': 0, 'misses': 0, 'hit_bytes': 0, 'miss_bytes': 0}
+            )
+            for key, value in counters.items():
+                current[key] = current.get(key, 0) + value
+
+    def snapshot(self):
+        """Contadores acumulados del hilo actual"""
+        with self._lock:
+            return dict(self._counters.get(
+                threading.get_ident(), {'hits': 0, 'misses': 0, 'hit_bytes': 0, 'miss_bytes': 0}
+            ))
+
+
+def stats_since(before, after):
+    """Métricas del caché entre dos snapshots, listas para metricas_ejecucion"""
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    total = hits + misses
+    return {
+        'assets_cache_hits': hits,
+        'assets_cache_misses': misses,
+        'assets_cache_hit_rate': round(hits / total, 4) if total else 0,
+        'assets_bytes_ahorrados': after['hit_bytes'] - before['hit_bytes'],
+    }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """
+    Caché compartido por proceso, configurado por entorno:
+    ASSET_CACHE=0 lo desactiva, ASSET_CACHE_DIR y ASSET_CACHE_MB lo ajustan.
+    """
+    global _cache
+    if os.environ.get('ASSET_CACHE', '1') == '0':
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache(
+                os.environ.get('ASSET_CACHE_DIR', DEFAULT_CACHE_DIR),
+                int(os.environ.get('ASSET_CACHE_MB', DEFAULT_MAX_MB)) * 1024 * 1024,
+            )
+        return _cache
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playwright.sync_api import sync_playwright
+
+from asset_cache import get_asset_cache
+import har
+import profiling
+
+
+CHROMIUM_ARGS = ['--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage']
+
+# Servicio de navegador persistente (ver servicio "browser" en docker-compose):
+# Chromium con CDP (http://browser:9222, un solo navegador para todos los
+# clientes) o servidor de Playwright (ws://..., un navegador por cliente)
+BROWSER_WS_ENDPOINT = os.environ.get('BROWSER_WS_ENDPOINT', '')
+BROWSER_CDP_ENDPOINT = os.environ.get('BROWSER_CDP_ENDPOINT', '')
+
+# Milisegundos para conectar al servicio antes de lanzar un Chromium local
+REMOTE_CONNECT_TIMEOUT = 5000
+
+
+class SharedChromium:
+    """
+    Proceso de Chromium compartido por varios hilos.
+
+    Playwright sync no puede compartir objetos entre hilos, así que cada hilo
+    abre su propio driver y se conecta por CDP a este único navegador; cada
+    fuente trabaja en su propio BrowserContext.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.endpoint = None
+        self._user_data_dir = None
+
+    def start(self, timeout=30):
+        with sync_playwright() as p:
+            executable = p.chromium.executable_path
+
+        self._user_data_dir = tempfile.mkdtemp(prefix='chromium-shared-')
+        self.process = subprocess.Popen(
+            [
+                executable,
+                '--headless=new',
+                '--remote-debugging-port=0',
+                f'--user-data-dir={self._user_data_dir}',
+                '--no-first-run',
+                '--no-default-browser-check',
+                *CHROMIUM_ARGS,
+                'about:blank',
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        # Chromium escribe el puerto elegido en DevToolsActivePort
+        port_file = Path(self._user_data_dir) / 'DevToolsActivePort'
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Chromium compartido terminó al iniciar")
+            if port_file.exists():
+                lines = port_file.read_text().splitlines()
+                if lines and lines[0].strip().isdigit():
+                    self.endpoint = f'http://127.0.0.1:{lines[0].strip()}'
+                    return self.endpoint
+            time.sleep(0.1)
+
+        self.stop()
+        raise TimeoutError("Chromium compartido no publicó su puerto CDP")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._user_data_dir:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+        self.process = None
+        self.endpoint = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def remote_service_configured():
+    return bool(BROWSER_WS_ENDPOINT or BROWSER_CDP_ENDPOINT)
+
+
+def cdp_endpoint_by_ip(endpoint):
+    """
+    Chromium rechaza las peticiones al puerto de depuración cuyo Host no es
+    una IP ni localhost, así que el nombre del servicio (browser) se
+    resuelve antes de conectar.
+    """
+    parts = urlsplit(endpoint)
+    if not parts.hostname or parts.hostname == 'localhost':
+        return endpoint
+    address = socket.gethostbyname(parts.hostname)
+    netloc = f"{address}:{parts.port}" if parts.port else address
+    return parts._replace(netloc=netloc).geturl()
+
+
+def connect_remote(playwright):
+    """
+    Conecta al servicio de navegador persistente, si está configurado.
+    Devuelve None si no hay servicio o no responde.
+    """
+    try:
+        if BROWSER_WS_ENDPOINT:
+            # El servidor lanza el navegador con las opciones que pide el cliente
+            return playwright.chromium.connect(
+                BROWSER_WS_ENDPOINT,
+                timeout=REMOTE_CONNECT_TIMEOUT,
+                headers={'x-playwright-launch-options': json.dumps(
+                    {'headless': True, 'args': CHROMIUM_ARGS}
+                )},
+            )
+        if BROWSER_CDP_ENDPOINT:
+            return playwright.chromium.connect_over_cdp(
+                cdp_endpoint_by_ip(BROWSER_CDP_ENDPOINT), timeout=REMOTE_CONNECT_TIMEOUT
+            )
+    except Exception as e:
+        print(f"⚠️  Servicio de navegador no disponible ({e}); se lanza Chromium local")
+    return None
+
+
+@contextmanager
+def open_browser(playwright, endpoint=None):
+    """
+    Conecta al Chromium compartido si hay endpoint; si no, al servicio de
+    navegador persistente si está configurado; si no, lanza uno local.
+    """
+    if endpoint:
+        browser = playwright.chromium.connect_over_cdp(endpoint)
+    else:
+        browser = connect_remote(playwright) if remote_service_configured() else None
+        if browser is None:
+            browser = playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+    try:
+        yield browser
+    finally:
+        browser.close()
+
+
+@contextmanager
+def shared_endpoint():
+    """
+    Endpoint CDP para que varios hilos compartan navegador. Con el servicio
+    persistente configurado no hace falta lanzar nada: cada hilo se conecta
+    a él directamente (endpoint None).
+    """
+    if remote_service_configured():
+        yield None
+        return
+
+    with SharedChromium() as chromium:
+        yield chromium.endpoint
+
+
+def new_context(browser, label='context'):
+    """Crea el contexto de navegación usado por los steps"""
+    context = browser.new_context(**har.context_options(label))
+
+    if har.settings.replaying:
+        # Todo el tráfico sale de los HAR grabados
+        har.attach_replay(context)
+    elif not har.settings.recording:
+        # Recursos estáticos desde el caché persistente en disco (al grabar
+        # se omite para que el HAR tenga el tráfico real)
+        cache = get_asset_cache()
+        if cache:
+            cache.attach(context)
+
+    profiling.start_context_tracing(context)
+    return context
+
+
+@contextmanager
+def browser_page(endpoint=None, label='context'):
+    """Abre driver, navegador, contexto y página; cierra todo al salir"""
+    with sync_playwright() as p:
+        with open_browser(p, endpoint) as browser:
+            context = new_context(browser, label)
+            try:
+                yield context.new_page()
+            finally:
+                context.close()
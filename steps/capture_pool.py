@@ -0,0 +1,220 @@
+import multiprocessing
+import os
+import queue
+import time
+
+import har
+import live_metrics
+import profiling
+from asset_cache import get_asset_cache
+from browser import browser_page
+from scheduler import RunBudget
+from sources import SharedRateLimiter, get_source
+
+
+# Segundos sin noticias de los workers antes de revisar si siguen vivos
+EVENT_TIMEOUT = 5
+
+
+def default_processes():
+    """Procesos de captura: CAPTURE_PROCESSES, o 1 (sin pool)"""
+    return max(1, int(os.environ.get('CAPTURE_PROCESSES', 1)))
+
+
+def shard_urls(urls, processes):
+    """
+    Reparte las URLs intercaladas (1, N+1, 2N+1, ... al primer proceso), así
+    todos avanzan por el orden de prioridad a la vez.
+
+    Returns:
+        Lista de shards de (posición, url), posición desde 1
+    """
+    shards = [[] for _ in range(processes)]
+    for position, url in enumerate(urls, 1):
+        shards[(position - 1) % processes].append((position, url))
+    return [shard for shard in shards if shard]
+
+
+def _worker_settings():
+    """Configuración activada por CLI que los procesos spawn no heredan"""
+    return {
+        'har_mode': har.settings.mode,
+        'har_directory': str(har.session_dir()) if har.settings.mode else None,
+        'profile': profiling.settings.enabled,
+        'slow_page_seconds': profiling.settings.slow_page_seconds,
+        'profile_session': profiling.settings.session,
+        'metrics': live_metrics.settings.enabled,
+    }
+
+
+def _apply_settings(settings):
+    if settings['har_mode']:
+        har.enable(settings['har_mode'], settings['har_directory'])
+    if settings['profile']:
+        profiling.enable(settings['slow_page_seconds'])
+        profiling.settings.session = settings['profile_session']
+
+
+def capture_shard(shard, docs_path, source_name, stem_prefix, deadline, reserve,
+                  settings, next_slot, slot_lock, events):
+    """
+    Proceso worker: abre su propio navegador y captura su shard en orden.
+    Cada resultado se reporta por `events` como (tipo, posición, url, dato,
+    segundos): 'ok' con (html_path, png_path), 'failed' con el error,
+    'pending' si no llegó a intentarse antes de la hora límite, y un 'done'
+    final con los contadores del caché de recursos del proceso. Con métricas
+    activas también se envían 'navigation_started' / 'navigation_finished'
+    con la fuente como dato, para que el padre las registre.
+    """
+    # step2 se importa acá: en el proceso padre lo carga main.py por su path
+    import step2
+
+    _apply_settings(settings)
+    if settings['metrics']:
+        live_metrics.forward_navigations(
+            lambda kind, name, seconds: events.put((kind, None, None, name, seconds))
+        )
+    source = get_source(source_name)
+    # Un solo turno de navegación por portal entre todos los procesos
+    source.limiter = SharedRateLimiter(source.min_interval, next_slot, slot_lock)
+    budget = RunBudget(deadline, reserve)
+    cache = get_asset_cache()
+    reported = set()
+
+    try:
+        with browser_page(label=f"{source_name}-p{os.getpid()}") as page:
+            for position, url in shard:
+                if not budget.allows_another():
+                    events.put(('pending', position, url, None, None))
+                    reported.add(position)
+                    continue
+
+                start = time.monotonic()
+                try:
+                    captured = step2.capture_page(page, url, docs_path, f"{stem_prefix}{position}", source)
+                    outcome = ('ok', captured) if captured else ('failed', 'captura incompleta')
+                except Exception as e:
+                    outcome = ('failed', str(e))
+                elapsed = time.monotonic() - start
+                events.put((outcome[0], position, url, outcome[1], elapsed))
+                reported.add(position)
+                budget.record(elapsed)
+    except Exception as e:
+        # El navegador no abrió o se cayó: lo no reportado queda como fallido
+        for position, url in shard:
+            if position not in reported:
+                events.put(('failed', position, url, f"worker {os.getpid()}: {e}", None))
+    finally:
+        events.put(('done', None, None, cache.snapshot() if cache else None, None))
+
+
+def download_with_pool(urls, docs_path, source, processes, budget=None, stem_prefix=''):
+    """
+    Captura las URLs repartidas entre `processes` procesos, cada uno con su
+    navegador (el rasterizado y la codificación de los screenshots usan
+    todos los núcleos). El límite de frecuencia del portal se respeta entre
+    todos los procesos. El progreso y los errores se informan a medida que
+    llegan; los resultados se devuelven en el orden de `urls`.
+
+    Returns:
+        Lista de tuplas (url, html_path, png_path), como download_page_content
+    """
+    processes = min(processes, len(urls))
+    if processes == 0:
+        return []
+
+    # spawn: no se hereda el estado de Playwright del proceso padre
+    context = multiprocessing.get_context('spawn')
+    events = context.Queue()
+    next_slot = context.Value('d', 0.0, lock=False)
+    slot_lock = context.Lock()
+    settings = _worker_settings()
+    deadline = budget.deadline if budget else None
+    reserve = budget.reserve if budget else 0
+
+    workers = [
+        context.Process(
+            target=capture_shard,
+            args=(shard, str(docs_path), source.name, stem_prefix, deadline, reserve,
+                  settings, next_slot, slot_lock, events),
+            name=f"captura-{n}",
+        )
+        for n, shard in enumerate(shard_urls(urls, processes), 1)
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"🧵 Capturando {len(urls)} URLs con {len(workers)} procesos")
+    live_metrics.set_pending(source.name, len(urls))
+
+    captured = {}
+    failures = {}
+    pending = {}
+    finished = 0
+    navigations_in_flight = 0
+    cache = get_asset_cache()
+    start = time.monotonic()
+
+    while finished < len(workers):
+        try:
+            kind, position, url, payload, seconds = events.get(timeout=EVENT_TIMEOUT)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                # Algún worker murió sin reportar su 'done'
+                break
+            continue
+
+        if kind == 'done':
+            finished += 1
+            if cache and payload:
+                cache.merge(payload)
+            continue
+
+        if kind == 'navigation_started':
+            navigations_in_flight += 1
+            live_metrics.navigation_started(payload)
+            continue
+        if kind == 'navigation_finished':
+            navigations_in_flight -= 1
+            live_metrics.navigation_finished(payload, seconds)
+            continue
+
+        if kind == 'ok':
+            captured[position] = (url, *payload)
+        elif kind == 'failed':
+            failures[position] = (url, payload)
+            print(f"❌ Error procesando {url}: {payload}")
+        else:
+            pending[position] = url
+        if kind != 'pending':
+            live_metrics.page_finished(source.name, kind == 'ok', seconds)
+
+        attempted = len(captured) + len(failures)
+        elapsed = time.monotonic() - start
+        if kind != 'pending' and (attempted % 10 == 0 or attempted == len(urls)):
+            print(f"🔄 {attempted}/{len(urls)} procesadas ({len(failures)} con error, "
+                  f"{attempted / elapsed:.2f} páginas/s)")
+
+    for worker in workers:
+        worker.join()
+
+    # Navegaciones que un worker caído dejó abiertas
+    if navigations_in_flight > 0 and live_metrics.settings.enabled:
+        live_metrics.registry.add('pipeline_navigations_in_flight', -navigations_in_flight)
+
+    # URLs de un worker caído que no llegaron a reportarse
+    for position, url in enumerate(urls, 1):
+        if position not in captured and position not in failures and position not in pending:
+            failures[position] = (url, 'proceso de captura terminado inesperadamente')
+
+    if budget is not None:
+        budget.pending = [pending[position] for position in sorted(pending)]
+        if budget.pending:
+            print(f"⏰ Hora límite alcanzada: {len(budget.pending)} URLs quedan pendientes")
+
+    print(f"📊 Pool de captura: {len(captured)} capturadas, {len(failures)} con error "
+          f"en {time.monotonic() - start:.1f}s")
+    for position in sorted(failures):
+        url, error = failures[position]
+        print(f"   ⚠️  {url}: {error}")
+
+    return [captured[position] for position in sorted(captured)]
@@ -0,0 +1,116 @@
+import hashlib
+import re
+import zlib
+
+from bs4 import BeautifulSoup, Comment
+
+
+# Elementos que nunca forman parte del contenido de una licitación
+BOILERPLATE_TAGS = [
+    'script', 'style', 'noscript', 'template', 'iframe', 'svg', 'canvas',
+    'nav', 'header', 'footer', 'aside', 'form', 'button', 'select', 'input',
+]
+
+# Contenedores candidatos a contenido principal
+CANDIDATE_TAGS = ['article', 'main', 'section', 'div', 'td']
+
+# Atributos que se conservan; el resto (ids generados, clases, estilos,
+# data-* de banners rotativos, tokens) cambia entre capturas sin que
+# cambie el texto
+KEPT_ATTRIBUTES = {'href', 'src', 'alt', 'colspan', 'rowspan'}
+
+# Fracción del texto del mejor candidato que debe conservar un contenedor
+# más interno para preferirlo
+MIN_TEXT_SHARE = 0.7
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _own_text_length(element):
+    """Largo del texto que no está dentro de enlaces (penaliza menús y listados)"""
+    total = len(element.get_text(' ', strip=True))
+    links = sum(len(a.get_text(' ', strip=True)) for a in element.find_all('a'))
+    return total - links
+
+
+def _depth(element):
+    return sum(1 for _ in element.parents)
+
+
+def find_main_content(soup, selector=None):
+    """
+    Elemento con el contenido principal.
+
+    Si la fuente define un selector y existe, se usa. Si no, entre los
+    contenedores con al menos el 70% del texto (fuera de enlaces) del
+    mejor candidato se elige el más profundo: el más ajustado al cuerpo
+    del artículo sin perder texto.
+    """
+    if selector:
+        element = soup.select_one(selector)
+        if element is not None:
+            return element
+
+    candidates = [(el, _own_text_length(el)) for el in soup.find_all(CANDIDATE_TAGS)]
+    candidates = [(el, size) for el, size in candidates if size > 0]
+    if not candidates:
+        return soup.body or soup
+
+    best = max(size for _, size in candidates)
+    eligible = [el for el, size in candidates if size >= best * MIN_TEXT_SHARE]
+    return max(eligible, key=_depth)
+
+
+def normalize(element, boilerplate_selectors=()):
+    """HTML del elemento sin comentarios, sin atributos volátiles y con espacios colapsados"""
+    for comment in element.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for selector in boilerplate_selectors:
+        for node in element.select(selector):
+            node.decompose()
+
+    for node in [element] + element.find_all(True):
+        node.attrs = {k: v for k, v in node.attrs.items() if k in KEPT_ATTRIBUTES}
+
+    html = WHITESPACE_RE.sub(' ', str(element))
+    return re.sub(r'>\s+<', '><', html).strip()
+
+
+def html_to_text(normalized):
+    """Texto plano de un documento normalizado, una línea por bloque"""
+    text = '\n'.join(
+        WHITESPACE_RE.sub(' ', line).strip()
+        for line in BeautifulSoup(normalized, 'lxml').get_text('\n').splitlines()
+    )
+    return re.sub(r'\n{2,}', '\n', text).strip()
+
+
+def extract_main_content(html, source=None):
+    """
+    Documento normalizado con el contenido principal de una página.
+
+    Returns:
+        dict con html (normalizado), texto (para búsqueda y diffs) y hash
+        (sha256 del html normalizado)
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    for node in soup.find_all(BOILERPLATE_TAGS):
+        node.decompose()
+
+    selector = getattr(source, 'main_content_selector', None)
+    main = find_main_content(soup, selector)
+    normalized = normalize(main, getattr(source, 'boilerplate_selectors', ()))
+
+    return {
+        'html': normalized,
+        'texto': html_to_text(normalized),
+        'hash': hashlib.sha256(normalized.encode('utf-8')).hexdigest(),
+    }
+
+
+def compress(text):
+    return zlib.compress(text.encode('utf-8'), 9)
+
+
+def decompress(blob):
+    return zlib.decompress(blob).decode('utf-8')
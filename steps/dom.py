@@ -0,0 +1,97 @@
+import statistics
+import sys
+import time
+
+
+# Se evalúa una sola vez dentro de la página sobre todos los elementos del
+# locator: un solo viaje al navegador en lugar de dos o tres por elemento
+ANCHORS_JS = """
+elements => elements.map(el => ({
+    href: el.getAttribute('href'),
+    text: (el.textContent || '').replace(/\\s+/g, ' ').trim(),
+}))
+"""
+
+
+def extract_anchors(page, selector='a'):
+    """
+    Enlaces que coinciden con `selector` (acepta selectores de Playwright).
+
+    Returns:
+        Lista de dicts con href (tal cual en el HTML, o None) y texto
+        normalizado, en el orden del documento
+    """
+    return page.locator(selector).evaluate_all(ANCHORS_JS)
+
+
+def extract_page_numbers(page, selector):
+    """Números de página visibles en la paginación, en una sola llamada"""
+    numbers = []
+    for text in page.locator(selector).all_text_contents():
+        try:
+            numbers.append(int(text.strip()))
+        except ValueError:
+            continue
+    return numbers
+
+
+def synthetic_listing(links=200, pages=10, nav_links=40):
+    """HTML de un listado como el del portal, para el benchmark"""
+    nav = ''.join(f'<li><a href="/seccion/{i}">Sección {i}</a></li>' for i in range(nav_links))
+    items = ''.join(
+        f'<article><h3><a href="/noticia/licitacion-publica-n-{i}-2024?utm_source=x">'
+        f'Licitación Pública N° {i}/2024</a></h3><p>Obra {i}</p></article>'
+        for i in range(links)
+    )
+    pagination = ''.join(f'<li><a href="?page={i}">{i}</a></li>' for i in range(1, pages + 1))
+    return (
+        f'<html><body><nav><ul>{nav}</ul></nav><main>{items}</main>'
+        f'<ul class="pagination">{pagination}<li><a href="?page=2">Siguiente</a></li>'
+        f'<li><a href="?page={pages}">Último</a></li></ul></body></html>'
+    )
+
+
+def _per_element(page, source):
+    """Forma anterior: un get_attribute / text_content por elemento"""
+    links = [link.get_attribute('href') for link in page.locator(source.detail_link_selector).all()]
+    numbers = []
+    for link in page.locator(source.pagination_selector).all():
+        try:
+            numbers.append(int(link.text_content().strip()))
+        except ValueError:
+            continue
+    return links, numbers
+
+
+def _bulk(page, source):
+    links = [anchor['href'] for anchor in extract_anchors(page, source.detail_link_selector)]
+    return links, extract_page_numbers(page, source.pagination_selector)
+
+
+def benchmark(sizes=(50, 200, 1000), repeat=5):
+    """Compara ambas formas sobre listados sintéticos de distintos tamaños"""
+    from browser import browser_page
+    from sources import get_source
+
+    source = get_source()
+    with browser_page(label='bench-dom') as page:
+        for size in sizes:
+            page.set_content(synthetic_listing(size))
+            timings = {}
+            for name, extract in (('por elemento', _per_element), ('en bloque', _bulk)):
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    result = extract(page, source)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = (statistics.median(samples), result)
+
+            (slow, expected), (fast, result) = timings['por elemento'], timings['en bloque']
+            status = 'OK' if result == expected else 'DIFERENTE'
+            print(f"📏 {size:>5} enlaces: por elemento {slow * 1000:8.1f} ms | "
+                  f"en bloque {fast * 1000:7.1f} ms | x{slow / fast:5.1f} | {status}")
+
+
+if __name__ == "__main__":
+    # Uso: python steps/dom.py [tamaño ...]
+    benchmark(tuple(int(arg) for arg in sys.argv[1:]) or (50, 200, 1000))
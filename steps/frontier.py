@@ -0,0 +1,243 @@
+import hashlib
+import math
+import os
+import struct
+from pathlib import Path
+
+from work_queue import connect
+
+
+# Capacidad inicial del filtro y tasa de falsos positivos buscada
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.01
+
+BLOOM_MAGIC = b'BLM1'
+BLOOM_HEADER = struct.Struct('>4sQIQ')
+
+# Orden de captura por tipo dentro de una misma profundidad (menor = antes)
+TYPE_PRIORITY = {'relacionada': 0, 'documento': 1, 'detalle': 2}
+
+# Lote de filas al reconstruir el filtro desde la base
+REBUILD_BATCH = 10000
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre un bytearray: responde "seguro que no" o "quizás
+    sí" usando ~1,2 MB por millón de URLs al 1% de falsos positivos, en
+    lugar de un set en memoria que crece con el crawl.
+    """
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.num_bits = num_bits or math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, item):
+        # Doble hashing: k posiciones a partir de dos hashes de 64 bits
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def save(self, path):
+        tmp_path = Path(path).with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Filtro guardado en `path`, o None si no existe o no es válido"""
+        try:
+            with open(path, 'rb') as f:
+                magic, num_bits, num_hashes, count = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+        if magic != BLOOM_MAGIC or len(bits) != (num_bits + 7) // 8:
+            return None
+        capacity = int(num_bits * math.log(2) ** 2 / -math.log(BLOOM_ERROR_RATE))
+        return cls(capacity, num_bits=num_bits, num_hashes=num_hashes, bits=bits, count=count)
+
+
+class Frontier:
+    """
+    Frontera persistente del crawl de enlaces relacionados de una fuente.
+
+    La cola vive en la tabla `frontera` (ordenada por profundidad, tipo y
+    orden de descubrimiento), así que un crawl cortado por la hora límite
+    sigue en el próximo run. Para saber si una URL ya se vio se consulta
+    primero el filtro de Bloom: si dice que no, es nueva sin tocar la
+    base; si dice que quizás, se confirma en `frontera` y `licitaciones`.
+    """
+
+    def __init__(self, db_path, source, max_depth):
+        self.db_path = str(db_path)
+        self.source = source
+        self.max_depth = max_depth
+        self.bloom_path = Path(db_path) / f"frontier_{source.name}.bloom"
+        self.bloom = BloomFilter.load(self.bloom_path)
+        if self.bloom is None or self.bloom.full:
+            self.rebuild_bloom()
+
+    def rebuild_bloom(self):
+        """Reconstruye el filtro desde la base (al crearlo o cuando se llena)"""
+        connection = connect(self.db_path)
+        try:
+            total = connection.execute("""
+                SELECT (SELECT COUNT(*) FROM frontera WHERE source = ?)
+                     + (SELECT COUNT(*) FROM licitaciones)
+            """, (self.source.name,)).fetchone()[0]
+            self.bloom = BloomFilter(max(BLOOM_CAPACITY, total * 2))
+
+            cursor = connection.execute("""
+                SELECT url FROM frontera WHERE source = ?
+                UNION SELECT url FROM licitaciones
+            """, (self.source.name,))
+            while True:
+                rows = cursor.fetchmany(REBUILD_BATCH)
+                if not rows:
+                    break
+                for (url,) in rows:
+                    self.bloom.add(url)
+        finally:
+            connection.close()
+        self.bloom.save(self.bloom_path)
+
+    def _seen(self, connection, url):
+        if url not in self.bloom:
+            return False
+        return connection.execute("""
+            SELECT EXISTS(SELECT 1 FROM frontera WHERE url = ?)
+                OR EXISTS(SELECT 1 FROM licitaciones WHERE url = ?)
+        """, (url, url)).fetchone()[0] == 1
+
+    def seed(self, urls):
+        """Registra las URLs del listado (profundidad 0) como ya capturadas"""
+        connection = connect(self.db_path)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("""
+                INSERT OR IGNORE INTO frontera (source, url, profundidad, tipo, prioridad, estado)
+                VALUES (?, ?, 0, 'detalle', 0, 'capturada')
+            """, [(self.source.name, url) for url in urls])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        for url in urls:
+            if url not in self.bloom:
+                self.bloom.add(url)
+
+    def add_links(self, origin_url, html, depth, licitacion_url=None):
+        """
+        Encola los enlaces nuevos de una página capturada que la fuente
+        clasifica como útiles, si `depth` no supera la profundidad máxima.
+        `licitacion_url` es la página de detalle de la que cuelga la cadena
+        (por defecto `origin_url`, es decir, un enlace desde el detalle).
+
+        Returns:
+            Cantidad de URLs encoladas
+        """
+        if depth > self.max_depth:
+            return 0
+
+        licitacion_url = licitacion_url or origin_url
+        new_rows = []
+        connection = connect(self.db_path)
+        try:
+            for url, text in self.source.read_page_links(html):
+                kind = self.source.classify_link(url, text)
+                if kind is None or self._seen(connection, url):
+                    continue
+                new_rows.append((
+                    self.source.name, url, origin_url, licitacion_url, depth, kind,
+                    depth * len(TYPE_PRIORITY) + TYPE_PRIORITY[kind],
+                ))
+                self.bloom.add(url)
+
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("""
+                INSERT OR IGNORE INTO frontera (source, url, origen_url, licitacion_url, profundidad, tipo, prioridad)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, new_rows)
+            connection.execute("COMMIT")
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return len(new_rows)
+
+    def next_item(self):
+        """
+        Próximo enlace pendiente dentro de la profundidad máxima.
+
+        Returns:
+            dict con id, url, licitacion_url, profundidad y tipo, o None si no hay
+        """
+        connection = connect(self.db_path)
+        try:
+            row = connection.execute("""
+                SELECT id, url, licitacion_url, profundidad, tipo FROM frontera
+                WHERE source = ? AND estado = 'pendiente' AND profundidad <= ?
+                ORDER BY prioridad, id
+                LIMIT 1
+            """, (self.source.name, self.max_depth)).fetchone()
+        finally:
+            connection.close()
+
+        if row is None:
+            return None
+        return dict(zip(('id', 'url', 'licitacion_url', 'profundidad', 'tipo'), row))
+
+    def _finish(self, item_id, estado, path=None, png_path=None, error_message=None):
+        connection = connect(self.db_path)
+        try:
+            connection.execute("""
+                UPDATE frontera
+                SET estado = ?, path_relativo = ?, png_path = ?, error_message = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (estado, path, png_path, error_message, item_id))
+        finally:
+            connection.close()
+
+    def complete(self, item_id, path=None, png_path=None):
+        """Marca el enlace como capturado con su documento, o el HTML y PNG de la página"""
+        self._finish(item_id, 'capturada', path, png_path)
+
+    def fail(self, item_id, error_message):
+        self._finish(item_id, 'error', error_message=str(error_message)[:1000])
+
+    def pending_count(self):
+        connection = connect(self.db_path)
+        try:
+            return connection.execute("""
+                SELECT COUNT(*) FROM frontera
+                WHERE source = ? AND estado = 'pendiente' AND profundidad <= ?
+            """, (self.source.name, self.max_depth)).fetchone()[0]
+        finally:
+            connection.close()
+
+    def save(self):
+        self.bloom.save(self.bloom_path)
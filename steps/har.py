@@ -0,0 +1,183 @@
+import base64
+import itertools
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+HAR_ROOT = Path(__file__).parent.parent / 'har'
+
+MODES = ('', 'record', 'replay')
+
+
+class HarSettings:
+    """
+    Configuración de grabación/reproducción de tráfico (desactivada por defecto).
+
+    - record: cada contexto de navegador guarda su tráfico en un HAR dentro
+      de har/<sesión>/, y las consultas HTTP directas (modo watch) en http.har.
+    - replay: Playwright y las consultas HTTP se sirven solo desde los HAR
+      de una sesión grabada; lo que no esté grabado se aborta, sin red.
+    """
+
+    def __init__(self):
+        self.mode = os.environ.get('PIPELINE_HAR', '')
+        self.directory = Path(os.environ['HAR_DIR']) if os.environ.get('HAR_DIR') else None
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+
+settings = HarSettings()
+
+_lock = threading.Lock()
+_counter = itertools.count(1)
+_http_entries = None
+
+
+def enable(mode, directory=None):
+    """Activa la grabación o reproducción para el resto del proceso"""
+    if mode not in MODES:
+        raise ValueError(f"Modo HAR desconocido: {mode}")
+    settings.mode = mode
+    if directory:
+        settings.directory = Path(directory)
+
+
+def session_dir():
+    """
+    Directorio de la sesión: el configurado, o uno nuevo con fecha al
+    grabar, o la última sesión grabada al reproducir.
+    """
+    if settings.directory is None:
+        if settings.recording:
+            settings.directory = HAR_ROOT / datetime.now().strftime('%Y%m%d_%H%M%S')
+        else:
+            sessions = sorted(p for p in HAR_ROOT.glob('*') if p.is_dir()) if HAR_ROOT.exists() else []
+            if not sessions:
+                raise FileNotFoundError(f"No hay sesiones HAR grabadas en {HAR_ROOT}")
+            settings.directory = sessions[-1]
+    return settings.directory
+
+
+def har_files():
+    return sorted(session_dir().glob('*.har'))
+
+
+def context_options(label='context'):
+    """Opciones extra para browser.new_context() al grabar"""
+    if not settings.recording:
+        return {}
+
+    directory = session_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:60]
+    path = directory / f"{next(_counter):03d}-{name}.har"
+    # El HAR se escribe al cerrar el contexto
+    return {'record_har_path': str(path), 'record_har_content': 'embed'}
+
+
+def attach_replay(context):
+    """
+    Sirve todas las peticiones del contexto desde los HAR de la sesión.
+    Cada archivo se registra como una ruta; la última registrada se
+    consulta primero y, si no tiene la petición, cede a la anterior. La
+    primera aborta lo que ningún archivo tiene.
+    """
+    files = [path for path in har_files() if path.name != 'http.har']
+    if not files:
+        raise FileNotFoundError(f"No hay archivos HAR en {session_dir()}")
+
+    for index, path in enumerate(files):
+        context.route_from_har(str(path), not_found='abort' if index == 0 else 'fallback')
+
+
+def _load_http_entries():
+    """Respuestas GET de todos los HAR de la sesión, la última por URL"""
+    global _http_entries
+    with _lock:
+        if _http_entries is None:
+            _http_entries = {}
+            for path in har_files():
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)['log']['entries']
+                for entry in entries:
+                    if entry['request']['method'] == 'GET':
+                        _http_entries[entry['request']['url']] = entry['response']
+    return _http_entries
+
+
+def replay_http(url):
+    """
+    Respuesta grabada para un GET directo (sin navegador).
+
+    Returns:
+        (status, headers dict en minúsculas, body bytes)
+    """
+    response = _load_http_entries().get(url)
+    if response is None:
+        raise LookupError(f"Sin respuesta grabada para {url}")
+
+    content = response.get('content', {})
+    text = content.get('text', '')
+    if content.get('encoding') == 'base64':
+        body = base64.b64decode(text)
+    else:
+        body = text.encode('utf-8')
+    headers = {h['name'].lower(): h['value'] for h in response.get('headers', [])}
+    return response['status'], headers, body
+
+
+def record_http(url, status, headers, body):
+    """Agrega un GET directo a http.har de la sesión"""
+    global _http_entries
+    directory = session_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / 'http.har'
+
+    mime_type = headers.get('Content-Type', 'application/octet-stream')
+    entry = {
+        'startedDateTime': datetime.now(timezone.utc).isoformat(),
+        'time': 0,
+        'request': {
+            'method': 'GET', 'url': url, 'httpVersion': 'HTTP/1.1',
+            'headers': [], 'queryString': [], 'cookies': [],
+            'headersSize': -1, 'bodySize': 0,
+        },
+        'response': {
+            'status': status, 'statusText': '', 'httpVersion': 'HTTP/1.1',
+            'headers': [{'name': k, 'value': v} for k, v in headers.items()],
+            'cookies': [],
+            'content': {
+                'size': len(body),
+                'mimeType': mime_type,
+                'text': base64.b64encode(body).decode('ascii'),
+                'encoding': 'base64',
+            },
+            'redirectURL': '', 'headersSize': -1, 'bodySize': len(body),
+        },
+        'cache': {},
+        'timings': {'send': 0, 'wait': 0, 'receive': 0},
+    }
+
+    with _lock:
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                har = json.load(f)
+        else:
+            har = {'log': {'version': '1.2', 'creator': {'name': 'corrientes', 'version': '1'}, 'entries': []}}
+        har['log']['entries'].append(entry)
+
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(har, f)
+        os.replace(tmp_path, path)
+        _http_entries = None
@@ -0,0 +1,254 @@
+import json
+import os
+from pathlib import Path
+
+
+class JsonlStore:
+    """
+    Log JSONL de solo-agregado con un índice lateral (<archivo>.idx).
+
+    - Cada registro tiene un 'id'; el índice tiene una línea "id offset fin"
+      por cada versión escrita, así que abrir, agregar y cerrar no reescriben
+      el índice completo y asignar ids es O(1).
+    - Actualizar un registro agrega una nueva versión al final; las versiones
+      viejas se eliminan al compactar, que es lo único que reescribe el índice.
+    - Las escrituras se sincronizan a disco (fsync) en lotes; una línea entra
+      al índice solo después de que su registro está sincronizado.
+    - Si el proceso muere, al abrir se descarta la última línea incompleta y
+      se re-indexa solo la cola posterior a lo que cubre el índice.
+    """
+
+    def __init__(self, path, fsync_every=50):
+        self.path = Path(path)
+        self.index_path = Path(str(path) + '.idx')
+        self.fsync_every = fsync_every
+        self._offsets = {}
+        self._next_id = 1
+        self._dead = 0
+        self._pending = 0
+        # Entradas del índice cuyo registro todavía no se sincronizó
+        self._unindexed = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self._load_index()
+        self._file = open(self.path, 'ab')
+        self._index_file = open(self.index_path, 'a', encoding='utf-8')
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+
+    def _load_index(self):
+        size = self._truncate_partial_line()
+        indexed_size = 0
+        valid = True
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record_id, offset, end = (int(value) for value in line.split())
+                    except ValueError:
+                        # Línea cortada o índice de otro formato
+                        valid = False
+                        break
+                    if end > size or not line.endswith('\n'):
+                        valid = False
+                        break
+                    self._index_record({'id': record_id}, offset)
+                    indexed_size = max(indexed_size, end)
+        except OSError:
+            pass
+
+        if not valid:
+            # El índice no es confiable: se re-indexa el log entero
+            self._offsets = {}
+            self._next_id = 1
+            self._dead = 0
+            self._scan_from(0)
+            self._write_index()
+        elif indexed_size < size:
+            self._scan_from(indexed_size)
+
+    def _truncate_partial_line(self):
+        """Descarta una última línea sin '\\n' dejada por una escritura interrumpida"""
+        size = self.path.stat().st_size
+        if size == 0:
+            return 0
+
+        with open(self.path, 'rb+') as f:
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return size
+
+            # Retroceder hasta el último salto de línea
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    position += newline + 1
+                    break
+            f.truncate(position)
+            return position
+
+    def _scan_from(self, start):
+        """Indexa los registros desde `start`; se agregan al índice en el próximo sync"""
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        offset += len(line)
+                        continue
+                    if self._index_record(record, offset):
+                        self._unindexed.append((record['id'], offset, offset + len(line)))
+                offset += len(line)
+
+    def _index_record(self, record, offset):
+        record_id = record.get('id')
+        if record_id is None:
+            return False
+        if record_id in self._offsets:
+            self._dead += 1
+        self._offsets[record_id] = offset
+        if record_id >= self._next_id:
+            self._next_id = record_id + 1
+        return True
+
+    def _flush_index(self):
+        """Agrega al índice las entradas de registros ya sincronizados"""
+        if not self._unindexed:
+            return
+        self._index_file.write(''.join(f"{record_id} {offset} {end}\n" for record_id, offset, end in self._unindexed))
+        self._index_file.flush()
+        self._unindexed = []
+
+    def _write_index(self):
+        """Reescribe el índice con la última versión de cada registro (solo al compactar o reparar)"""
+        tmp_path = Path(str(self.index_path) + '.tmp')
+        with open(self.path, 'rb') as log, open(tmp_path, 'w', encoding='utf-8') as f:
+            for record_id in sorted(self._offsets):
+                offset = self._offsets[record_id]
+                log.seek(offset)
+                f.write(f"{record_id} {offset} {offset + len(log.readline())}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._unindexed = []
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+
+    def next_id(self):
+        return self._next_id
+
+    def append(self, record):
+        """Agrega un registro (asigna 'id' si no tiene) y devuelve su id"""
+        if record.get('id') is None:
+            record = {'id': self._next_id, **record}
+
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        offset = self._file.tell()
+        self._file.write(line)
+        self._index_record(record, offset)
+        self._unindexed.append((record['id'], offset, offset + len(line)))
+
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+        return record['id']
+
+    def update(self, record_id, **fields):
+        """Actualiza campos de un registro agregando una nueva versión"""
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(f"Registro {record_id} no encontrado en {self.path}")
+        record.update(fields)
+        self.append(record)
+        return record
+
+    def get(self, record_id):
+        offset = self._offsets.get(record_id)
+        if offset is None:
+            return None
+        self._file.flush()
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def records(self):
+        """Itera la última versión de cada registro en orden de id"""
+        self._file.flush()
+        with open(self.path, 'rb') as f:
+            for record_id in sorted(self._offsets):
+                f.seek(self._offsets[record_id])
+                yield json.loads(f.readline())
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._flush_index()
+
+    def commit(self):
+        """Sincroniza el log y agrega al índice lo escrito desde el último sync"""
+        self.sync()
+
+    def compact(self, force=False):
+        """Reescribe el log con solo la última versión de cada registro.
+
+        Solo actúa si hay al menos tantas versiones muertas como vivas, lo que
+        mantiene el costo amortizado constante por actualización.
+        """
+        if not force and (self._dead < 100 or self._dead < len(self._offsets)):
+            return False
+
+        self.sync()
+        tmp_path = Path(str(self.path) + '.compact')
+        new_offsets = {}
+        with open(self.path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for record_id in sorted(self._offsets):
+                src.seek(self._offsets[record_id])
+                line = src.readline()
+                new_offsets[record_id] = dst.tell()
+                dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        self._file.close()
+        self._index_file.close()
+        # Sin índice, un corte entre ambos reemplazos solo fuerza a re-indexar
+        self.index_path.unlink(missing_ok=True)
+        os.replace(tmp_path, self.path)
+        self._offsets = new_offsets
+        self._dead = 0
+        self._file = open(self.path, 'ab')
+        self._write_index()
+        self._index_file = open(self.index_path, 'a', encoding='utf-8')
+        return True
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.commit()
+        self.compact()
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,392 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+LOGS_DIR = Path(__file__).parent.parent / 'logs'
+
+# Límites de los histogramas de latencia (segundos)
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+# Procesos cuyo RSS se suma como memoria del navegador
+BROWSER_PROCESS_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+# Nombre -> (tipo, ayuda). Los counters se nombran con el sufijo _total
+METRICS = {
+    'pipeline_run_started_timestamp_seconds': ('gauge', 'Inicio de la ejecución (epoch)'),
+    'pipeline_last_progress_timestamp_seconds': ('gauge', 'Última página terminada (epoch); si no avanza, el run está trabado'),
+    'pipeline_pages_total': ('counter', 'Páginas de detalle procesadas por resultado'),
+    'pipeline_pages_pending': ('gauge', 'Páginas de detalle que faltan procesar'),
+    'pipeline_navigations_in_flight': ('gauge', 'Navegaciones en curso'),
+    'pipeline_navigation_duration_seconds': ('histogram', 'Duración de page.goto'),
+    'pipeline_capture_duration_seconds': ('histogram', 'Duración de la captura completa de una página'),
+    'pipeline_stage_active': ('gauge', 'Etapa en ejecución (1) o terminada (0)'),
+    'pipeline_stage_items_total': ('counter', 'Ítems terminados por etapa (páginas de listado o de detalle)'),
+    'pipeline_stage_duration_seconds': ('gauge', 'Tiempo transcurrido en la etapa'),
+    'pipeline_stage_throughput_per_second': ('gauge', 'Ítems por segundo de la etapa'),
+    'pipeline_db_rows_written_total': ('counter', 'Filas escritas en licitar.db por tabla'),
+    'pipeline_browser_memory_bytes': ('gauge', 'RSS sumado de los procesos de Chromium del host'),
+}
+
+
+class MetricsSettings:
+    """Configuración de las métricas en vivo (desactivadas por defecto)"""
+
+    def __init__(self):
+        self.enabled = os.environ.get('PIPELINE_METRICS', '') == '1'
+        self.textfile = Path(os.environ.get('PIPELINE_METRICS_TEXTFILE') or LOGS_DIR / 'metrics' / 'pipeline.prom')
+        self.port = int(os.environ.get('PIPELINE_METRICS_PORT') or 0)
+        self.interval = float(os.environ.get('PIPELINE_METRICS_INTERVAL', 5))
+
+
+settings = MetricsSettings()
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Valores de las métricas del proceso, seguros entre hilos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.histograms = {}
+        # Etapa -> (inicio, fin o None)
+        self.stages = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def add(self, name, amount=1, **labels):
+        with self.lock:
+            key = self._key(name, labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[self._key(name, labels)] = value
+
+    def get(self, name, **labels):
+        with self.lock:
+            return self.values.get(self._key(name, labels), 0)
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            key = self._key(name, labels)
+            self.histograms.setdefault(key, Histogram()).observe(value)
+
+    def _refresh_derived(self):
+        now = time.time()
+        for stage, (started, finished) in list(self.stages.items()):
+            elapsed = (finished or now) - started
+            items = self.get('pipeline_stage_items_total', stage=stage)
+            self.set('pipeline_stage_duration_seconds', round(elapsed, 3), stage=stage)
+            self.set('pipeline_stage_throughput_per_second', round(items / elapsed, 4) if elapsed else 0, stage=stage)
+
+        memory = browser_memory_bytes()
+        if memory is not None:
+            self.set('pipeline_browser_memory_bytes', memory)
+
+    def render(self, openmetrics=False):
+        """Exposición en formato de texto de Prometheus u OpenMetrics"""
+        self._refresh_derived()
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            samples = [(labels, value) for (n, labels), value in values.items() if n == name]
+            series = [(labels, data) for (n, labels), data in histograms.items() if n == name]
+            if not samples and not series:
+                continue
+
+            # OpenMetrics declara el counter sin el sufijo _total
+            family = name[:-len('_total')] if openmetrics and kind == 'counter' else name
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+
+            for labels, value in sorted(samples):
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for labels, (buckets, counts, total, count) in sorted(series):
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {round(total, 6)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def progress(self):
+        """Resumen del run para /progress y manage.sh"""
+        with self.lock:
+            values = dict(self.values)
+
+        sources = {}
+        for (name, labels), value in values.items():
+            labels = dict(labels)
+            if name == 'pipeline_pages_total':
+                sources.setdefault(labels['source'], {})[labels['result']] = value
+            elif name == 'pipeline_pages_pending':
+                sources.setdefault(labels['source'], {})['pending'] = value
+
+        last_progress = values.get(('pipeline_last_progress_timestamp_seconds', ()))
+        return {
+            'sources': sources,
+            'in_flight': values.get(('pipeline_navigations_in_flight', ()), 0),
+            'stages': {
+                stage: {'running': finished is None, 'seconds': round((finished or time.time()) - started, 1)}
+                for stage, (started, finished) in self.stages.items()
+            },
+            'seconds_since_progress': round(time.time() - last_progress, 1) if last_progress else None,
+            'browser_memory_bytes': browser_memory_bytes(),
+        }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def browser_memory_bytes():
+    """RSS de los procesos de Chromium leyendo /proc (None fuera de Linux)"""
+    proc = Path('/proc')
+    if not proc.exists():
+        return None
+
+    total = 0
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / 'status').read_text()
+        except OSError:
+            continue
+        fields = dict(line.split(':', 1) for line in status.splitlines() if ':' in line)
+        if fields.get('Name', '').strip().startswith(BROWSER_PROCESS_NAMES):
+            rss = fields.get('VmRSS', '').split()
+            if rss:
+                total += int(rss[0]) * 1024
+    return total
+
+
+registry = Registry()
+_current = threading.local()
+_writer_stop = threading.Event()
+_writer = None
+_server = None
+# En los procesos del pool de captura: envía las navegaciones al padre
+_forward = None
+
+
+# ----------------------------------------------------------------------
+# Registro de eventos (sin efecto si las métricas están desactivadas)
+# ----------------------------------------------------------------------
+
+@contextmanager
+def stage(name):
+    """Marca la etapa activa del hilo; sus ítems cuentan para el throughput"""
+    if not settings.enabled:
+        yield
+        return
+
+    previous = getattr(_current, 'stage', None)
+    _current.stage = name
+    with registry.lock:
+        registry.stages[name] = (time.time(), None)
+    registry.set('pipeline_stage_active', 1, stage=name)
+    try:
+        yield
+    finally:
+        with registry.lock:
+            registry.stages[name] = (registry.stages[name][0], time.time())
+        registry.set('pipeline_stage_active', 0, stage=name)
+        _current.stage = previous
+
+
+def record_items(count=1):
+    """Suma ítems terminados a la etapa activa del hilo"""
+    current = getattr(_current, 'stage', None)
+    if settings.enabled and current:
+        registry.add('pipeline_stage_items_total', count, stage=current)
+
+
+def set_pending(source_name, count):
+    if settings.enabled:
+        registry.set('pipeline_pages_pending', count, source=source_name)
+
+
+def page_finished(source_name, ok, seconds=None):
+    """Una página de detalle terminó (capturada o con error)"""
+    if not settings.enabled:
+        return
+    registry.add('pipeline_pages_total', 1, source=source_name, result='done' if ok else 'failed')
+    registry.add('pipeline_pages_pending', -1, source=source_name)
+    registry.set('pipeline_last_progress_timestamp_seconds', round(time.time(), 3))
+    if seconds is not None:
+        registry.observe('pipeline_capture_duration_seconds', seconds, source=source_name)
+    record_items()
+
+
+def navigation_started(source_name):
+    if settings.enabled:
+        registry.add('pipeline_navigations_in_flight', 1)
+
+
+def navigation_finished(source_name, seconds):
+    if settings.enabled:
+        registry.add('pipeline_navigations_in_flight', -1)
+        registry.observe('pipeline_navigation_duration_seconds', seconds, source=source_name)
+
+
+def forward_navigations(callback):
+    """
+    Para los procesos del pool de captura, cuyo registro no se exporta: cada
+    navegación se envía con callback(tipo, fuente, segundos), con tipo
+    'navigation_started' o 'navigation_finished', y el proceso padre la
+    registra con navigation_started / navigation_finished.
+    """
+    global _forward
+    _forward = callback
+
+
+def _navigation_event(kind, source_name, seconds=None):
+    if _forward is not None:
+        _forward(kind, source_name, seconds)
+    elif kind == 'navigation_started':
+        navigation_started(source_name)
+    else:
+        navigation_finished(source_name, seconds)
+
+
+@contextmanager
+def navigation(source_name):
+    """Cuenta una navegación en curso y mide su duración"""
+    if _forward is None and not settings.enabled:
+        yield
+        return
+
+    _navigation_event('navigation_started', source_name)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        _navigation_event('navigation_finished', source_name, time.monotonic() - start)
+
+
+def record_db_writes(table, rows):
+    if settings.enabled and rows:
+        registry.add('pipeline_db_rows_written_total', rows, table=table)
+
+
+# ----------------------------------------------------------------------
+# Exportación: archivo para el textfile collector y endpoint HTTP
+# ----------------------------------------------------------------------
+
+def write_textfile():
+    """Escribe las métricas de forma atómica (node_exporter nunca lee a medias)"""
+    path = settings.textfile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(registry.render(), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _write_periodically():
+    while not _writer_stop.wait(settings.interval):
+        try:
+            write_textfile()
+        except Exception as e:
+            print(f"⚠️  No se pudieron escribir las métricas: {e}")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+            body = registry.render(openmetrics).encode('utf-8')
+            content_type = (
+                'application/openmetrics-text; version=1.0.0; charset=utf-8' if openmetrics
+                else 'text/plain; version=0.0.4; charset=utf-8'
+            )
+        elif path == '/progress':
+            body = json.dumps(registry.progress(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin una línea de log por scrape
+        pass
+
+
+def start(port=None):
+    """
+    Activa las métricas para el resto del proceso: el archivo se reescribe
+    cada `settings.interval` segundos y, con puerto, se sirven /metrics y
+    /progress.
+    """
+    global _writer, _server
+    settings.enabled = True
+    if port is not None:
+        settings.port = port
+    registry.set('pipeline_run_started_timestamp_seconds', round(time.time(), 3))
+
+    if _writer is None:
+        _writer_stop.clear()
+        _writer = threading.Thread(target=_write_periodically, name='metrics-writer', daemon=True)
+        _writer.start()
+        print(f"📈 Métricas en vivo en {settings.textfile}")
+
+    if settings.port and _server is None:
+        _server = ThreadingHTTPServer(('0.0.0.0', settings.port), MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"📈 Métricas en http://0.0.0.0:{settings.port}/metrics (progreso en /progress)")
+
+
+def stop():
+    """Escribe el estado final y detiene el exportador"""
+    global _writer, _server
+    if not settings.enabled:
+        return
+    _writer_stop.set()
+    if _writer is not None:
+        _writer.join()
+        _writer = None
+    if _server is not None:
+        _server.shutdown()
+        _server = None
+    write_textfile()
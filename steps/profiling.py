@@ -0,0 +1,149 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import live_metrics
+
+
+LOGS_DIR = Path(__file__).parent.parent / 'logs'
+
+# Intervalo entre muestras del profiler (segundos)
+SAMPLE_INTERVAL = 0.005
+
+
+class ProfilingSettings:
+    """Configuración del modo profiling (desactivado por defecto)"""
+
+    def __init__(self):
+        self.enabled = os.environ.get('PIPELINE_PROFILE', '') == '1'
+        self.slow_page_seconds = float(os.environ.get('PROFILE_SLOW_PAGE_SECONDS', 20))
+        self.session = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+settings = ProfilingSettings()
+
+
+def enable(slow_page_seconds=None):
+    """Activa el modo profiling para el resto del proceso"""
+    settings.enabled = True
+    if slow_page_seconds is not None:
+        settings.slow_page_seconds = slow_page_seconds
+
+
+def _safe_name(label):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(label))[:80]
+
+
+class StackSampler:
+    """
+    Profiler por muestreo de un hilo.
+
+    Un hilo auxiliar toma el stack del hilo observado cada `interval`
+    segundos y cuenta stacks idénticos. La salida usa el formato "folded"
+    (una línea `frame;frame;frame N`) que aceptan flamegraph.pl, speedscope
+    e inferno.
+
+    Con Playwright sync, el tiempo esperando al navegador o a la red aparece
+    bajo los frames del event loop de Playwright; el tiempo de CPU propio
+    aparece bajo los frames de los steps.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_folded(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+@contextmanager
+def stage(name):
+    """
+    Perfila una etapa del pipeline si el modo profiling está activo.
+    Desactivado, no hace nada. La etapa se publica además en las métricas
+    en vivo (steps/live_metrics.py), si están activas.
+    """
+    with live_metrics.stage(name):
+        if not settings.enabled:
+            yield
+            return
+
+        sampler = StackSampler()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - start
+            path = LOGS_DIR / 'profiles' / f"{settings.session}-{_safe_name(name)}.folded"
+            sampler.write_folded(path)
+            print(f"🔬 {name}: {elapsed:.1f}s, {sum(sampler.samples.values())} muestras -> {path}")
+
+
+def start_context_tracing(context):
+    """Habilita tracing (red y tiempos, sin snapshots) en un contexto nuevo"""
+    if settings.enabled:
+        context.tracing.start(screenshots=False, snapshots=False)
+
+
+@contextmanager
+def trace_if_slow(page, label):
+    """
+    Graba un chunk de trace de Playwright alrededor de una captura y lo
+    guarda en logs/traces/ solo si tardó más que el umbral configurado.
+    """
+    if not settings.enabled:
+        yield
+        return
+
+    tracing = page.context.tracing
+    tracing.start_chunk(title=str(label))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if elapsed >= settings.slow_page_seconds:
+            path = LOGS_DIR / 'traces' / f"{settings.session}-{_safe_name(label)}-{elapsed:.0f}s.zip"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tracing.stop_chunk(path=str(path))
+            print(f"🐢 Página lenta ({elapsed:.1f}s), trace guardado en {path}")
+        else:
+            tracing.stop_chunk()
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+
+
+# Prioridades, de mayor a menor
+PRIORITY_NEW = 'nueva'          # URL nunca capturada
+PRIORITY_OPEN = 'abierta'       # Licitación con apertura pendiente
+PRIORITY_REFRESH = 'refresco'   # Ya capturada y sin apertura próxima
+
+PRIORITY_ORDER = {PRIORITY_NEW: 0, PRIORITY_OPEN: 1, PRIORITY_REFRESH: 2}
+
+# Segundos que se reservan para el step3 al final de la ventana
+STEP3_RESERVE_SECONDS = 60
+
+# Tamaño de los lotes para consultas con IN (...)
+QUERY_CHUNK = 500
+
+
+class RunBudget:
+    """
+    Presupuesto de tiempo de una ejecución.
+
+    Antes de cada captura se pregunta si queda tiempo para otra, estimando
+    su duración con el promedio móvil de las anteriores; así el step2 se
+    detiene antes de la hora límite y no en medio de una captura. Las URLs
+    que no llegaron a intentarse quedan en `pending`.
+    """
+
+    def __init__(self, deadline=None, reserve=STEP3_RESERVE_SECONDS):
+        self.deadline = deadline
+        self.reserve = reserve
+        self.pending = []
+        self._average = None
+
+    def remaining(self):
+        if self.deadline is None:
+            return float('inf')
+        return self.deadline - time.time() - self.reserve
+
+    def record(self, seconds):
+        """Registra la duración de una captura"""
+        if self._average is None:
+            self._average = seconds
+        else:
+            self._average = 0.8 * self._average + 0.2 * seconds
+
+    def allows_another(self):
+        estimate = (self._average or 0) * 1.5
+        return self.remaining() > estimate
+
+
+def load_history(db_path, urls):
+    """
+    Última captura conocida de cada URL.
+
+    Returns:
+        dict url -> (último scraped_at, fecha_apertura)
+    """
+    db_file = Path(db_path) / "licitar.db"
+    if not db_file.exists():
+        return {}
+
+    history = {}
+    connection = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, timeout=30)
+    try:
+        urls = list(urls)
+        for start in range(0, len(urls), QUERY_CHUNK):
+            chunk = urls[start:start + QUERY_CHUNK]
+            # SQLite toma fecha_apertura de la fila con MAX(scraped_at)
+            rows = connection.execute(f"""
+                SELECT url, MAX(scraped_at), fecha_apertura
+                FROM licitaciones
+                WHERE url IN ({', '.join('?' for _ in chunk)})
+                GROUP BY url
+            """, chunk).fetchall()
+            for url, scraped_at, fecha_apertura in rows:
+                history[url] = (scraped_at, fecha_apertura)
+    finally:
+        connection.close()
+
+    return history
+
+
+def classify(url, history, today):
+    """Devuelve (prioridad, clave de orden dentro de la prioridad)"""
+    if url not in history:
+        return PRIORITY_NEW, ''
+
+    scraped_at, fecha_apertura = history[url]
+    if fecha_apertura and str(fecha_apertura) >= today:
+        # Las aperturas más cercanas primero
+        return PRIORITY_OPEN, str(fecha_apertura)
+
+    # Las capturas más viejas primero
+    return PRIORITY_REFRESH, str(scraped_at or '')
+
+
+def prioritize(db_path, urls, today=None):
+    """
+    Ordena las URLs del run: nuevas, luego abiertas con apertura próxima,
+    luego refrescos. Las nuevas quedan en el orden del listado; las abiertas
+    van por fecha de apertura más cercana y los refrescos por captura más
+    vieja, y solo ante fechas iguales decide el orden del listado.
+
+    Returns:
+        Lista de tuplas (url, prioridad)
+    """
+    today = today or date.today().isoformat()
+    history = load_history(db_path, urls)
+
+    ranked = []
+    for position, url in enumerate(urls):
+        priority, key = classify(url, history, today)
+        ranked.append((PRIORITY_ORDER[priority], key, position, url, priority))
+    ranked.sort()
+
+    counts = {name: 0 for name in PRIORITY_ORDER}
+    for *_, priority in ranked:
+        counts[priority] += 1
+    print(f"🗂️  Prioridades: {counts[PRIORITY_NEW]} nuevas, "
+          f"{counts[PRIORITY_OPEN]} abiertas, {counts[PRIORITY_REFRESH]} refrescos")
+
+    return [(url, priority) for *_, url, priority in ranked]
@@ -0,0 +1,201 @@
+import hashlib
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+
+# Bits de diferencia hasta los que dos páginas se consideran la misma licitación
+MAX_DISTANCE = 3
+
+# 64 bits en 4 bandas de 16: dos firmas a distancia <= 3 coinciden
+# exactamente en al menos una banda, así que alcanza con buscar por banda
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+# Palabras por shingle y mínimo de palabras para que la firma sea confiable
+SHINGLE_SIZE = 3
+MIN_WORDS = 20
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _to_signed(value):
+    """SQLite guarda enteros de 64 bits con signo"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def simhash(text):
+    """
+    SimHash de 64 bits sobre shingles de palabras.
+
+    Returns:
+        Entero sin signo, o None si el texto es demasiado corto
+    """
+    words = WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+
+    weights = [0] * 64
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = ' '.join(words[i:i + SHINGLE_SIZE])
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    result = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            result |= 1 << bit
+    return result
+
+
+def bands(signature):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, signature >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def find_near_duplicates(cursor, signature, exclude_url=None, max_distance=MAX_DISTANCE):
+    """
+    URLs indexadas cuya firma está a `max_distance` bits o menos.
+    Solo se comparan las que comparten alguna banda (búsqueda por índice).
+
+    Returns:
+        Lista de (distancia, url, cluster_id) ordenada por distancia
+    """
+    conditions = ' OR '.join('(b.banda = ? AND b.valor = ?)' for _ in range(BANDS))
+    params = [v for pair in bands(signature) for v in pair]
+    cursor.execute(f"""
+        SELECT DISTINCT s.url, s.simhash, s.cluster_id
+        FROM simhash_bandas b
+        JOIN similitud_urls s ON s.id = b.similitud_id
+        WHERE {conditions}
+    """, params)
+
+    matches = []
+    for url, candidate, cluster_id in cursor.fetchall():
+        if url == exclude_url:
+            continue
+        distance = hamming(signature, _to_unsigned(candidate))
+        if distance <= max_distance:
+            matches.append((distance, url, cluster_id))
+    return sorted(matches)
+
+
+def index_document(cursor, url, text, licitacion_id=None):
+    """
+    Indexa (o reindexa) el texto de una URL y la asigna a un cluster: el de
+    su vecina más cercana, o uno nuevo si no hay ninguna.
+
+    Returns:
+        cluster_id, o None si el texto es demasiado corto para indexar
+    """
+    signature = simhash(text)
+    if signature is None:
+        return None
+
+    cursor.execute("SELECT id, cluster_id FROM similitud_urls WHERE url = ?", (url,))
+    existing = cursor.fetchone()
+
+    if existing:
+        similitud_id, cluster_id = existing
+        cursor.execute("""
+            UPDATE similitud_urls
+            SET simhash = ?, licitacion_id = COALESCE(?, licitacion_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (_to_signed(signature), licitacion_id, similitud_id))
+        cursor.execute("DELETE FROM simhash_bandas WHERE similitud_id = ?", (similitud_id,))
+    else:
+        matches = find_near_duplicates(cursor, signature, exclude_url=url)
+        distance, cluster_id = (matches[0][0], matches[0][2]) if matches else (None, None)
+
+        cursor.execute("""
+            INSERT INTO similitud_urls (url, simhash, cluster_id, licitacion_id, distancia)
+            VALUES (?, ?, 0, ?, ?)
+        """, (url, _to_signed(signature), licitacion_id, distance))
+        similitud_id = cursor.lastrowid
+
+        # Sin vecinas: la URL funda su propio cluster
+        if cluster_id is None:
+            cluster_id = similitud_id
+        cursor.execute("UPDATE similitud_urls SET cluster_id = ? WHERE id = ?", (cluster_id, similitud_id))
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO simhash_bandas (banda, valor, similitud_id) VALUES (?, ?, ?)",
+        [(band, value, similitud_id) for band, value in bands(signature)]
+    )
+    return cluster_id
+
+
+def lookup_near_duplicate(db_path, url, text):
+    """
+    Primera URL ya indexada (distinta de `url`) casi idéntica a `text`, o
+    None. Usa una conexión de solo lectura; pensada para el step2.
+    """
+    signature = simhash(text)
+    db_file = Path(db_path) / "licitar.db"
+    if signature is None or not db_file.exists():
+        return None
+
+    connection = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, timeout=30)
+    try:
+        matches = find_near_duplicates(connection.cursor(), signature, exclude_url=url)
+    except sqlite3.OperationalError:
+        # Base sin migrar
+        return None
+    finally:
+        connection.close()
+    return matches[0][1] if matches else None
+
+
+def reindex(db_path):
+    """Reconstruye el índice desde la última versión guardada de cada URL"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from content import decompress, html_to_text
+
+    db_file = Path(db_path) / "licitar.db"
+    connection = sqlite3.connect(str(db_file), timeout=30)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM simhash_bandas")
+        cursor.execute("DELETE FROM similitud_urls")
+        rows = cursor.execute("""
+            SELECT c.url, c.licitacion_id, c.contenido
+            FROM contenido_principal c
+            WHERE c.id IN (
+                SELECT MAX(id) FROM contenido_principal
+                WHERE contenido IS NOT NULL GROUP BY url
+            )
+            ORDER BY c.id
+        """).fetchall()
+
+        indexed = 0
+        for url, licitacion_id, blob in rows:
+            text = html_to_text(decompress(blob))
+            if index_document(cursor, url, text, licitacion_id) is not None:
+                indexed += 1
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    print(f"✅ {indexed} URLs indexadas de {len(rows)}")
+
+
+if __name__ == "__main__":
+    # Uso: python steps/similarity.py --reindex
+    if "--reindex" in sys.argv[1:]:
+        reindex(Path(__file__).parent.parent / "db")
+    else:
+        print("Uso: python steps/similarity.py --reindex")
@@ -0,0 +1,298 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from bs4 import BeautifulSoup
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+import har
+import live_metrics
+
+
+class RateLimiter:
+    """Garantiza un intervalo mínimo entre navegaciones (seguro entre hilos)"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self):
+        """Reserva el próximo turno; devuelve los segundos a esperar"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        return delay
+
+    def wait(self):
+        # Al reproducir desde HAR no hay portal que cuidar
+        if har.settings.replaying:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter cuyo turno se comparte entre procesos: el próximo turno
+    vive en un multiprocessing.Value y se reserva bajo un Lock del mismo
+    contexto (time.monotonic es común a todos los procesos del host).
+    """
+
+    def __init__(self, min_interval, next_slot, lock):
+        super().__init__(min_interval)
+        self._shared_slot = next_slot
+        self._shared_lock = lock
+
+    def _reserve(self):
+        with self._shared_lock:
+            now = time.monotonic()
+            delay = self._shared_slot.value - now
+            self._shared_slot.value = max(now, self._shared_slot.value) + self.min_interval
+        return delay
+
+
+class PortalSource:
+    """
+    Adaptador de un portal de compras.
+
+    Describe cómo encontrar el listado, cómo paginarlo, qué enlaces son
+    licitaciones y cómo extraer campos del HTML de detalle. Los steps usan
+    solo esta interfaz, así que agregar un portal es registrar una subclase.
+    """
+
+    name = None
+    base_url = None
+    home_url = None
+    # Listado de licitaciones (None = se descubre desde la home)
+    listing_url = None
+    # Enlace de la home que lleva al listado de licitaciones
+    listing_link_selector = None
+    # Enlaces del listado que apuntan a una licitación (selector CSS válido
+    # también fuera de Playwright: lo usa el modo watch sobre HTML estático)
+    detail_link_selector = None
+    # Números de página en la paginación del listado
+    pagination_selector = None
+    # Contenedor del contenido principal del detalle (None = heurística,
+    # ver steps/content.py) y elementos a descartar dentro de él
+    main_content_selector = None
+    boilerplate_selectors = ()
+    # Subdirectorio dentro de docs/ (None = docs/ directamente)
+    docs_subdir = None
+    # Segundos mínimos entre navegaciones a este portal
+    min_interval = 1.0
+    # Selectores que indican que cada tipo de página ('home', 'listing',
+    # 'detail') ya tiene su contenido; alcanza con que aparezca uno. Sin
+    # entrada para un tipo, basta con domcontentloaded
+    ready_selectors = {}
+    # Milisegundos de espera tras aparecer el contenido (renderizado final)
+    settle_ms = 250
+    # Milisegundos máximos esperando el contenido antes de seguir igual
+    ready_timeout = 15000
+    # Path de las páginas de detalle (para clasificar enlaces sin navegarlos)
+    detail_path_re = None
+    # Adjuntos que se descargan en lugar de navegarse
+    document_extensions = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.odt', '.ods', '.zip', '.rar')
+    # Extensiones de páginas navegables (cualquier otra es un recurso)
+    page_extensions = ('', '.html', '.htm', '.php', '.asp', '.aspx')
+    # Texto o path de enlaces a documentos de una licitación
+    related_keywords = (
+        'anexo', 'circular', 'ampliaci', 'prórroga', 'prorroga', 'pliego',
+        'adenda', 'aclarator', 'enmienda', 'modificaci', 'acta',
+    )
+    # Parámetros de query que no identifican la licitación
+    ignored_query_params = ('fbclid', 'gclid')
+    ignored_query_prefixes = ('utm_',)
+
+    def __init__(self):
+        self.limiter = RateLimiter(self.min_interval)
+
+    def goto(self, page, url, wait_until='domcontentloaded', timeout=60000):
+        """Navega respetando el límite de frecuencia del portal"""
+        self.limiter.wait()
+        with live_metrics.navigation(self.name):
+            return page.goto(url, wait_until=wait_until, timeout=timeout)
+
+    def wait_ready(self, page, kind):
+        """
+        Espera a que la página cargada tenga el contenido de su tipo, en
+        lugar de esperar a que la red quede inactiva (los beacons de
+        analítica pueden demorar eso varios segundos o no lograrlo nunca).
+
+        Returns:
+            False si el contenido no apareció a tiempo (p. ej. un listado
+            vacío); el step sigue con lo que haya en la página
+        """
+        selectors = self.ready_selectors.get(kind)
+        if not selectors:
+            return True
+
+        try:
+            page.wait_for_selector(', '.join(selectors), state='attached', timeout=self.ready_timeout)
+        except PlaywrightTimeoutError:
+            print(f"⚠️  {page.url}: sin contenido de tipo '{kind}' tras {self.ready_timeout / 1000:.0f}s")
+            return False
+
+        if self.settle_ms:
+            page.wait_for_timeout(self.settle_ms)
+        return True
+
+    def absolute_url(self, href):
+        return urljoin(self.base_url, href)
+
+    def canonical_url(self, href):
+        """
+        Forma canónica de un enlace de detalle: absoluta, esquema y host en
+        minúsculas, sin fragmento, sin barra final, sin parámetros de
+        tracking y con la query ordenada. Dos enlaces a la misma licitación
+        producen la misma cadena.
+        """
+        split = urlsplit(self.absolute_url(href.strip()))
+        path = split.path.rstrip('/') or '/'
+        query = sorted(
+            (k, v) for k, v in parse_qsl(split.query, keep_blank_values=True)
+            if k not in self.ignored_query_params
+            and not k.startswith(self.ignored_query_prefixes)
+        )
+        return urlunsplit((split.scheme.lower(), split.netloc.lower(), path, urlencode(query), ''))
+
+    def page_url(self, listing_url, number):
+        """Regla de paginación: URL de la página `number` (1 = listado)"""
+        if number == 1:
+            return listing_url
+        return f"{listing_url}?page={number}"
+
+    def read_listing_links(self, html):
+        """Enlaces de detalle canónicos de un listado, sin ejecutar JS"""
+        soup = BeautifulSoup(html, 'lxml')
+        urls = {}
+        for anchor in soup.select(self.detail_link_selector):
+            href = anchor.get('href')
+            if href:
+                urls.setdefault(self.canonical_url(href), None)
+        return list(urls)
+
+    def read_page_links(self, html):
+        """(url canónica, texto) de los enlaces de una página, sin repetir URLs"""
+        soup = BeautifulSoup(html, 'lxml')
+        links = {}
+        for anchor in soup.find_all('a', href=True):
+            href = anchor['href'].strip()
+            if href and not href.startswith(('#', 'mailto:', 'tel:', 'javascript:')):
+                links.setdefault(self.canonical_url(href), anchor.get_text(' ', strip=True))
+        return list(links.items())
+
+    def classify_link(self, url, text=''):
+        """
+        Tipo de un enlace, decidido antes de pedirlo:
+
+        - 'documento': adjunto del portal (pdf, planillas, comprimidos)
+        - 'relacionada': página del portal cuyo texto o path la vincula a
+          una licitación (anexo, circular, ampliación de plazo, ...)
+        - 'detalle': otra página de detalle
+        - None: fuera del dominio, recursos estáticos o secciones del sitio
+          que no vale la pena capturar
+        """
+        split = urlsplit(url)
+        if split.scheme not in ('http', 'https') or split.netloc != urlsplit(self.base_url).netloc.lower():
+            return None
+
+        extension = os.path.splitext(split.path.lower())[1]
+        if extension in self.document_extensions:
+            return 'documento'
+        if extension not in self.page_extensions:
+            return None
+
+        haystack = f"{split.path} {text}".lower()
+        if any(keyword in haystack for keyword in self.related_keywords):
+            return 'relacionada'
+        if self.detail_path_re and self.detail_path_re.search(split.path):
+            return 'detalle'
+        return None
+
+    def extract_fields(self, html):
+        """Extrae campos de `licitaciones` desde el HTML de detalle"""
+        return {}
+
+
+class CorrientesObrasPublicas(PortalSource):
+    """Ministerio de Obras Públicas de Corrientes"""
+
+    name = 'corrientes'
+    base_url = 'https://obraspublicas.corrientes.gob.ar'
+    home_url = 'https://obraspublicas.corrientes.gob.ar/'
+    listing_link_selector = 'a:has-text("Licitaciones")'
+    detail_link_selector = 'a[href^="/noticia/"]'
+    pagination_selector = '.pagination a:not(:has-text("Siguiente")):not(:has-text("Último"))'
+    detail_path_re = re.compile(r'^/noticia/')
+    ready_selectors = {
+        'home': (listing_link_selector,),
+        'listing': ('.pagination', detail_link_selector),
+        'detail': ('article', 'main', 'h1'),
+    }
+
+    NUMERO_RE = re.compile(
+        r'licitaci[óo]n\s+(?:p[úu]blica|privada)[^\n]*?n[°º.]?\s*([\d]+\s*/\s*\d{2,4}|[\d-]+)',
+        re.IGNORECASE
+    )
+    APERTURA_RE = re.compile(
+        r'apertura[^\n]{0,80}?(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})',
+        re.IGNORECASE
+    )
+
+    def extract_fields(self, html):
+        soup = BeautifulSoup(html, 'lxml')
+        fields = {}
+
+        og_title = soup.find('meta', property='og:title')
+        heading = soup.find('h1')
+        if og_title and og_title.get('content'):
+            fields['title'] = og_title['content'].strip()
+        elif heading:
+            fields['title'] = heading.get_text(' ', strip=True)
+
+        og_description = soup.find('meta', property='og:description')
+        if og_description and og_description.get('content'):
+            fields['description'] = og_description['content'].strip()
+
+        text = soup.get_text('\n', strip=True)
+
+        numero = self.NUMERO_RE.search(fields.get('title', '') + '\n' + text)
+        if numero:
+            fields['numero_licitacion'] = re.sub(r'\s+', '', numero.group(1))
+
+        apertura = self.APERTURA_RE.search(text)
+        if apertura:
+            day, month, year = (int(g) for g in apertura.groups())
+            if year < 100:
+                year += 2000
+            if 1 <= month <= 12 and 1 <= day <= 31:
+                fields['fecha_apertura'] = f"{year:04d}-{month:02d}-{day:02d}"
+
+        return fields
+
+
+# Registro de portales disponibles
+SOURCES = {}
+
+DEFAULT_SOURCE = 'corrientes'
+
+
+def register_source(source_class):
+    """Registra un adaptador (se puede usar como decorador)"""
+    SOURCES[source_class.name] = source_class()
+    return source_class
+
+
+def get_source(name=None):
+    name = name or DEFAULT_SOURCE
+    if name not in SOURCES:
+        raise KeyError(f"Fuente desconocida: {name} (disponibles: {', '.join(sorted(SOURCES))})")
+    return SOURCES[name]
+
+
+register_source(CorrientesObrasPublicas)
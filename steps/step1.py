@@ -1,96 +1,105 @@
-from playwright.sync_api import sync_playwright
-
-def get_licitaciones_url():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        page.goto('https://obraspublicas.corrientes.gob.ar/', 
-                 wait_until='domcontentloaded', timeout=60000)
-        page.wait_for_load_state('networkidle', timeout=60000)
-        
-        licitaciones_link = page.locator('a:has-text("Licitaciones")').first
-        href = licitaciones_link.get_attribute('href')
-        
-        browser.close()
-        return 'https://obraspublicas.corrientes.gob.ar' + href
-
-def get_num_paginas(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        page.goto(url, wait_until='domcontentloaded', timeout=60000)
-        page.wait_for_load_state('networkidle', timeout=60000)
-        
-        page_numbers = page.locator('.pagination a:not(:has-text("Siguiente")):not(:has-text("Último"))').all()
-        max_page = 1
-        
-        for element in page_numbers:
-            text = element.text_content()
-            try:
-                number = int(text)
-                if number > max_page:
-                    max_page = number
-            except ValueError:
-                continue
-        
-        browser.close()
-        return max_page
-
-def get_licitaciones_links(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        page.goto(url, wait_until='domcontentloaded', timeout=60000)
-        page.wait_for_load_state('networkidle', timeout=60000)
-        
-        links = page.locator('a[href^="/noticia/"]').all()
-        urls = []
-        
-        for link in links:
-            href = link.get_attribute('href')
-            if href:
-                full_url = f'https://obraspublicas.corrientes.gob.ar{href}'
-                if full_url not in urls:
-                    urls.append(full_url)
-        
-        browser.close()
-        return urls
-
-def extract_all_licitacion_urls(root_url):
+from browser import browser_page
+from dom import extract_anchors, extract_page_numbers
+import live_metrics
+from sources import get_source
+
+def get_licitaciones_url(page, root_url, source):
+    source.goto(page, root_url, wait_until='domcontentloaded', timeout=60000)
+    source.wait_ready(page, 'home')
+
+    licitaciones_link = page.locator(source.listing_link_selector).first
+    href = licitaciones_link.get_attribute('href')
+
+    return source.absolute_url(href)
+
+def load_listing_page(page, url, source):
+    source.goto(page, url, wait_until='domcontentloaded', timeout=60000)
+    source.wait_ready(page, 'listing')
+
+def read_num_paginas(page, source):
+    """Mayor número de página visible en la paginación de la página cargada"""
+    return max([1] + extract_page_numbers(page, source.pagination_selector))
+
+def read_licitaciones_links(page, source):
+    """Enlaces de detalle canónicos de la página cargada, sin repetir y en orden"""
+    urls = {}
+
+    for anchor in extract_anchors(page, source.detail_link_selector):
+        if anchor['href']:
+            urls.setdefault(source.canonical_url(anchor['href']), None)
+
+    return list(urls)
+
+def get_num_paginas(page, url, source):
+    load_listing_page(page, url, source)
+    return read_num_paginas(page, source)
+
+def get_licitaciones_links(page, url, source):
+    load_listing_page(page, url, source)
+    return read_licitaciones_links(page, source)
+
+def walk_listing(page, listing_url, source):
+    """
+    Recorre el listado navegando una sola vez por página.
+
+    De cada página se leen sus enlaces y la paginación visible, así que el
+    número total de páginas se conoce (y puede crecer, si la paginación
+    muestra una ventana) sin cargas extra.
+
+    Yields:
+        (numero, url de la página, enlaces canónicos, páginas conocidas)
+    """
+    number = 1
+    num_paginas = 1
+
+    while number <= num_paginas:
+        page_url = source.page_url(listing_url, number)
+        load_listing_page(page, page_url, source)
+
+        num_paginas = max(num_paginas, read_num_paginas(page, source))
+        live_metrics.record_items()
+        yield number, page_url, read_licitaciones_links(page, source), num_paginas
+
+        number += 1
+
+def extract_all_licitacion_urls(root_url=None, source=None, page=None):
+    source = source or get_source()
+    root_url = root_url or source.home_url
+
+    # Reutilizar una sola página para todas las navegaciones
+    if page is None:
+        with browser_page(label='step1') as page:
+            return extract_all_licitacion_urls(root_url, source, page)
+
     # 1. Obtener URL de licitaciones
-    licitaciones_url = get_licitaciones_url()
-    
-    # 2. Obtener número de páginas
-    num_paginas = get_num_paginas(licitaciones_url)
-    
-    # 3. Generar URLs de todas las páginas
-    all_pages_urls = [licitaciones_url]
-    for i in range(2, num_paginas + 1):
-        all_pages_urls.append(f"{licitaciones_url}?page={i}")
-    
-    # 4. Extraer enlaces de cada página
+    licitaciones_url = get_licitaciones_url(page, root_url, source)
+
+    # 2. Recorrer el listado: páginas y enlaces en una sola pasada.
+    # Cada licitación queda solo en la primera página donde aparece,
+    # así step2 nunca recibe duplicados
+    all_pages_urls = []
     licitaciones_por_pagina = {}
-    total_licitaciones = 0
-    
-    for i, page_url in enumerate(all_pages_urls, 1):
-        links = get_licitaciones_links(page_url)
-        licitaciones_por_pagina[f"pagina{i}"] = links
-        total_licitaciones += len(links)
-    
+    seen = set()
+    num_paginas = 1
+
+    for number, page_url, links, num_paginas in walk_listing(page, licitaciones_url, source):
+        new_links = [url for url in links if url not in seen]
+        seen.update(new_links)
+
+        all_pages_urls.append(page_url)
+        licitaciones_por_pagina[f"pagina{number}"] = new_links
+
     return {
+        "fuente": source.name,
         "urlPrincipal": licitaciones_url,
         "numeroPaginas": num_paginas,
         "urlsPaginas": all_pages_urls,
         "licitaciones": licitaciones_por_pagina,
-        "totalLicitaciones": total_licitaciones
+        "totalLicitaciones": len(seen)
     }
 
 if __name__ == "__main__":
     # Prueba del módulo
-    root_url = "https://obraspublicas.corrientes.gob.ar/"
-    result = extract_all_licitacion_urls(root_url)
+    result = extract_all_licitacion_urls()
     print(f"Total de páginas encontradas: {result['numeroPaginas']}")
-    print(f"Total de licitaciones encontradas: {result['totalLicitaciones']}")
\ No newline at end of file
+    print(f"Total de licitaciones encontradas: {result['totalLicitaciones']}")
@@ -1,109 +1,247 @@
-from playwright.sync_api import sync_playwright
+import hashlib
 import os
+import time
 from pathlib import Path
+from urllib.parse import urljoin, urlsplit
 
-def download_html(url, folder_path, file_name):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        try:
-            # Timeout más corto y wait_until menos estricto
-            page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            html = page.content()
-            
-            Path(folder_path).mkdir(parents=True, exist_ok=True)
-            file_path = Path(folder_path) / file_name
-            file_path.write_text(html, encoding='utf-8')
-            
-            browser.close()
-            return str(file_path)
-            
-        except Exception as e:
-            print(f"❌ Error descargando HTML {url}: {e}")
-            browser.close()
-            return None
-
-def download_png(url, folder_path, file_name):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        try:
-            # Timeout más corto y wait_until menos estricto
-            page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            
-            Path(folder_path).mkdir(parents=True, exist_ok=True)
-            file_path = Path(folder_path) / file_name
-            page.screenshot(path=str(file_path), full_page=True)
-            
-            browser.close()
-            return str(file_path)
-            
-        except Exception as e:
-            print(f"❌ Error descargando PNG {url}: {e}")
-            browser.close()
-            return None
-
-def find_pliego_links(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        page.goto(url, wait_until='networkidle', timeout=60000)
-        anchors = page.locator('a').all()
-        results = []
-        
-        for a in anchors:
-            href = a.get_attribute('href')
-            text = a.text_content() or ''
-            if href:
-                lower = (href + ' ' + text).lower()
-                if 'pliego' in lower:
-                    if href.startswith('http'):
-                        absolute = href
-                    else:
-                        from urllib.parse import urljoin
-                        absolute = urljoin(url, href)
-                    results.append(absolute)
-        
-        browser.close()
-        return list(set(results)) 
-
-def download_page_content(urls, docs_path):
+from browser import browser_page
+import capture_pool
+from dom import extract_anchors
+from sources import get_source
+import content
+import live_metrics
+import profiling
+import similarity
+import warc
+
+# Salida de las capturas: 'files' (un .html/.png por página) o 'warc'
+CAPTURE_OUTPUT = os.environ.get('CAPTURE_OUTPUT', 'files')
+# Compresión de los WARC: 'gzip' o 'zstd' (requiere zstandard)
+WARC_COMPRESSION = os.environ.get('WARC_COMPRESSION', 'gzip')
+# Republicaciones (casi duplicados de otra URL): 'link' las captura completas
+# y step3 las agrupa; 'skip' además omite su screenshot
+NEAR_DUPLICATES = os.environ.get('NEAR_DUPLICATES', 'link')
+
+def save_html(page, folder_path, file_name):
+    try:
+        html = page.content()
+
+        Path(folder_path).mkdir(parents=True, exist_ok=True)
+        file_path = Path(folder_path) / file_name
+        file_path.write_text(html, encoding='utf-8')
+
+        return str(file_path)
+
+    except Exception as e:
+        print(f"❌ Error guardando HTML {page.url}: {e}")
+        return None
+
+def save_png(page, folder_path, file_name):
+    try:
+        Path(folder_path).mkdir(parents=True, exist_ok=True)
+        file_path = Path(folder_path) / file_name
+        page.screenshot(path=str(file_path), full_page=True)
+
+        return str(file_path)
+
+    except Exception as e:
+        print(f"❌ Error guardando PNG {page.url}: {e}")
+        return None
+
+def find_pliego_links(page, url, source=None):
+    source = source or get_source()
+    source.goto(page, url, wait_until='domcontentloaded', timeout=60000)
+    source.wait_ready(page, 'detail')
     results = []
-    html_dir = Path(docs_path) / 'pages_html'
-    png_dir = Path(docs_path) / 'pages_png'
-    
+
+    for anchor in extract_anchors(page, 'a'):
+        href = anchor['href']
+        if href:
+            lower = (href + ' ' + anchor['text']).lower()
+            if 'pliego' in lower:
+                results.append(urljoin(url, href))
+
+    return list(set(results))
+
+def download_document(page, url, docs_path, source):
+    """
+    Descarga un adjunto (pdf, planilla, ...) con la sesión del navegador.
+
+    Returns:
+        Path relativo a la raíz del proyecto
+    """
+    source.limiter.wait()
+    response = page.request.get(url, timeout=60000)
+    if not response.ok:
+        raise RuntimeError(f"HTTP {response.status}")
+
+    docs_dir = get_docs_base(docs_path, source) / 'documentos'
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(urlsplit(url).path).suffix.lower()
+    file_path = docs_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}{suffix}"
+    file_path.write_bytes(response.body())
+    return os.path.relpath(file_path, Path(docs_path).parent)
+
+def get_docs_base(docs_path, source):
+    """Directorio base de salida de una fuente"""
+    return Path(docs_path) / source.docs_subdir if source.docs_subdir else Path(docs_path)
+
+def get_docs_dirs(docs_path, source):
+    """Directorios de salida HTML/PNG de una fuente"""
+    base = get_docs_base(docs_path, source)
+    return base / 'pages_html', base / 'pages_png'
+
+def find_republication(page, url, docs_path, source):
+    """URL ya indexada de la que esta página es casi un duplicado, o None"""
+    try:
+        text = content.extract_main_content(page.content(), source)['texto']
+    except Exception as e:
+        print(f"⚠️  No se pudo comparar {url} con el índice de similitud: {e}")
+        return None
+    return similarity.lookup_near_duplicate(Path(docs_path).parent / 'db', url, text)
+
+def archive_page(page, url, response, docs_path, source, with_screenshot=True):
+    """
+    Guarda la captura en el WARC rotativo de la fuente (request, response,
+    DOM renderizado y screenshot) y devuelve referencias a los registros.
+    """
+    request_info = {'method': 'GET', 'headers': {}}
+    response_info = {'status': 200, 'reason': '', 'headers': {}, 'body': b''}
+    if response is not None:
+        request_info['headers'] = response.request.all_headers()
+        response_info = {
+            'status': response.status,
+            'reason': response.status_text,
+            'headers': response.all_headers(),
+            'body': response.body(),
+        }
+
+    html = page.content()
+    screenshot = page.screenshot(full_page=True) if with_screenshot else None
+
+    writer = warc.get_writer(get_docs_base(docs_path, source) / 'warc', WARC_COMPRESSION)
+    records = writer.write_capture(url, request_info, response_info, html, screenshot)
+
+    project_root = Path(docs_path).parent
+    return (
+        warc.make_ref(*records['html'], project_root),
+        warc.make_ref(*records['png'], project_root) if 'png' in records else None,
+    )
+
+class CaptureCancelled(Exception):
+    """La captura se abandonó a mitad de camino (p. ej. se perdió el lease de la cola)"""
+
+def _check_cancelled(cancelled, url):
+    if cancelled is not None and cancelled.is_set():
+        raise CaptureCancelled(f"captura de {url} cancelada")
+
+def capture_page(page, url, docs_path, stem, source, output=None, cancelled=None):
+    """
+    Navega una vez a la URL y guarda HTML y screenshot. Si `cancelled`
+    (threading.Event) se activa, se abandona con CaptureCancelled antes de
+    escribir el HTML y antes del screenshot.
+
+    Returns:
+        (html_path, png_path) relativos a la raíz del proyecto (o
+        referencias WARC en modo 'warc'), o None si alguna captura falló.
+        png_path es None si se omitió el screenshot de una republicación.
+    """
+    html_dir, png_dir = get_docs_dirs(docs_path, source)
+
+    # En modo profiling, las capturas lentas dejan un trace en logs/traces/
+    with profiling.trace_if_slow(page, f"{source.name}-{stem}"):
+        # Timeout más corto y wait_until menos estricto; lista apenas
+        # aparece el cuerpo de la licitación
+        response = source.goto(page, url, wait_until='domcontentloaded', timeout=30000)
+        source.wait_ready(page, 'detail')
+        _check_cancelled(cancelled, url)
+
+        duplicate_of = None
+        if NEAR_DUPLICATES == 'skip':
+            duplicate_of = find_republication(page, url, docs_path, source)
+            if duplicate_of:
+                print(f"♻️  Republicación de {duplicate_of}: se omite el screenshot")
+
+        if (output or CAPTURE_OUTPUT) == 'warc':
+            return archive_page(page, url, response, docs_path, source, duplicate_of is None)
+
+        # Descargar HTML
+        html_path = save_html(page, str(html_dir), f"{stem}.html")
+        _check_cancelled(cancelled, url)
+
+        # Tomar screenshot
+        png_path = save_png(page, str(png_dir), f"{stem}.png") if duplicate_of is None else None
+
+    if not html_path or (png_path is None and duplicate_of is None):
+        return None
+
+    # Guardar paths relativos desde la raíz del proyecto
+    project_root = Path(docs_path).parent
+    return (
+        os.path.relpath(html_path, project_root),
+        os.path.relpath(png_path, project_root) if png_path else None
+    )
+
+def download_page_content(urls, docs_path, source=None, page=None, budget=None, stem_prefix='',
+                          processes=None):
+    """
+    Captura las URLs en el orden recibido. Con un `budget` (RunBudget) se
+    detiene antes de la hora límite y deja las restantes en budget.pending.
+    `stem_prefix` distingue los archivos de capturas fuera del run diario.
+    Con `processes` > 1 (o CAPTURE_PROCESSES) las capturas se reparten
+    entre procesos, cada uno con su navegador (ver steps/capture_pool.py).
+    """
+    source = source or get_source()
+
+    processes = processes or capture_pool.default_processes()
+    if processes > 1 and len(urls) > 1:
+        return capture_pool.download_with_pool(urls, docs_path, source, processes, budget, stem_prefix)
+
+    # Reutilizar una sola página para todas las capturas
+    if page is None:
+        with browser_page(label='step2') as page:
+            return download_page_content(urls, docs_path, source, page, budget, stem_prefix, 1)
+
+    results = []
+    html_dir, png_dir = get_docs_dirs(docs_path, source)
+
     # Asegurar que los directorios existen
     html_dir.mkdir(parents=True, exist_ok=True)
     png_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    live_metrics.set_pending(source.name, len(urls))
+
     for i, url in enumerate(urls, 1):
+        if budget and not budget.allows_another():
+            budget.pending = list(urls[i - 1:])
+            print(f"⏰ Hora límite alcanzada: {len(budget.pending)} URLs quedan pendientes")
+            break
+
+        start = time.monotonic()
+        captured = None
         try:
             print(f"🔄 Procesando {i}/{len(urls)}: {url}")
-            
-            # Descargar HTML
-            html_path = download_html(url, str(html_dir), f"{i}.html")
-            
-            # Tomar screenshot
-            png_path = download_png(url, str(png_dir), f"{i}.png")
-            
+
+            # Una sola navegación para HTML y screenshot
+            captured = capture_page(page, url, docs_path, f"{stem_prefix}{i}", source)
+
             # Solo agregar si ambos se descargaron exitosamente
-            if html_path and png_path:
-                # Guardar paths relativos desde la raíz del proyecto
-                rel_html_path = os.path.join('docs', 'pages_html', f"{i}.html")
-                rel_png_path = os.path.join('docs', 'pages_png', f"{i}.png")
-                
+            if captured:
+                rel_html_path, rel_png_path = captured
                 results.append((url, rel_html_path, rel_png_path))
                 print(f"✅ Completado {i}/{len(urls)}")
             else:
                 print(f"⚠️  Falló descarga para {url}")
-            
+
         except Exception as e:
             print(f"❌ Error procesando {url}: {e}")
             continue
-    
+        finally:
+            elapsed = time.monotonic() - start
+            live_metrics.page_finished(source.name, bool(captured), elapsed)
+            if budget:
+                budget.record(elapsed)
+
     return results
 
 if __name__ == "__main__":
@@ -118,4 +256,4 @@ if __name__ == "__main__":
         print(f"URL: {url}")
         print(f"HTML: {html}")
         print(f"PNG: {png}")
-        print("-" * 50)
\ No newline at end of file
+        print("-" * 50)
@@ -3,9 +3,17 @@ import time
 import os
 import sqlite3
 import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
 
+from jsonl_store import JsonlStore
+from sources import SOURCES, DEFAULT_SOURCE
+import content
+import live_metrics
+import similarity
+import warc
+
 
 def get_database_connection(db_path):
     """Obtiene una conexión a la base de datos SQLite"""
@@ -15,9 +23,11 @@ def get_database_connection(db_path):
     if not db_file.exists():
         raise FileNotFoundError(f"Base de datos no encontrada: {db_file}")
     
-    connection = sqlite3.connect(str(db_file))
+    connection = sqlite3.connect(str(db_file), timeout=30)
     # Habilitar foreign keys
     connection.execute("PRAGMA foreign_keys = ON;")
+    # WAL permite lectores concurrentes (API, exportaciones) durante el scraping
+    connection.execute("PRAGMA journal_mode = WAL;")
     return connection
 
 
@@ -41,7 +51,24 @@ def get_file_size(file_path):
         return None
 
 
-def create_run_record_sqlite(db_path):
+def artifact_exists(path, project_root='.'):
+    """Indica si existe la captura (archivo o registro dentro de un WARC)"""
+    if not path:
+        return False
+    parsed = warc.parse_ref(path)
+    if parsed:
+        return (Path(project_root) / parsed[0]).exists()
+    return os.path.exists(path)
+
+
+def read_artifact(path, project_root='.'):
+    """Contenido de una captura, ya sea archivo suelto o referencia WARC"""
+    if warc.parse_ref(path):
+        return warc.read_payload(path, project_root)[1]
+    return Path(path).read_bytes()
+
+
+def create_run_record_sqlite(db_path, source_name=DEFAULT_SOURCE):
     """Crea un nuevo registro de ejecución en SQLite"""
     connection = get_database_connection(db_path)
     cursor = connection.cursor()
@@ -49,9 +76,9 @@ def create_run_record_sqlite(db_path):
     try:
         # Insertar nuevo run
         cursor.execute("""
-            INSERT INTO runs (started_at, status)
-            VALUES (CURRENT_TIMESTAMP, 'running')
-        """)
+            INSERT INTO runs (started_at, status, source)
+            VALUES (CURRENT_TIMESTAMP, 'running', ?)
+        """, (source_name,))
         
         run_id = cursor.lastrowid
         connection.commit()
@@ -97,72 +124,252 @@ def create_run_details_sqlite(db_path, run_id, url_data):
         connection.close()
 
 
-def store_licitaciones_sqlite(db_path, run_id, processed_pages):
-    """Almacena las licitaciones y archivos en SQLite"""
-    connection = get_database_connection(db_path)
-    cursor = connection.cursor()
-    
+# Campos de `licitaciones` que pueden completar los adaptadores de fuentes
+LICITACION_FIELDS = (
+    'title', 'description', 'numero_licitacion', 'estado', 'fecha_publicacion',
+    'fecha_apertura', 'monto_estimado', 'moneda', 'organismo', 'categoria', 'subcategoria'
+)
+
+
+def read_capture_html(html_path, project_root='.'):
+    """HTML capturado (archivo o WARC), o None si no está disponible"""
+    if not artifact_exists(html_path, project_root):
+        return None
+    try:
+        return read_artifact(html_path, project_root).decode('utf-8')
+    except Exception as e:
+        print(f"⚠️  No se pudo leer {html_path}: {e}")
+        return None
+
+
+def extract_licitacion_fields(source, html):
+    """Extrae campos de la licitación con el adaptador de la fuente"""
+    if source is None or html is None:
+        return {}
+    try:
+        fields = source.extract_fields(html)
+    except Exception as e:
+        print(f"⚠️  No se pudieron extraer campos: {e}")
+        return {}
+    return {k: v for k, v in fields.items() if k in LICITACION_FIELDS}
+
+
+def extract_content(html, source=None):
+    """Contenido principal normalizado, o None si no se pudo extraer"""
+    if html is None:
+        return None
     try:
-        licitacion_ids = []
+        return content.extract_main_content(html, source)
+    except Exception as e:
+        print(f"⚠️  No se pudo extraer el contenido principal: {e}")
+        return None
+
+
+def get_previous_content(cursor, url):
+    """Última versión registrada del contenido principal de una URL"""
+    cursor.execute("""
+        SELECT hash_sha256, licitacion_id FROM contenido_principal
+        WHERE url = ? ORDER BY id DESC LIMIT 1
+    """, (url,))
+    return cursor.fetchone()
+
+
+def copy_licitacion_fields(cursor, licitacion_id):
+    """Campos ya extraídos de una licitación anterior (sin volver a parsear)"""
+    cursor.execute(
+        f"SELECT {', '.join(LICITACION_FIELDS)} FROM licitaciones WHERE id = ?",
+        (licitacion_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return {k: v for k, v in zip(LICITACION_FIELDS, row) if v is not None}
+
+
+def insert_content_row(cursor, licitacion_id, url, document, cambio, title=None):
+    """
+    Registra el contenido principal de una captura. El documento comprimido
+    y los índices de búsqueda y similitud solo se actualizan cuando el
+    contenido cambió.
+    """
+    changed = cambio != 'sin_cambios'
+    cursor.execute("""
+        INSERT INTO contenido_principal (
+            licitacion_id, url, hash_sha256, contenido, tamano_bytes, cambio
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        licitacion_id, url, document['hash'],
+        content.compress(document['html']) if changed else None,
+        len(document['html'].encode('utf-8')), cambio
+    ))
+
+    if changed:
+        cursor.execute("DELETE FROM busqueda_fts WHERE url = ?", (url,))
+        cursor.execute(
+            "INSERT INTO busqueda_fts (url, title, texto) VALUES (?, ?, ?)",
+            (url, title or '', document['texto'])
+        )
+        # Agrupar republicaciones de la misma licitación
+        similarity.index_document(cursor, url, document['texto'], licitacion_id)
+
+
+def index_fields_for_search(cursor, url, fields):
+    """
+    Sin contenido principal extraído, la búsqueda usa los campos de la
+    licitación (salvo que la URL ya tenga una versión indexada)
+    """
+    texto = ' '.join(
+        str(fields[key]) for key in ('description', 'numero_licitacion', 'organismo') if fields.get(key)
+    )
+    cursor.execute("""
+        INSERT INTO busqueda_fts (url, title, texto)
+        SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM busqueda_fts WHERE url = ?)
+    """, (url, fields.get('title') or '', texto, url))
+
+
+def insert_warc_artifact(cursor, licitacion_id, url, ref, record_type, project_root):
+    """
+    Registra una captura guardada en un WARC: la referencia queda como
+    path_relativo y el offset/length en warc_records para lectura directa.
+
+    Returns:
+        (ruta absoluta del WARC, tamaño, md5) del contenido
+    """
+    warc_file, offset, length = warc.parse_ref(ref)
+    content_type, payload = warc.read_payload(ref, project_root)
+
+    cursor.execute("""
+        INSERT INTO warc_records (
+            licitacion_id, url, record_type, warc_file,
+            offset, length, content_type
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (licitacion_id, url, record_type, warc_file, offset, length, content_type))
+
+    return (
+        os.path.abspath(Path(project_root) / warc_file),
+        len(payload),
+        hashlib.md5(payload).hexdigest()
+    )
+
+
+def insert_licitaciones_rows(cursor, db_path, run_id, processed_pages, source=None):
+    """Inserta licitaciones y archivos usando un cursor existente (sin commit)"""
+    licitacion_ids = []
+    project_root = Path(db_path).parent
+    
+    for url, html_path, png_path in processed_pages:
+        # 1. Contenido principal: si no cambió desde la captura anterior,
+        # se reutilizan los campos ya extraídos en lugar de volver a parsear
+        html = read_capture_html(html_path, project_root)
+        document = extract_content(html, source)
+        previous = get_previous_content(cursor, url) if document else None
+
+        fields = None
+        cambio = 'nueva' if previous is None else 'modificada'
+        if previous and previous[0] == document['hash']:
+            fields = copy_licitacion_fields(cursor, previous[1])
+            if fields is not None:
+                cambio = 'sin_cambios'
+        if fields is None:
+            fields = extract_licitacion_fields(source, html)
+
+        # 2. Insertar licitación (con los campos que extraiga la fuente)
+        columns = ['run_id', 'url'] + list(fields)
+        cursor.execute(f"""
+            INSERT INTO licitaciones ({', '.join(columns)}, scraped_at)
+            VALUES ({', '.join('?' for _ in columns)}, CURRENT_TIMESTAMP)
+        """, [run_id, url] + list(fields.values()))
         
-        for url, html_path, png_path in processed_pages:
-            # 1. Insertar licitación
+        licitacion_id = cursor.lastrowid
+        licitacion_ids.append(licitacion_id)
+        
+        if document:
+            insert_content_row(cursor, licitacion_id, url, document, cambio, fields.get('title'))
+        else:
+            index_fields_for_search(cursor, url, fields)
+        
+        # 3. Insertar archivo HTML
+        if warc.parse_ref(html_path) and artifact_exists(html_path, project_root):
+            html_abs_path, html_size, html_hash = insert_warc_artifact(
+                cursor, licitacion_id, url, html_path, 'html', project_root
+            )
             cursor.execute("""
-                INSERT INTO licitaciones (run_id, url, scraped_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            """, (run_id, url))
+                INSERT INTO archivos_html (
+                    licitacion_id, path_relativo, path_absoluto,
+                    tamano_bytes, hash_md5
+                )
+                VALUES (?, ?, ?, ?, ?)
+            """, (licitacion_id, html_path, html_abs_path, html_size, html_hash))
+        elif html_path and os.path.exists(html_path):
+            html_size = get_file_size(html_path)
+            html_hash = calculate_file_hash(html_path)
+            # Convertir a ruta absoluta y luego calcular relativa
+            html_abs_path = os.path.abspath(html_path)
+            try:
+                html_relative = str(Path(html_abs_path).relative_to(project_root))
+            except ValueError:
+                # Si no puede ser relativa, usar el path original
+                html_relative = html_path
             
-            licitacion_id = cursor.lastrowid
-            licitacion_ids.append(licitacion_id)
-            
-            # 2. Insertar archivo HTML
-            if html_path and os.path.exists(html_path):
-                html_size = get_file_size(html_path)
-                html_hash = calculate_file_hash(html_path)
-                # Convertir a ruta absoluta y luego calcular relativa
-                html_abs_path = os.path.abspath(html_path)
-                project_root = Path(db_path).parent
-                try:
-                    html_relative = str(Path(html_abs_path).relative_to(project_root))
-                except ValueError:
-                    # Si no puede ser relativa, usar el path original
-                    html_relative = html_path
-                
-                cursor.execute("""
-                    INSERT INTO archivos_html (
-                        licitacion_id, path_relativo, path_absoluto,
-                        tamano_bytes, hash_md5
-                    )
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    licitacion_id, html_relative, html_abs_path,
-                    html_size, html_hash
-                ))
+            cursor.execute("""
+                INSERT INTO archivos_html (
+                    licitacion_id, path_relativo, path_absoluto,
+                    tamano_bytes, hash_md5
+                )
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                licitacion_id, html_relative, html_abs_path,
+                html_size, html_hash
+            ))
+        
+        # 4. Insertar archivo PNG
+        if warc.parse_ref(png_path) and artifact_exists(png_path, project_root):
+            png_abs_path, png_size, _ = insert_warc_artifact(
+                cursor, licitacion_id, url, png_path, 'png', project_root
+            )
+            cursor.execute("""
+                INSERT INTO archivos_png (
+                    licitacion_id, path_relativo, path_absoluto,
+                    tamano_bytes
+                )
+                VALUES (?, ?, ?, ?)
+            """, (licitacion_id, png_path, png_abs_path, png_size))
+        elif png_path and os.path.exists(png_path):
+            png_size = get_file_size(png_path)
+            # Convertir a ruta absoluta y luego calcular relativa
+            png_abs_path = os.path.abspath(png_path)
+            try:
+                png_relative = str(Path(png_abs_path).relative_to(project_root))
+            except ValueError:
+                # Si no puede ser relativa, usar el path original
+                png_relative = png_path
             
-            # 3. Insertar archivo PNG
-            if png_path and os.path.exists(png_path):
-                png_size = get_file_size(png_path)
-                # Convertir a ruta absoluta y luego calcular relativa
-                png_abs_path = os.path.abspath(png_path)
-                project_root = Path(db_path).parent
-                try:
-                    png_relative = str(Path(png_abs_path).relative_to(project_root))
-                except ValueError:
-                    # Si no puede ser relativa, usar el path original
-                    png_relative = png_path
-                
-                cursor.execute("""
-                    INSERT INTO archivos_png (
-                        licitacion_id, path_relativo, path_absoluto,
-                        tamano_bytes
-                    )
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    licitacion_id, png_relative, png_abs_path,
-                    png_size
-                ))
+            cursor.execute("""
+                INSERT INTO archivos_png (
+                    licitacion_id, path_relativo, path_absoluto,
+                    tamano_bytes
+                )
+                VALUES (?, ?, ?, ?)
+            """, (
+                licitacion_id, png_relative, png_abs_path,
+                png_size
+            ))
+    
+    return licitacion_ids
+
+
+def store_licitaciones_sqlite(db_path, run_id, processed_pages, source=None):
+    """Almacena las licitaciones y archivos en SQLite"""
+    connection = get_database_connection(db_path)
+    cursor = connection.cursor()
+    
+    try:
+        licitacion_ids = insert_licitaciones_rows(cursor, db_path, run_id, processed_pages, source)
         
         connection.commit()
+        live_metrics.record_db_writes('licitaciones', len(licitacion_ids))
         return licitacion_ids
         
     except Exception as e:
@@ -196,6 +403,29 @@ def finish_run_sqlite(db_path, run_id, total_pages, execution_time):
         connection.close()
 
 
+def store_pending_sqlite(db_path, run_id, pending):
+    """Registra las URLs que quedaron sin capturar por la hora límite"""
+    connection = get_database_connection(db_path)
+    cursor = connection.cursor()
+    
+    try:
+        cursor.executemany("""
+            INSERT INTO capturas_pendientes (run_id, url, prioridad, posicion)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (run_id, url, prioridad, posicion)
+            for posicion, (url, prioridad) in enumerate(pending, 1)
+        ])
+        
+        connection.commit()
+        
+    except Exception as e:
+        connection.rollback()
+        raise e
+    finally:
+        connection.close()
+
+
 def store_metrics_sqlite(db_path, run_id, metrics):
     """Almacena métricas de la ejecución"""
     connection = get_database_connection(db_path)
@@ -206,16 +436,25 @@ def store_metrics_sqlite(db_path, run_id, metrics):
             INSERT INTO metricas_ejecucion (
                 run_id, paginas_procesadas, paginas_exitosas,
                 paginas_con_error, archivos_html_creados,
-                archivos_png_creados
+                archivos_png_creados, assets_cache_hits,
+                assets_cache_misses, assets_cache_hit_rate,
+                assets_bytes_ahorrados, paginas_relacionadas,
+                documentos_relacionados
             )
-            VALUES (?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             run_id,
             metrics.get('paginas_procesadas', 0),
             metrics.get('paginas_exitosas', 0),
             metrics.get('paginas_con_error', 0),
             metrics.get('archivos_html_creados', 0),
-            metrics.get('archivos_png_creados', 0)
+            metrics.get('archivos_png_creados', 0),
+            metrics.get('assets_cache_hits', 0),
+            metrics.get('assets_cache_misses', 0),
+            metrics.get('assets_cache_hit_rate', 0),
+            metrics.get('assets_bytes_ahorrados', 0),
+            metrics.get('paginas_relacionadas', 0),
+            metrics.get('documentos_relacionados', 0)
         ))
         
         connection.commit()
@@ -231,53 +470,36 @@ def store_metrics_sqlite(db_path, run_id, metrics):
 # FUNCIONES LEGACY (JSONL) - Mantenidas para compatibilidad
 # ============================================================================
 
+# Los runs de cada fuente se guardan en hilos paralelos (main.py): la
+# reproducción de runs legacy y las escrituras JSONL van de a una
+_legacy_lock = threading.Lock()
+
+def open_jsonl_store(jsonl_file):
+    """Abre un log JSONL indexado (ver jsonl_store.JsonlStore)"""
+    return JsonlStore(jsonl_file)
+
 def get_next_id(jsonl_file):
-    if not os.path.exists(jsonl_file):
-        return 1
-    
-    max_id = 0
-    try:
-        with open(jsonl_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    record = json.loads(line)
-                    if 'id' in record and record['id'] > max_id:
-                        max_id = record['id']
-    except:
-        pass
-    
-    return max_id + 1
+    with open_jsonl_store(jsonl_file) as store:
+        return store.next_id()
 
 def append_to_jsonl(jsonl_file, record):
-    Path(jsonl_file).parent.mkdir(parents=True, exist_ok=True)
-    
-    with open(jsonl_file, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(record, ensure_ascii=False) + '\n')
-
-def clear_and_write_jsonl(jsonl_file, records):
-    """Reemplaza completamente el contenido del archivo JSONL"""
-    Path(jsonl_file).parent.mkdir(parents=True, exist_ok=True)
-    
-    with open(jsonl_file, 'w', encoding='utf-8') as f:
-        for record in records:
-            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    with open_jsonl_store(jsonl_file) as store:
+        return store.append(record)
 
 def create_run_record(db_path):
     runs_file = Path(db_path) / 'runs.jsonl'
     run_details_file = Path(db_path) / 'run_details.jsonl'
     
-    # Crear registro en runs.jsonl
-    run_id = get_next_id(runs_file)
-    run_details_id = get_next_id(run_details_file)
-    
-    run_record = {
-        'id': run_id,
-        'started_at': int(time.time()),
-        'finished_at': None,
-        'details_id': run_details_id
-    }
+    with open_jsonl_store(runs_file) as runs, open_jsonl_store(run_details_file) as details:
+        # Reservar id de detalles y crear registro en runs.jsonl
+        run_details_id = details.next_id()
+        run_id = runs.append({
+            'started_at': int(time.time()),
+            'finished_at': None,
+            'details_id': run_details_id,
+            'pending_replay': True
+        })
     
-    append_to_jsonl(runs_file, run_record)
     return run_id, run_details_id
 
 def create_run_details_record(db_path, run_details_id, url_data):
@@ -290,73 +512,132 @@ def create_run_details_record(db_path, run_details_id, url_data):
     
     append_to_jsonl(run_details_file, details_record)
 
-def create_page_records(db_path, processed_pages):
+def create_page_records(db_path, processed_pages, run_id=None):
+    """Agrega las páginas del run a pages*.jsonl conservando el historial"""
     pages_file = Path(db_path) / 'pages.jsonl'
     pages_html_file = Path(db_path) / 'pages_html.jsonl'
     pages_png_file = Path(db_path) / 'pages_png.jsonl'
     
-    # Preparar todos los registros en memoria antes de escribir
-    pages_records = []
-    html_records = []
-    png_records = []
     page_ids = []
-    
     current_timestamp = int(time.time())
     
-    for i, (url, html_path, png_path) in enumerate(processed_pages, 1):
-        # Registro HTML
-        html_record = {
-            'id': i,
-            'path': html_path
-        }
-        html_records.append(html_record)
+    with open_jsonl_store(pages_file) as pages, \
+         open_jsonl_store(pages_html_file) as pages_html, \
+         open_jsonl_store(pages_png_file) as pages_png:
         
-        # Registro PNG
-        png_record = {
-            'id': i,
-            'path': png_path
-        }
-        png_records.append(png_record)
-        
-        # Registro página principal
-        page_record = {
-            'id': i,
-            'url': url,
-            'pages_png_id': i,
-            'pages_html_id': i,
-            'timestamp': current_timestamp
-        }
-        pages_records.append(page_record)
-        page_ids.append(i)
-    
-    # Reemplazar completamente los archivos con datos frescos
-    clear_and_write_jsonl(pages_file, pages_records)
-    clear_and_write_jsonl(pages_html_file, html_records)
-    clear_and_write_jsonl(pages_png_file, png_records)
+        for url, html_path, png_path in processed_pages:
+            html_id = pages_html.append({'path': html_path})
+            png_id = pages_png.append({'path': png_path})
+            
+            page_id = pages.append({
+                'url': url,
+                'run_id': run_id,
+                'pages_png_id': png_id,
+                'pages_html_id': html_id,
+                'timestamp': current_timestamp
+            })
+            page_ids.append(page_id)
     
     return page_ids
 
 def finish_run_record(db_path, run_id):
     runs_file = Path(db_path) / 'runs.jsonl'
     
-    # Leer todos los registros
-    records = []
-    if os.path.exists(runs_file):
-        with open(runs_file, 'r', encoding='utf-8') as f:
-            records = [json.loads(line) for line in f if line.strip()]
+    # Actualizar agregando una nueva versión del registro
+    with open_jsonl_store(runs_file) as runs:
+        runs.update(run_id, finished_at=int(time.time()))
+
+def replay_legacy_into_sqlite(db_path):
+    """
+    Reproduce en SQLite los runs guardados en JSONL mientras la base no
+    estaba disponible. Cada run se inserta en una sola transacción y luego
+    se marca como reproducido en runs.jsonl.
     
-    # Actualizar el registro correspondiente
-    for record in records:
-        if record['id'] == run_id:
-            record['finished_at'] = int(time.time())
-            break
+    Returns:
+        Lista de ids de runs creados en SQLite
+    """
+    with _legacy_lock:
+        return _replay_legacy_runs(db_path)
+
+def _replay_legacy_runs(db_path):
+    db_dir = Path(db_path)
+    runs_file = db_dir / 'runs.jsonl'
+    if not runs_file.exists():
+        return []
+    
+    with open_jsonl_store(runs_file) as runs:
+        pending = [
+            r for r in runs.records()
+            if r.get('pending_replay') and r.get('finished_at') and not r.get('replayed_run_id')
+        ]
+    
+    if not pending:
+        return []
+    
+    pending_ids = {r['id'] for r in pending}
+    pages_by_run = {run_id: [] for run_id in pending_ids}
+    
+    with open_jsonl_store(db_dir / 'run_details.jsonl') as details, \
+         open_jsonl_store(db_dir / 'pages.jsonl') as pages, \
+         open_jsonl_store(db_dir / 'pages_html.jsonl') as pages_html, \
+         open_jsonl_store(db_dir / 'pages_png.jsonl') as pages_png:
+        
+        for page in pages.records():
+            if page.get('run_id') in pending_ids:
+                html = pages_html.get(page['pages_html_id']) or {}
+                png = pages_png.get(page['pages_png_id']) or {}
+                pages_by_run[page['run_id']].append((page['url'], html.get('path'), png.get('path')))
+        
+        details_by_id = {r['id']: details.get(r['details_id']) for r in pending}
+    
+    replayed = []
+    for record in pending:
+        processed_pages = pages_by_run[record['id']]
+        url_data = (details_by_id.get(record['id']) or {}).get('details', {})
+        source_name = url_data.get('fuente') or DEFAULT_SOURCE
+        
+        connection = get_database_connection(db_path)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO runs (started_at, finished_at, status, total_pages, execution_time_seconds, source)
+                VALUES (datetime(?, 'unixepoch'), datetime(?, 'unixepoch'), 'completed', ?, ?, ?)
+            """, (
+                record['started_at'], record['finished_at'], len(processed_pages),
+                record['finished_at'] - record['started_at'], source_name
+            ))
+            run_id = cursor.lastrowid
+            
+            cursor.execute("""
+                INSERT INTO run_details (
+                    run_id, url_principal, numero_paginas,
+                    total_licitaciones, urls_paginas
+                )
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                run_id,
+                url_data.get('urlPrincipal', ''),
+                url_data.get('numeroPaginas', 0),
+                url_data.get('totalLicitaciones', 0),
+                json.dumps(url_data.get('urlsPaginas', []))
+            ))
+            
+            insert_licitaciones_rows(cursor, db_path, run_id, processed_pages, SOURCES.get(source_name))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        
+        with open_jsonl_store(runs_file) as runs:
+            runs.update(record['id'], pending_replay=False, replayed_run_id=run_id)
+        replayed.append(run_id)
     
-    # Reescribir el archivo
-    with open(runs_file, 'w', encoding='utf-8') as f:
-        for record in records:
-            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return replayed
 
-def store_pipeline_data(db_path, url_data, processed_pages):
+def store_pipeline_data(db_path, url_data, processed_pages, source_name=None, run_id=None,
+                        extra_metrics=None, pending=None):
     """
     Almacena datos del pipeline en SQLite
     
@@ -364,16 +645,31 @@ def store_pipeline_data(db_path, url_data, processed_pages):
         db_path: Ruta al directorio que contiene la base de datos
         url_data: Datos de URLs extraídas del step1
         processed_pages: Lista de tuplas (url, html_path, png_path) del step2
+        source_name: Fuente (portal) del run; por defecto la indicada en url_data
+        run_id: Run ya creado (modo cola); si es None se crea uno nuevo
+        extra_metrics: Métricas adicionales del run (p. ej. caché de assets)
+        pending: Tuplas (url, prioridad) que no se capturaron por la hora límite
     
     Returns:
         Diccionario con información del almacenamiento
     """
     start_time = time.time()
+    source_name = source_name or url_data.get('fuente') or DEFAULT_SOURCE
+    source = SOURCES.get(source_name)
     
     try:
-        # 1. Crear registro de ejecución
-        print("📝 Creando registro de ejecución...")
-        run_id = create_run_record_sqlite(db_path)
+        # 0. Reproducir runs que quedaron en JSONL mientras SQLite no estaba disponible
+        try:
+            replayed = replay_legacy_into_sqlite(db_path)
+            if replayed:
+                print(f"🔁 Runs legacy reproducidos en SQLite: {len(replayed)}")
+        except Exception as replay_error:
+            print(f"⚠️  No se pudieron reproducir runs legacy: {replay_error}")
+        
+        # 1. Crear registro de ejecución (salvo que ya exista)
+        if run_id is None:
+            print("📝 Creando registro de ejecución...")
+            run_id = create_run_record_sqlite(db_path, source_name)
         
         # 2. Crear registro de detalles
         print("📋 Almacenando detalles de ejecución...")
@@ -381,11 +677,12 @@ def store_pipeline_data(db_path, url_data, processed_pages):
         
         # 3. Almacenar licitaciones y archivos
         print(f"💾 Almacenando {len(processed_pages)} licitaciones...")
-        licitacion_ids = store_licitaciones_sqlite(db_path, run_id, processed_pages)
+        licitacion_ids = store_licitaciones_sqlite(db_path, run_id, processed_pages, source)
         
         # 4. Calcular métricas
-        html_count = sum(1 for _, html_path, _ in processed_pages if html_path and os.path.exists(html_path))
-        png_count = sum(1 for _, _, png_path in processed_pages if png_path and os.path.exists(png_path))
+        project_root = Path(db_path).parent
+        html_count = sum(1 for _, html_path, _ in processed_pages if artifact_exists(html_path, project_root))
+        png_count = sum(1 for _, _, png_path in processed_pages if artifact_exists(png_path, project_root))
         
         metrics = {
             'paginas_procesadas': len(processed_pages),
@@ -394,28 +691,41 @@ def store_pipeline_data(db_path, url_data, processed_pages):
             'archivos_html_creados': html_count,
             'archivos_png_creados': png_count
         }
+        metrics.update(extra_metrics or {})
         
         # 5. Almacenar métricas
         print("📊 Guardando métricas...")
         store_metrics_sqlite(db_path, run_id, metrics)
         
+        if pending:
+            print(f"⏳ Registrando {len(pending)} capturas pendientes...")
+            store_pending_sqlite(db_path, run_id, pending)
+        
         # 6. Finalizar ejecución
         execution_time = int(time.time() - start_time)
         print("✅ Finalizando registro de ejecución...")
         finish_run_sqlite(db_path, run_id, len(processed_pages), execution_time)
         
         print(f"🎉 Datos almacenados exitosamente en SQLite!")
-        print(f"   - Run ID: {run_id}")
+        print(f"   - Run ID: {run_id} ({source_name})")
         print(f"   - Licitaciones: {len(licitacion_ids)}")
         print(f"   - Archivos HTML: {html_count}")
         print(f"   - Archivos PNG: {png_count}")
+        if metrics.get('assets_cache_hits') or metrics.get('assets_cache_misses'):
+            print(f"   - Caché de assets: {metrics['assets_cache_hit_rate']:.0%} aciertos "
+                  f"({metrics['assets_bytes_ahorrados'] / 1024 / 1024:.1f} MB ahorrados)")
+        if metrics.get('paginas_relacionadas') or metrics.get('documentos_relacionados'):
+            print(f"   - Relacionadas: {metrics.get('paginas_relacionadas', 0)} páginas, "
+                  f"{metrics.get('documentos_relacionados', 0)} documentos (en frontera)")
         print(f"   - Tiempo ejecución: {execution_time}s")
         
         return {
             'run_id': run_id,
+            'source': source_name,
             'licitacion_ids': licitacion_ids,
             'total_pages': len(processed_pages),
             'metrics': metrics,
+            'pending': len(pending or []),
             'execution_time': execution_time,
             'status': 'success'
         }
@@ -434,6 +744,10 @@ def store_pipeline_data(db_path, url_data, processed_pages):
 
 def store_pipeline_data_legacy(db_path, url_data, processed_pages):
     """Función legacy usando JSONL como backup"""
+    with _legacy_lock:
+        return _store_legacy_run(db_path, url_data, processed_pages)
+
+def _store_legacy_run(db_path, url_data, processed_pages):
     # 1. Crear registro de run
     run_id, run_details_id = create_run_record(db_path)
     
@@ -441,7 +755,7 @@ def store_pipeline_data_legacy(db_path, url_data, processed_pages):
     create_run_details_record(db_path, run_details_id, url_data)
     
     # 3. Crear registros de páginas
-    page_ids = create_page_records(db_path, processed_pages)
+    page_ids = create_page_records(db_path, processed_pages, run_id)
     
     # 4. Finalizar registro de run
     finish_run_record(db_path, run_id)
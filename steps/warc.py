@@ -0,0 +1,317 @@
+import base64
+import gzip
+import hashlib
+import os
+import socket
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Tamaño a partir del cual se abre un nuevo archivo WARC
+MAX_WARC_SIZE = 512 * 1024 * 1024
+
+# Headers HTTP que no aplican al cuerpo ya decodificado que entrega el navegador
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+
+
+def _sha1_digest(data):
+    return 'sha1:' + base64.b32encode(hashlib.sha1(data).digest()).decode('ascii')
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def make_ref(warc_path, offset, length, project_root):
+    """Referencia a un registro: <ruta relativa>#<offset>,<length>"""
+    relative = os.path.relpath(warc_path, project_root)
+    return f"{relative}#{offset},{length}"
+
+
+def parse_ref(ref):
+    """Devuelve (ruta, offset, length) si `ref` apunta a un registro WARC"""
+    if not ref or '#' not in ref:
+        return None
+    path, _, position = ref.rpartition('#')
+    if '.warc' not in path:
+        return None
+    try:
+        offset, length = (int(v) for v in position.split(','))
+    except ValueError:
+        return None
+    return path, offset, length
+
+
+class WarcWriter:
+    """
+    Escritor de archivos WARC rotativos.
+
+    Cada registro se comprime como un miembro gzip (o frame zstd)
+    independiente, así cualquier registro se puede leer con un solo
+    seek + read a partir de su offset. Es seguro entre hilos.
+    """
+
+    def __init__(self, directory, compression='gzip', max_size=MAX_WARC_SIZE):
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("La compresión zstd requiere el paquete zstandard")
+
+        self.directory = Path(directory)
+        self.compression = compression
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._sequence = 0
+
+    def _open_new_file(self):
+        if self._file:
+            self._file.close()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        extension = 'warc.zst' if self.compression == 'zstd' else 'warc.gz'
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        self._sequence += 1
+        name = f"capturas-{timestamp}-{socket.gethostname()}-{os.getpid()}-{self._sequence:05d}.{extension}"
+        self._path = self.directory / name
+        self._file = open(self._path, 'ab')
+
+        info = (
+            "software: corrientes-scraper\r\n"
+            "format: WARC File Format 1.1\r\n"
+            f"hostname: {socket.gethostname()}\r\n"
+        ).encode('utf-8')
+        self._write_record('warcinfo', None, 'application/warc-fields', info, {'WARC-Filename': name})
+
+    def _write_record(self, record_type, target_uri, content_type, block, extra_headers=None):
+        record_id = f"<urn:uuid:{uuid.uuid4()}>"
+        headers = [
+            "WARC/1.1",
+            f"WARC-Type: {record_type}",
+            f"WARC-Record-ID: {record_id}",
+            f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        ]
+        if target_uri:
+            headers.append(f"WARC-Target-URI: {target_uri}")
+        for name, value in (extra_headers or {}).items():
+            headers.append(f"{name}: {value}")
+        headers.append(f"Content-Type: {content_type}")
+        headers.append(f"WARC-Block-Digest: {_sha1_digest(block)}")
+        headers.append(f"Content-Length: {len(block)}")
+
+        raw = ("\r\n".join(headers) + "\r\n\r\n").encode('utf-8') + block + b"\r\n\r\n"
+        compressed = _compress(raw, self.compression)
+
+        offset = self._file.tell()
+        self._file.write(compressed)
+        self._file.flush()
+        return record_id, offset, len(compressed)
+
+    def write_capture(self, url, request, response, rendered_html=None, screenshot=None):
+        """
+        Escribe los registros de una captura.
+
+        Args:
+            request: dict con method, headers (dict)
+            response: dict con status, reason, headers (dict), body (bytes)
+            rendered_html: DOM renderizado (str) guardado como registro resource
+            screenshot: PNG (bytes) guardado como registro resource
+
+        Returns:
+            dict tipo -> (ruta, offset, length) de cada registro escrito
+        """
+        split = urlsplit(url)
+        target = split.path or '/'
+        if split.query:
+            target += '?' + split.query
+
+        request_block = f"{request.get('method', 'GET')} {target} HTTP/1.1\r\n".encode('utf-8')
+        for name, value in request.get('headers', {}).items():
+            request_block += f"{name}: {value}\r\n".encode('utf-8')
+        request_block += b"\r\n"
+
+        body = response.get('body') or b''
+        response_block = f"HTTP/1.1 {response.get('status', 200)} {response.get('reason', '')}\r\n".encode('utf-8')
+        for name, value in response.get('headers', {}).items():
+            if name.lower() not in DROPPED_RESPONSE_HEADERS:
+                response_block += f"{name}: {value}\r\n".encode('utf-8')
+        response_block += f"Content-Length: {len(body)}\r\n\r\n".encode('utf-8') + body
+
+        records = {}
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.max_size:
+                self._open_new_file()
+
+            response_id, offset, length = self._write_record(
+                'response', url, 'application/http;msgtype=response', response_block,
+                {'WARC-Payload-Digest': _sha1_digest(body)}
+            )
+            records['response'] = (self._path, offset, length)
+
+            _, offset, length = self._write_record(
+                'request', url, 'application/http;msgtype=request', request_block,
+                {'WARC-Concurrent-To': response_id}
+            )
+            records['request'] = (self._path, offset, length)
+
+            if rendered_html is not None:
+                _, offset, length = self._write_record(
+                    'resource', url, 'text/html; charset=utf-8', rendered_html.encode('utf-8'),
+                    {'WARC-Concurrent-To': response_id}
+                )
+                records['html'] = (self._path, offset, length)
+
+            if screenshot is not None:
+                _, offset, length = self._write_record(
+                    'resource', url, 'image/png', screenshot,
+                    {'WARC-Concurrent-To': response_id}
+                )
+                records['png'] = (self._path, offset, length)
+
+            os.fsync(self._file.fileno())
+
+        return records
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(directory, compression='gzip'):
+    """Escritor compartido por proceso para un directorio"""
+    key = (str(directory), compression)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = WarcWriter(directory, compression)
+        return _writers[key]
+
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def read_record(warc_path, offset, length=None):
+    """
+    Lee un registro por offset (acceso aleatorio).
+
+    Returns:
+        (warc_headers dict, block bytes)
+    """
+    warc_path = str(warc_path)
+    with open(warc_path, 'rb') as f:
+        f.seek(offset)
+        if length is not None:
+            compressed = f.read(length)
+            if warc_path.endswith('.zst'):
+                raw = zstandard.ZstdDecompressor().decompressobj().decompress(compressed)
+            else:
+                raw = zlib.decompressobj(wbits=31).decompress(compressed)
+        else:
+            raw = _read_member(f, warc_path.endswith('.zst'))
+
+    return _split_record(raw)
+
+
+def _read_member(f, is_zstd):
+    """Descomprime un único miembro gzip / frame zstd desde la posición actual"""
+    if is_zstd:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        decompressor = zlib.decompressobj(wbits=31)
+
+    output = b''
+    while True:
+        chunk = f.read(64 * 1024)
+        if not chunk:
+            break
+        output += decompressor.decompress(chunk)
+        if decompressor.eof:
+            break
+    return output
+
+
+def read_payload(ref, project_root):
+    """
+    Devuelve (content_type, bytes) del contenido referenciado por `ref`.
+    Para registros response se descartan los headers HTTP.
+    """
+    parsed = parse_ref(ref)
+    if parsed is None:
+        raise ValueError(f"Referencia WARC inválida: {ref}")
+    path, offset, length = parsed
+
+    headers, block = read_record(Path(project_root) / path, offset, length)
+    if headers.get('WARC-Type') == 'response':
+        http_head, _, body = block.partition(b"\r\n\r\n")
+        content_type = 'application/octet-stream'
+        for line in http_head.decode('latin-1').split("\r\n")[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-type':
+                content_type = value.strip()
+        return content_type, body
+
+    return headers.get('Content-Type', 'application/octet-stream'), block
+
+
+def iter_records(warc_path):
+    """Recorre todos los registros de un archivo: (offset, headers, block)"""
+    warc_path = str(warc_path)
+    is_zstd = warc_path.endswith('.zst')
+    with open(warc_path, 'rb') as f:
+        data = f.read() if is_zstd else None
+
+    if is_zstd:
+        # Los frames zstd no exponen su largo; se recorren uno por uno
+        offset = 0
+        while offset < len(data):
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+            raw = decompressor.decompress(data[offset:])
+            consumed = len(data) - offset - len(decompressor.unused_data)
+            yield (offset,) + _split_record(raw)
+            offset += consumed
+        return
+
+    with open(warc_path, 'rb') as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            decompressor = zlib.decompressobj(wbits=31)
+            raw = b''
+            consumed = 0
+            while not decompressor.eof:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                raw += decompressor.decompress(chunk)
+                consumed += len(chunk)
+            if not raw:
+                return
+            consumed -= len(decompressor.unused_data)
+            yield (offset,) + _split_record(raw)
+            offset += consumed
+
+
+def _split_record(raw):
+    head, _, rest = raw.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode('utf-8').split("\r\n")[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    block_length = int(headers.get('Content-Length', len(rest)))
+    return headers, rest[:block_length]
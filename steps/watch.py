@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import har
+
+
+# Segundos entre consultas a la primera página del listado
+DEFAULT_INTERVAL = 120
+
+USER_AGENT = 'Mozilla/5.0 (compatible; corrientes-scraper watch)'
+
+
+def link_set_hash(urls):
+    """Hash del conjunto de enlaces (independiente del orden)"""
+    return hashlib.sha256('\n'.join(sorted(urls)).encode('utf-8')).hexdigest()
+
+
+def load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state_path, state):
+    tmp_path = Path(state_path).with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def known_urls(db_path, source_name):
+    """URLs de la fuente que ya están en licitar.db"""
+    db_file = Path(db_path) / "licitar.db"
+    if not db_file.exists():
+        return set()
+
+    connection = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, timeout=30)
+    try:
+        rows = connection.execute("""
+            SELECT DISTINCT l.url FROM licitaciones l
+            JOIN runs r ON r.id = l.run_id
+            WHERE r.source = ?
+        """, (source_name,)).fetchall()
+    finally:
+        connection.close()
+    return {url for (url,) in rows}
+
+
+def conditional_get(url, etag=None, last_modified=None, timeout=30):
+    """
+    GET condicional con compresión.
+
+    Returns:
+        (status, body str o None, etag, last_modified); status 304 sin cuerpo
+    """
+    headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    if har.settings.replaying:
+        # Sin red: siempre la respuesta completa grabada
+        status, recorded, body = har.replay_http(url)
+        return status, body.decode('utf-8', errors='replace'), recorded.get('etag'), recorded.get('last-modified')
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            charset = response.headers.get_content_charset() or 'utf-8'
+            if har.settings.recording:
+                recorded = {k: v for k, v in response.headers.items() if k.lower() != 'content-encoding'}
+                har.record_http(url, response.status, recorded, body.decode(charset, errors='replace').encode('utf-8'))
+            return (
+                response.status,
+                body.decode(charset, errors='replace'),
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+            )
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, None, etag, last_modified
+        raise
+
+
+class ListingWatcher:
+    """
+    Vigila la primera página del listado de una fuente.
+
+    Cada consulta es un GET condicional (ETag / Last-Modified); si el
+    servidor responde 304, o si el conjunto de enlaces no cambió, no se
+    hace nada más. Solo cuando aparece una URL que no está en la base se
+    devuelve para capturarla. El estado se guarda en disco, así que un
+    reinicio no vuelve a descargar ni a reportar lo ya visto.
+    """
+
+    def __init__(self, source, db_path, state_path, listing_url=None, read_links=None):
+        self.source = source
+        self.db_path = db_path
+        self.state_path = state_path
+        # Alternativa con navegador para listados que requieren JS
+        self.read_links = read_links
+
+        self.state = load_state(state_path).get(source.name, {})
+        self.listing_url = listing_url or self.state.get('listing_url')
+        self.known = known_urls(db_path, source.name)
+        self._pending = None
+
+    def _save(self):
+        state = load_state(self.state_path)
+        self.state['listing_url'] = self.listing_url
+        state[self.source.name] = self.state
+        save_state(self.state_path, state)
+
+    def poll(self):
+        """
+        Consulta el listado una vez.
+
+        Returns:
+            Lista de URLs nuevas (vacía si no hubo cambios)
+        """
+        self.source.limiter.wait()
+        status, html, etag, last_modified = conditional_get(
+            self.listing_url, self.state.get('etag'), self.state.get('last_modified')
+        )
+        if status == 304:
+            return []
+
+        links = self.source.read_listing_links(html)
+        if not links and self.read_links:
+            links = self.read_links(self.listing_url)
+
+        observed = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'links_hash': link_set_hash(links),
+        }
+        if observed['links_hash'] == self.state.get('links_hash'):
+            self._commit(observed)
+            return []
+
+        new_urls = [url for url in links if url not in self.known]
+        if new_urls:
+            # Los validadores se confirman recién cuando las nuevas quedan
+            # almacenadas; si la captura falla, la próxima consulta las repite
+            self._pending = (observed, set(new_urls))
+        else:
+            self._commit(observed)
+        return new_urls
+
+    def _commit(self, observed):
+        self.state.update(observed)
+        self._save()
+
+    def mark_known(self, urls):
+        """Marca URLs como vistas (una vez capturadas y almacenadas)"""
+        self.known.update(urls)
+        if self._pending and self._pending[1] <= self.known:
+            self._commit(self._pending[0])
+            self._pending = None
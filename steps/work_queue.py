@@ -0,0 +1,227 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# Segundos que un worker retiene un ítem antes de que vuelva a la cola
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+def connect(db_path):
+    """Conexión a licitar.db para operaciones de la cola"""
+    db_file = Path(db_path) / "licitar.db"
+    if not db_file.exists():
+        raise FileNotFoundError(f"Base de datos no encontrada: {db_file}")
+
+    # isolation_level=None: las transacciones se controlan explícitamente
+    connection = sqlite3.connect(str(db_file), timeout=30, isolation_level=None)
+    connection.execute("PRAGMA foreign_keys = ON;")
+    connection.execute("PRAGMA journal_mode = WAL;")
+    return connection
+
+
+def worker_id():
+    """Identificador único del worker (host + pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_urls(db_path, run_id, source_name, urls):
+    """Encola las URLs de un run; las repetidas se ignoran"""
+    connection = connect(db_path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany("""
+            INSERT OR IGNORE INTO capture_queue (run_id, source, url, position)
+            VALUES (?, ?, ?, ?)
+        """, [(run_id, source_name, url, position) for position, url in enumerate(urls, 1)])
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def lease_next(db_path, owner, run_id=None, lease_seconds=LEASE_SECONDS):
+    """
+    Toma el próximo ítem disponible: pendiente, o arrendado con el lease
+    vencido. El UPDATE ... RETURNING es atómico, así que dos workers nunca
+    obtienen el mismo ítem.
+
+    Returns:
+        dict con id, run_id, source, url y position, o None si no hay trabajo
+    """
+    now = time.time()
+    run_filter = "AND run_id = ?" if run_id is not None else ""
+    params = [owner, now + lease_seconds, now, MAX_ATTEMPTS]
+    if run_id is not None:
+        params.append(run_id)
+
+    connection = connect(db_path)
+    try:
+        # Ítems abandonados que ya agotaron sus intentos pasan a fallidos
+        connection.execute("""
+            UPDATE capture_queue
+            SET status = 'failed', error_message = COALESCE(error_message, 'lease vencido'),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, MAX_ATTEMPTS))
+
+        row = connection.execute(f"""
+            UPDATE capture_queue
+            SET status = 'leased',
+                lease_owner = ?,
+                lease_expires_at = ?,
+                attempts = attempts + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM capture_queue
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires_at < ?))
+                  AND attempts < ?
+                  {run_filter}
+                ORDER BY run_id, position
+                LIMIT 1
+            )
+            RETURNING id, run_id, source, url, position
+        """, params).fetchone()
+    finally:
+        connection.close()
+
+    if row is None:
+        return None
+    return dict(zip(('id', 'run_id', 'source', 'url', 'position'), row))
+
+
+def extend_lease(db_path, item_id, owner, lease_seconds=LEASE_SECONDS):
+    """Renueva el lease; devuelve False si el ítem ya no pertenece al worker"""
+    connection = connect(db_path)
+    try:
+        cursor = connection.execute("""
+            UPDATE capture_queue SET lease_expires_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'leased'
+        """, (time.time() + lease_seconds, item_id, owner))
+        return cursor.rowcount == 1
+    finally:
+        connection.close()
+
+
+@contextmanager
+def keep_lease(db_path, item_id, owner, lease_seconds=LEASE_SECONDS):
+    """
+    Renueva el lease en segundo plano mientras dura el bloque, para que una
+    captura lenta (reintentos, esperas del portal) no lo deje vencer y otro
+    worker tome el mismo ítem.
+
+    Yields:
+        threading.Event que se activa si el lease se perdió
+    """
+    lost = threading.Event()
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(lease_seconds / 3):
+            try:
+                if not extend_lease(db_path, item_id, owner, lease_seconds):
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️  No se pudo renovar el lease del ítem {item_id}: {e}")
+
+    thread = threading.Thread(target=renew, name=f"lease-{item_id}", daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        thread.join()
+
+
+def complete_item(db_path, item_id, owner, html_path, png_path):
+    """Marca un ítem como capturado (solo si el worker conserva el lease)"""
+    connection = connect(db_path)
+    try:
+        cursor = connection.execute("""
+            UPDATE capture_queue
+            SET status = 'done', html_path = ?, png_path = ?,
+                lease_expires_at = NULL, error_message = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ? AND status = 'leased'
+        """, (html_path, png_path, item_id, owner))
+        return cursor.rowcount == 1
+    finally:
+        connection.close()
+
+
+def fail_item(db_path, item_id, owner, error_message):
+    """Devuelve el ítem a la cola, o lo marca fallido si agotó los intentos"""
+    connection = connect(db_path)
+    try:
+        connection.execute("""
+            UPDATE capture_queue
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                lease_owner = NULL, lease_expires_at = NULL,
+                error_message = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ? AND status = 'leased'
+        """, (MAX_ATTEMPTS, str(error_message)[:1000], item_id, owner))
+    finally:
+        connection.close()
+
+
+def defer_run(db_path, run_id):
+    """
+    Saca de la cola los ítems del run que no se capturaron (pendientes o
+    arrendados) para que ningún worker siga con ellos.
+
+    Returns:
+        URLs retiradas, en el orden de la cola
+    """
+    connection = connect(db_path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        rows = connection.execute("""
+            DELETE FROM capture_queue
+            WHERE run_id = ? AND status IN ('pending', 'leased')
+            RETURNING url, position
+        """, (run_id,)).fetchall()
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+    return [url for url, _ in sorted(rows, key=lambda row: row[1])]
+
+
+def queue_status(db_path, run_id):
+    """Cantidad de ítems del run por estado"""
+    connection = connect(db_path)
+    try:
+        rows = connection.execute("""
+            SELECT status, COUNT(*) FROM capture_queue
+            WHERE run_id = ? GROUP BY status
+        """, (run_id,)).fetchall()
+    finally:
+        connection.close()
+
+    counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+    counts.update(dict(rows))
+    return counts
+
+
+def collect_results(db_path, run_id):
+    """Devuelve las capturas terminadas del run como tuplas (url, html_path, png_path)"""
+    connection = connect(db_path)
+    try:
+        rows = connection.execute("""
+            SELECT url, html_path, png_path FROM capture_queue
+            WHERE run_id = ? AND status = 'done'
+            ORDER BY position
+        """, (run_id,)).fetchall()
+    finally:
+        connection.close()
+    return [tuple(row) for row in rows]
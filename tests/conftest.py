@@ -0,0 +1,31 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Los steps se importan entre sí por nombre (como en main.py)
+sys.path.insert(0, str(PROJECT_ROOT / "steps"))
+sys.path.insert(0, str(PROJECT_ROOT / "setup"))
+
+
+@pytest.fixture
+def db_dir(tmp_path):
+    """Directorio db/ temporal con licitar.db creada desde schema.sql"""
+    schema = (PROJECT_ROOT / "db" / "schema.sql").read_text(encoding="utf-8")
+    connection = sqlite3.connect(tmp_path / "licitar.db")
+    connection.executescript(schema)
+    connection.close()
+    return tmp_path
+
+
+@pytest.fixture
+def connection(db_dir):
+    """Conexión a la base temporal con foreign keys activas (como step3)"""
+    connection = sqlite3.connect(db_dir / "licitar.db")
+    connection.execute("PRAGMA foreign_keys = ON;")
+    yield connection
+    connection.close()
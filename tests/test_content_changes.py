@@ -0,0 +1,64 @@
+import step3
+
+
+PAGE = """
+<html><body>
+  <nav>Inicio | Noticias</nav>
+  <article><h1>Licitación Pública N° 01/2025</h1><p>Construcción de {obra}</p></article>
+</body></html>
+"""
+
+
+class CountingSource:
+    """Fuente mínima que cuenta cuántas veces se parsean los campos"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def extract_fields(self, html):
+        self.calls += 1
+        return {'title': 'Licitación Pública N° 01/2025', 'organismo': 'Obras Públicas'}
+
+
+def capture(connection, db_dir, source, html_path):
+    run_id = connection.execute(
+        "INSERT INTO runs (started_at, status) VALUES (CURRENT_TIMESTAMP, 'running')"
+    ).lastrowid
+    cursor = connection.cursor()
+    [licitacion_id] = step3.insert_licitaciones_rows(
+        cursor, db_dir, run_id, [('https://portal/licitacion-01', str(html_path), None)], source
+    )
+    connection.commit()
+    return connection.execute(
+        "SELECT cambio, contenido IS NOT NULL FROM contenido_principal WHERE licitacion_id = ?",
+        (licitacion_id,)
+    ).fetchone()
+
+
+def test_unchanged_content_is_detected_and_fields_reused(db_dir, connection, tmp_path):
+    source = CountingSource()
+    html_path = tmp_path / '1.html'
+    html_path.write_text(PAGE.format(obra='un puente'), encoding='utf-8')
+
+    assert capture(connection, db_dir, source, html_path) == ('nueva', 1)
+    assert capture(connection, db_dir, source, html_path) == ('sin_cambios', 0)
+    # Sin cambios no se vuelve a parsear y se copian los campos
+    assert source.calls == 1
+    assert connection.execute(
+        "SELECT COUNT(*) FROM licitaciones WHERE organismo = 'Obras Públicas'"
+    ).fetchone()[0] == 2
+
+
+def test_changed_content_is_marked_modified(db_dir, connection, tmp_path):
+    source = CountingSource()
+    html_path = tmp_path / '1.html'
+    html_path.write_text(PAGE.format(obra='un puente'), encoding='utf-8')
+    capture(connection, db_dir, source, html_path)
+
+    html_path.write_text(PAGE.format(obra='una escuela'), encoding='utf-8')
+
+    assert capture(connection, db_dir, source, html_path) == ('modificada', 1)
+    assert source.calls == 2
+    assert connection.execute(
+        "SELECT COUNT(*) FROM busqueda_fts WHERE busqueda_fts MATCH 'escuela'"
+    ).fetchone()[0] == 1
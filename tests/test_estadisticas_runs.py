@@ -0,0 +1,76 @@
+import initialize_db
+
+
+def create_run(connection, files=3):
+    """Run con `files` licitaciones, cada una con un HTML y un PNG"""
+    run_id = connection.execute(
+        "INSERT INTO runs (started_at, status) VALUES (CURRENT_TIMESTAMP, 'completed')"
+    ).lastrowid
+    for n in range(files):
+        licitacion_id = connection.execute(
+            "INSERT INTO licitaciones (run_id, url) VALUES (?, ?)", (run_id, f"https://portal/{run_id}/{n}")
+        ).lastrowid
+        connection.execute(
+            "INSERT INTO archivos_html (licitacion_id, path_relativo) VALUES (?, 'x.html')", (licitacion_id,)
+        )
+        connection.execute(
+            "INSERT INTO archivos_png (licitacion_id, path_relativo) VALUES (?, 'x.png')", (licitacion_id,)
+        )
+    return run_id
+
+
+def stats(connection, run_id):
+    return connection.execute("""
+        SELECT total_licitaciones, total_html_files, total_png_files, total_errors
+        FROM estadisticas_runs WHERE run_id = ?
+    """, (run_id,)).fetchone()
+
+
+def actual(connection, run_id):
+    row = next(r for r in connection.execute(initialize_db.RUN_STATISTICS_QUERY) if r[0] == run_id)
+    return tuple(row[1:])
+
+
+def test_insert_counts_licitaciones_files_and_errors(connection):
+    run_id = create_run(connection)
+    connection.execute("INSERT INTO scraping_errors (run_id, url, error_type, error_message) VALUES (?, 'u', 'timeout', 'x')", (run_id,))
+
+    assert stats(connection, run_id) == (3, 3, 3, 1)
+    assert stats(connection, run_id) == actual(connection, run_id)
+
+
+def test_direct_file_delete(connection):
+    run_id = create_run(connection)
+    connection.execute("DELETE FROM archivos_png WHERE id = (SELECT MAX(id) FROM archivos_png)")
+
+    assert stats(connection, run_id) == actual(connection, run_id)
+
+
+def test_licitacion_delete_cascades_to_file_counters(connection):
+    run_id = create_run(connection)
+    licitacion_id = connection.execute(
+        "SELECT MIN(id) FROM licitaciones WHERE run_id = ?", (run_id,)
+    ).fetchone()[0]
+
+    connection.execute("DELETE FROM licitaciones WHERE id = ?", (licitacion_id,))
+
+    assert connection.execute("SELECT COUNT(*) FROM archivos_html").fetchone()[0] == 2
+    assert stats(connection, run_id)[:2] == (2, 2)
+    assert stats(connection, run_id) == actual(connection, run_id)
+
+
+def test_run_delete_removes_summary(connection):
+    run_id = create_run(connection)
+    connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    assert stats(connection, run_id) is None
+
+
+def test_repair_recomputes_drifted_rows(connection):
+    first = create_run(connection)
+    second = create_run(connection, files=2)
+    connection.execute("UPDATE estadisticas_runs SET total_html_files = 99 WHERE run_id = ?", (first,))
+
+    assert initialize_db.repair_run_statistics(connection) == 1
+    assert stats(connection, first) == actual(connection, first)
+    assert stats(connection, second) == (2, 2, 2, 0)
@@ -0,0 +1,81 @@
+import json
+
+from jsonl_store import JsonlStore
+
+
+def fill(store, records=5, updates=3):
+    for n in range(records):
+        store.append({'url': f"https://portal/{n}", 'status': 'pending'})
+    for version in range(updates):
+        for record_id in range(1, records + 1):
+            store.update(record_id, status=f"v{version}")
+
+
+def test_compaction_keeps_latest_versions(tmp_path):
+    path = tmp_path / 'runs.jsonl'
+    store = JsonlStore(path)
+    fill(store)
+    lines_before = len(path.read_bytes().splitlines())
+
+    assert store.compact(force=True)
+    assert len(path.read_bytes().splitlines()) == 5 < lines_before
+    assert [record['status'] for record in store.records()] == ['v2'] * 5
+
+    # Lo agregado después de compactar sigue funcionando
+    assert store.append({'url': 'https://portal/nueva'}) == 6
+    store.close()
+
+
+def test_compaction_only_when_dead_outnumber_live(tmp_path):
+    store = JsonlStore(tmp_path / 'runs.jsonl')
+    fill(store, records=200, updates=0)
+    for record_id in range(1, 51):
+        store.update(record_id, status='done')
+
+    assert not store.compact()
+    store.close()
+
+
+def test_reopen_reads_index(tmp_path):
+    path = tmp_path / 'runs.jsonl'
+    with JsonlStore(path) as store:
+        fill(store)
+        store.compact(force=True)
+        store.update(3, status='final')
+
+    reopened = JsonlStore(path)
+    assert len(reopened) == 5
+    assert reopened.get(3)['status'] == 'final'
+    assert reopened.next_id() == 6
+    reopened.close()
+
+
+def test_reopen_after_crash_reindexes_tail_and_drops_partial_line(tmp_path):
+    path = tmp_path / 'runs.jsonl'
+    store = JsonlStore(path, fsync_every=1000)
+    fill(store, updates=0)
+    store.commit()
+    # Registros escritos sin sync del índice y una línea cortada
+    store.append({'url': 'https://portal/cola'})
+    store._file.flush()
+    with open(path, 'ab') as f:
+        f.write(b'{"id": 7, "url": "https://por')
+
+    reopened = JsonlStore(path)
+    assert len(reopened) == 6
+    assert reopened.get(6)['url'] == 'https://portal/cola'
+    assert path.read_bytes().endswith(b'\n')
+    reopened.close()
+
+
+def test_reopen_with_invalid_index_rebuilds_it(tmp_path):
+    path = tmp_path / 'runs.jsonl'
+    with JsonlStore(path) as store:
+        fill(store, updates=1)
+    # Índice de un formato anterior (json con offsets)
+    (tmp_path / 'runs.jsonl.idx').write_text(json.dumps({'1': 0}), encoding='utf-8')
+
+    reopened = JsonlStore(path)
+    assert [record['id'] for record in reopened.records()] == [1, 2, 3, 4, 5]
+    assert reopened.get(5)['status'] == 'v0'
+    reopened.close()
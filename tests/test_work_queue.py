@@ -0,0 +1,73 @@
+import time
+
+import work_queue
+
+
+URLS = ['https://portal/1', 'https://portal/2']
+
+
+def create_run(connection):
+    run_id = connection.execute(
+        "INSERT INTO runs (started_at, status) VALUES (CURRENT_TIMESTAMP, 'running')"
+    ).lastrowid
+    connection.commit()
+    return run_id
+
+
+def test_lease_is_exclusive_while_valid(db_dir, connection):
+    run_id = create_run(connection)
+    work_queue.enqueue_urls(db_dir, run_id, 'corrientes', URLS)
+
+    first = work_queue.lease_next(db_dir, 'a', run_id)
+    second = work_queue.lease_next(db_dir, 'b', run_id)
+
+    assert (first['url'], second['url']) == tuple(URLS)
+    assert work_queue.lease_next(db_dir, 'c', run_id) is None
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db_dir, connection):
+    run_id = create_run(connection)
+    work_queue.enqueue_urls(db_dir, run_id, 'corrientes', URLS[:1])
+
+    # Lease vencido apenas se toma
+    item = work_queue.lease_next(db_dir, 'a', run_id, lease_seconds=-1)
+    reclaimed = work_queue.lease_next(db_dir, 'b', run_id)
+
+    assert reclaimed['id'] == item['id']
+    # El worker original ya no puede renovar ni completar
+    assert not work_queue.extend_lease(db_dir, item['id'], 'a')
+    assert not work_queue.complete_item(db_dir, item['id'], 'a', 'x.html', 'x.png')
+    assert work_queue.complete_item(db_dir, item['id'], 'b', 'y.html', 'y.png')
+    assert work_queue.collect_results(db_dir, run_id) == [(URLS[0], 'y.html', 'y.png')]
+
+
+def test_expired_lease_fails_after_max_attempts(db_dir, connection):
+    run_id = create_run(connection)
+    work_queue.enqueue_urls(db_dir, run_id, 'corrientes', URLS[:1])
+
+    for attempt in range(work_queue.MAX_ATTEMPTS):
+        assert work_queue.lease_next(db_dir, f"w{attempt}", run_id, lease_seconds=-1)
+
+    assert work_queue.lease_next(db_dir, 'otro', run_id) is None
+    assert work_queue.queue_status(db_dir, run_id)['failed'] == 1
+
+
+def test_keep_lease_signals_lost_lease(db_dir, connection):
+    run_id = create_run(connection)
+    work_queue.enqueue_urls(db_dir, run_id, 'corrientes', URLS[:1])
+    item = work_queue.lease_next(db_dir, 'a', run_id, lease_seconds=-1)
+    work_queue.lease_next(db_dir, 'b', run_id)
+
+    with work_queue.keep_lease(db_dir, item['id'], 'a', lease_seconds=0.03) as lost:
+        assert lost.wait(2)
+
+
+def test_keep_lease_renews_while_held(db_dir, connection):
+    run_id = create_run(connection)
+    work_queue.enqueue_urls(db_dir, run_id, 'corrientes', URLS[:1])
+    item = work_queue.lease_next(db_dir, 'a', run_id, lease_seconds=0.6)
+
+    with work_queue.keep_lease(db_dir, item['id'], 'a', lease_seconds=0.6) as lost:
+        time.sleep(1)
+        assert work_queue.lease_next(db_dir, 'b', run_id) is None
+    assert not lost.is_set()